@@ -0,0 +1,61 @@
+# src/ac_matcher.py
+# 功能：Aho-Corasick 多模式子串匹配（纯 Python，无第三方依赖）
+#       一次线性扫描文本，找出所有模式的全部出现位置（含重叠），
+#       代价与模式数量无关 —— 关键词表 / 药名表再大也只扫一遍。
+
+from collections import deque
+
+class AhoCorasick:
+    def __init__(self, patterns):
+        self.patterns = list(patterns)
+        self._goto = [{}]     # 状态 -> {字符: 下一状态}
+        self._fail = [0]      # 失配指针
+        self._out = [[]]      # 状态 -> 在此结束的模式编号
+        for pid, pat in enumerate(self.patterns):
+            if pat:
+                self._insert(pat, pid)
+        self._build_fail()
+
+    def _insert(self, pat, pid):
+        s = 0
+        for ch in pat:
+            nxt = self._goto[s].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[s][ch] = nxt
+                self._goto.append({}); self._fail.append(0); self._out.append([])
+            s = nxt
+        self._out[s].append(pid)
+
+    def _build_fail(self):
+        q = deque(self._goto[0].values())
+        while q:
+            s = q.popleft()
+            for ch, t in self._goto[s].items():
+                q.append(t)
+                if s:   # 根的孩子失配都回到根
+                    f = self._fail[s]
+                    while f and ch not in self._goto[f]:
+                        f = self._fail[f]
+                    self._fail[t] = self._goto[f].get(ch, 0)
+                # 沿失配链能到的模式也在这里结束
+                self._out[t] = self._out[t] + self._out[self._fail[t]]
+
+    def iter_matches(self, text):
+        """逐个产出 (end, pid)：模式 pid 出现在 text[end-len(pattern):end]"""
+        goto, fail, out = self._goto, self._fail, self._out
+        s = 0
+        for i, ch in enumerate(text):
+            while s and ch not in goto[s]:
+                s = fail[s]
+            s = goto[s].get(ch, 0)
+            if out[s]:
+                for pid in out[s]:
+                    yield i + 1, pid
+
+    def count(self, text):
+        """每个模式在 text 中的出现次数（列表，下标 = 模式编号）"""
+        cnt = [0] * len(self.patterns)
+        for _, pid in self.iter_matches(text):
+            cnt[pid] += 1
+        return cnt
@@ -0,0 +1,201 @@
+# src/ann_index.py
+# 功能：纯 NumPy 的近似最近邻索引（IVF：球面 k-means 粗量化 + 倒排表），给两处「全量 emb @ q」提速：
+#         句向量 index_sent_emb.npy   -> index_sent_ivf.npz（retrieve.activate_entities 激活实体）
+#         文献向量 data/index_vec_emb.npy -> data/index_vec_ivf.npz（vec_retrieve / answer_vec_drugs）
+#       查询时先和 n_lists 个中心比一次，只在最近的 nprobe 个桶里算精确点积；nprobe 越大召回越高、越慢，
+#       nprobe = n_lists 时与精确检索完全一致。
+#       索引文件带向量文件的 大小 + mtime 戳，向量重建后自动重训（与其他缓存一样「⚠️ … 重建」）。
+#       report 子命令：用 QA 问题集对比 精确 vs IVF 的 recall@k 与单次查询耗时，按 nprobe 扫一遍。
+# 用法：python src\ann_index.py build [--which sent,vec] [--n-lists 0]
+#       python src\ann_index.py report [--which sent,vec] [--k-list 10,50,100] [--nprobe-list 1,2,4,8,16,32]
+
+import argparse, json, os, time
+
+import numpy as np
+
+from index_store import save_npz_atomic
+
+SENT_IVF_PATH = "index_sent_ivf.npz"
+VEC_IVF_PATH = os.path.join("data", "index_vec_ivf.npz")
+ANN_NPROBE = 32         # 默认探查的桶数（约 4·sqrt(N) 个桶时，百万级只扫 1% 左右）
+KMEANS_ITERS = 20
+TRAIN_PER_LIST = 64     # 每个桶最多用多少个样本训练中心
+CHUNK_ROWS = 65536      # 分块算 (行 x 中心) 相似度，控制内存
+
+def default_n_lists(n):
+    """经验值：约 4·sqrt(N) 个桶，每桶平均 sqrt(N)/4 个向量"""
+    return int(max(1, min(n, round(4 * np.sqrt(n)))))
+
+def _assign(X, centroids):
+    """每行最近（内积最大）的中心"""
+    out = np.empty(X.shape[0], dtype=np.int32)
+    for s in range(0, X.shape[0], CHUNK_ROWS):
+        out[s:s + CHUNK_ROWS] = np.argmax(np.asarray(X[s:s + CHUNK_ROWS], dtype=np.float32) @ centroids.T, axis=1)
+    return out
+
+def _normalize_rows(A):
+    n = np.linalg.norm(A, axis=1, keepdims=True)
+    return (A / np.maximum(n, 1e-12)).astype(np.float32)
+
+def kmeans(X, n_lists, iters=KMEANS_ITERS, seed=0):
+    """球面 k-means（向量已归一化，按内积分配，中心重新归一化）；空桶用随机样本补"""
+    rng = np.random.default_rng(seed)
+    n = X.shape[0]
+    train = np.asarray(X[np.sort(rng.choice(n, size=min(n, n_lists * TRAIN_PER_LIST), replace=False))],
+                       dtype=np.float32)
+    centroids = train[rng.choice(train.shape[0], size=n_lists, replace=False)].copy()
+    for _ in range(iters):
+        a = _assign(train, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, a, train)
+        counts = np.bincount(a, minlength=n_lists)
+        empty = np.flatnonzero(counts == 0)
+        sums[empty] = train[rng.choice(train.shape[0], size=len(empty), replace=False)]
+        new = _normalize_rows(sums)
+        if np.allclose(new, centroids, atol=1e-6):
+            break
+        centroids = new
+    return centroids
+
+def build_ivf(X, n_lists=0, iters=KMEANS_ITERS, seed=0):
+    """
+    X: (N, d) 已归一化的向量（可以是 mmap）。
+    返回 {"centroids": (L, d), "order": 按桶排好的行号 (N,), "offsets": 每个桶在 order 里的起止 (L+1,)}
+    """
+    n = X.shape[0]
+    L = min(n_lists or default_n_lists(n), n)
+    centroids = kmeans(X, L, iters=iters, seed=seed)
+    a = _assign(X, centroids)
+    order = np.argsort(a, kind="stable").astype(np.int32 if n < 2 ** 31 else np.int64)
+    offsets = np.concatenate([[0], np.cumsum(np.bincount(a, minlength=L))]).astype(np.int64)
+    return {"centroids": centroids, "order": order, "offsets": offsets}
+
+def emb_stamp(emb_path):
+    st = os.stat(emb_path)
+    return {"emb_size": int(st.st_size), "emb_mtime": int(st.st_mtime)}
+
+def save_ivf(ivf, path, emb_path):
+    # 先写临时文件再替换：构建途中别的进程 load_ivf 读到的是旧的完整文件，不会是截断的压缩包
+    save_npz_atomic(path, centroids=ivf["centroids"], order=ivf["order"], offsets=ivf["offsets"],
+                    stamp=json.dumps(emb_stamp(emb_path)))
+
+def load_ivf(path, emb_path, emb=None, n_lists=0, nprobe=ANN_NPROBE):
+    """
+    读 IVF；不存在或向量文件变了就（用 emb 或 emb_path 的内容）重训一次并落盘。
+    nprobe 记在返回的 dict 里，作为这份索引查询时的默认值。
+    """
+    ivf = None
+    if os.path.exists(path):
+        Z = np.load(path)
+        if json.loads(str(Z["stamp"])) == emb_stamp(emb_path):
+            ivf = {"centroids": Z["centroids"], "order": Z["order"], "offsets": Z["offsets"]}
+    if ivf is None:
+        print(f"⚠️ ANN 索引缺失或与向量不一致，重建：{path}")
+        X = emb if emb is not None else np.load(emb_path, mmap_mode="r")
+        ivf = build_ivf(X, n_lists)
+        save_ivf(ivf, path, emb_path)
+    ivf["nprobe"] = nprobe
+    return ivf
+
+def ivf_candidates(ivf, q, nprobe=None):
+    """与 q 最近的 nprobe 个桶里的全部行号（nprobe=None 用 ivf 里记的默认值）"""
+    nprobe = nprobe or ivf.get("nprobe", ANN_NPROBE)
+    c = ivf["centroids"] @ q
+    L = len(c)
+    probe = np.arange(L) if nprobe >= L else np.argpartition(c, L - nprobe)[L - nprobe:]
+    off = ivf["offsets"]
+    return np.concatenate([ivf["order"][off[p]:off[p + 1]] for p in probe])
+
+def ivf_scores(ivf, emb, q, nprobe=None):
+    """返回 (候选行号, 精确内积)；只在 nprobe 个桶里算"""
+    cand = ivf_candidates(ivf, q, nprobe)
+    cand.sort()   # 按行号顺序读 mmap，页访问更连续
+    return cand, np.asarray(emb[cand], dtype=np.float32) @ q
+
+def ivf_topk(ivf, emb, q, k, nprobe=None):
+    """近似 Top-K：(行号, 分数)，分数从高到低"""
+    cand, s = ivf_scores(ivf, emb, q, nprobe)
+    order = np.argsort(-s, kind="stable")[:k]
+    return cand[order], s[order]
+
+def recall_at_k(approx, exact):
+    """两组行号的重合比例（以精确结果为分母）"""
+    exact = set(np.asarray(exact).tolist())
+    return len(exact & set(np.asarray(approx).tolist())) / max(len(exact), 1)
+
+# ---------- 命令行：建索引 / 召回报告 ----------
+
+def _stores(which):
+    """名字 -> (向量文件, IVF 文件, 编码模型)"""
+    from retrieve import SENT_EMB_PATH, SENT_MODEL
+    from answer_vec_drugs import VEC_EMB_PATH, VEC_MODEL
+    all_ = {"sent": (SENT_EMB_PATH, SENT_IVF_PATH, SENT_MODEL), "vec": (VEC_EMB_PATH, VEC_IVF_PATH, VEC_MODEL)}
+    return {w: all_[w] for w in which}
+
+def report(name, emb_path, ivf_path, model_name, qs, ks, nprobes, n_lists):
+    from sentence_transformers import SentenceTransformer
+    from sklearn.preprocessing import normalize
+
+    emb = np.load(emb_path, mmap_mode="r")
+    ivf = load_ivf(ivf_path, emb_path, n_lists=n_lists)
+    Q = normalize(SentenceTransformer(model_name).encode(qs, convert_to_numpy=True)).astype(np.float32)
+    k_max = max(ks)
+
+    t0 = time.perf_counter()
+    exact = [np.argsort(-(emb @ q), kind="stable")[:k_max] for q in Q]
+    t_exact = (time.perf_counter() - t0) / len(Q) * 1000
+
+    L = len(ivf["centroids"])
+    print(f"\n=== {name}: {emb.shape[0]} 条 x {emb.shape[1]} 维，{L} 个桶，{len(Q)} 个问题 ===")
+    print(f"{'nprobe':>7} {'扫描比例':>8} {'ms/query':>9} " + " ".join(f"{'R@' + str(k):>7}" for k in ks))
+    print(f"{'exact':>7} {1.0:>8.3f} {t_exact:>9.3f} " + " ".join(f"{1.0:>7.3f}" for _ in ks))
+    rows = []
+    for nprobe in nprobes:
+        if nprobe > L:
+            continue
+        t0 = time.perf_counter()
+        approx = [ivf_topk(ivf, emb, q, k_max, nprobe)[0] for q in Q]
+        t_ann = (time.perf_counter() - t0) / len(Q) * 1000
+        scanned = np.mean([len(ivf_candidates(ivf, q, nprobe)) for q in Q]) / emb.shape[0]
+        rec = [np.mean([recall_at_k(a[:k], e[:k]) for a, e in zip(approx, exact)]) for k in ks]
+        print(f"{nprobe:>7} {scanned:>8.3f} {t_ann:>9.3f} " + " ".join(f"{r:>7.3f}" for r in rec))
+        rows.append({"nprobe": nprobe, "scanned": float(scanned), "ms_per_query": t_ann,
+                     "recall": {str(k): float(r) for k, r in zip(ks, rec)}})
+    return {"n": int(emb.shape[0]), "dim": int(emb.shape[1]), "n_lists": L, "exact_ms_per_query": t_exact,
+            "ann": rows}
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("cmd", choices=["build", "report"])
+    ap.add_argument("--which", default="sent,vec", help="sent = 句向量，vec = 文献向量")
+    ap.add_argument("--n-lists", type=int, default=0, help="桶数（0 = 约 4·sqrt(N)）")
+    ap.add_argument("--k-list", default="10,50,100")
+    ap.add_argument("--nprobe-list", default="1,2,4,8,16,32,64")
+    ap.add_argument("--questions", default=os.path.join("data", "qa_med_questions.jsonl"))
+    ap.add_argument("--out", default=os.path.join("runs", "ann_recall.json"))
+    args = ap.parse_args()
+
+    os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    stores = _stores([w.strip() for w in args.which.split(",") if w.strip()])
+
+    if args.cmd == "build":
+        for name, (emb_path, ivf_path, _) in stores.items():
+            t0 = time.perf_counter()
+            emb = np.load(emb_path, mmap_mode="r")
+            ivf = build_ivf(emb, args.n_lists)
+            save_ivf(ivf, ivf_path, emb_path)
+            print(f"✅ {name}: {emb.shape[0]} 条 -> {len(ivf['centroids'])} 个桶，"
+                  f"用时 {time.perf_counter() - t0:.2f}s -> {ivf_path}")
+        return
+
+    qs = [json.loads(l)["question"] for l in open(args.questions, "r", encoding="utf-8") if l.strip()]
+    ks = [int(x) for x in args.k_list.split(",")]
+    nprobes = [int(x) for x in args.nprobe_list.split(",")]
+    out = {name: report(name, e, i, m, qs, ks, nprobes, args.n_lists) for name, (e, i, m) in stores.items()}
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(out, f, ensure_ascii=False, indent=2)
+    print(f"\n✅ 已写出 {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -5,7 +5,7 @@
 
 import os, sys, re, json
 import numpy as np
-from retrieve import load_index, build_embeddings, activate_entities, rank_paragraphs
+from retrieve import load_index, build_embeddings, activate_entities, rank_paragraphs, load_para_emb
 
 # 一小撮常见“国籍/民族”形容词（demo 用，够我们先跑通）
 DEMONYMS = [
@@ -54,10 +54,11 @@ def main():
     # 加载索引与句向量
     meta, M, C = load_index()
     model, sent_emb = build_embeddings(meta["sents"])
+    para_emb = load_para_emb(meta, sent_emb)
 
     # 两步检索
     act_e = activate_entities(query, model, sent_emb, M, meta, R=50, sim_th=0.35, rounds=1)
-    results = rank_paragraphs(query, model, sent_emb, C, meta, act_e, alpha=0.3, topk=topk)
+    results = rank_paragraphs(query, model, sent_emb, C, meta, act_e, alpha=0.3, topk=topk, para_emb=para_emb)
 
     # 拼接证据文本
     evidences = []
@@ -1,55 +1,21 @@
 # src/answer_drugs.py —— 更稳的药名抽取：同义词表 + 文本归一化 + 宽松匹配
 
-import os, sys, re
-from collections import Counter
-from retrieve import load_index, build_embeddings, activate_entities
-from ppr_retrieve import rank_paragraphs_ppr
-
-# 统一到“规范名”: [各种写法/别名]
-ALIASES = {
-    "vancomycin": ["vancomycin"],
-    "linezolid": ["linezolid"],
-    "daptomycin": ["daptomycin"],
-    "teicoplanin": ["teicoplanin"],
-    "ceftaroline": ["ceftaroline"],
-    "clindamycin": ["clindamycin"],
-    "doxycycline": ["doxycycline"],
-    "trimethoprim-sulfamethoxazole": [
-        "trimethoprim-sulfamethoxazole",
-        "trimethoprim sulfamethoxazole",
-        "trimethoprim/sulfamethoxazole",
-        "tmp-smx", "co-trimoxazole", "cotrimoxazole"
-    ],
-    "nafcillin": ["nafcillin"],
-    "oxacillin": ["oxacillin"],
-    "dicloxacillin": ["dicloxacillin"],
-    "flucloxacillin": ["flucloxacillin"],
-    "cefazolin": ["cefazolin"],
-    "cephalexin": ["cephalexin"],
-    "gentamicin": ["gentamicin"],
-    "rifampin": ["rifampin", "rifampicin"],
-    "tetracycline": ["tetracycline"],
-}
-
-def normalize_text(s: str) -> str:
-    s = s.lower()
-    s = s.replace("–", "-").replace("—", "-")
-    s = s.replace("/", " ").replace("-", " ")
-    s = re.sub(r"\s+", " ", s)
-    return s
-
-def boundary_loose_contains(text_norm: str, alias_norm: str) -> bool:
-    # 宽松边界：前后不是字母数字即可
-    pat = re.compile(rf"(?<![a-z0-9]){re.escape(alias_norm)}(?![a-z0-9])", re.I)
-    return bool(pat.search(text_norm))
-
-def main():
-    if len(sys.argv) < 2:
-        print('用法：python src\\answer_drugs.py "你的问题" [topk]')
-        return
-    query = sys.argv[1]
-    topk = int(sys.argv[2]) if len(sys.argv) >= 3 else 12
+import os, sys
+import numpy as np
+from retrieve import load_index, build_embeddings, activate_entities, activate_from_qv, load_para_emb, \
+    SENT_EMB_PATH, encode, evidence_spans, highlight
+from ppr_retrieve import rank_paragraphs_ppr, score_paragraphs_ppr, order_paragraphs, load_transition, load_kw_hits
+from drug_extractor import load_drug_hits, rank_drugs_in_rows, first_hit_ranks
+from ann_index import ANN_NPROBE, SENT_IVF_PATH, load_ivf
+from quant_store import load_quant, pop_quant_arg
+from meta_store import doc_rows
 
+def load_kg_context(ann=False, nprobe=ANN_NPROBE, quant=None):
+    """
+    一次性加载 KG+PPR 答题要用的全部东西（索引、模型、句向量、缓存矩阵）；
+    ann=True 时再加载句向量的 IVF 索引，激活实体只在最近的 nprobe 个桶里找相似句；
+    quant=f16 / int8 / int8_dim 时激活实体的第一遍用句向量的压缩副本（quant_store.py）
+    """
     # 切到工程根
     here = os.path.dirname(os.path.abspath(__file__))
     root = os.path.abspath(os.path.join(here, os.pardir))
@@ -57,33 +23,94 @@ def main():
 
     meta, M, C = load_index()
     model, sent_emb = build_embeddings(meta["sents"])
-    seeds = activate_entities(query, model, sent_emb, M, meta, R=100, sim_th=0.25, rounds=1)
-    results = rank_paragraphs_ppr(query, model, sent_emb, M, C, meta, seeds, topk=topk)
+    # 药名：建索引时已按 KG 口径（drug_extractor.KG_ALIASES，normalize_text + 宽松边界）逐段抽好
+    drug_hits, canon = load_drug_hits("kg")
+    if drug_hits.shape[0] != len(meta["docs"]):
+        raise RuntimeError("药名命中矩阵与 index_meta/ 段落数不一致，请重新运行 build_index.py")
+    row_of = doc_rows(meta)   # 段落 ID -> 行号（二分查找，不展开成 dict）
+    return {
+        "meta": meta, "M": M, "C": C, "model": model, "sent_emb": sent_emb,
+        "para_emb": load_para_emb(meta, sent_emb),
+        "trans": load_transition(M, C),
+        "kw_hits": load_kw_hits(meta),
+        "drug_hits": drug_hits, "canon": canon, "row_of": row_of,
+        "ann": load_ivf(SENT_IVF_PATH, SENT_EMB_PATH, sent_emb, nprobe=nprobe) if ann else None,
+        "quant": load_quant(SENT_EMB_PATH, quant, sent_emb) if quant else None,
+    }
 
-    texts = [meta["doc_texts"].get(pid, "") for pid, _ in results]
-    texts_norm = [normalize_text(t) for t in texts]
+def answer_kg(query, topk, ctx):
+    """
+    KG+PPR 检索 Top-K 段落，再取这些段落里的药名。
+    返回 {"drugs": [按命中段落数排好的规范名], "hits": [(规范名, 段落数)], "results": [(pid, score)],
+          "evidence": {pid: (起, 止)}（每段与问题最像的那句在原文里的区间）}
+    """
+    meta, M, C = ctx["meta"], ctx["M"], ctx["C"]
+    model, sent_emb = ctx["model"], ctx["sent_emb"]
+    qv = encode(model, query)   # 激活实体与找证据句共用一次编码
+    seeds = activate_from_qv(qv, sent_emb, M, R=100, sim_th=0.25, rounds=1, ann=ctx.get("ann"), quant=ctx.get("quant"))
+    results = rank_paragraphs_ppr(query, model, sent_emb, M, C, meta, seeds, topk=topk, para_emb=ctx["para_emb"],
+                                  trans=ctx["trans"], kw_hits=ctx["kw_hits"])
+    # Top-K 段落的行求和 —— 每段每个规范名只计一次
+    hits = rank_drugs_in_rows(ctx["drug_hits"], [ctx["row_of"][pid] for pid, _ in results], ctx["canon"])
+    return {"drugs": [name for name, _ in hits], "hits": hits, "results": results,
+            "evidence": evidence_spans(meta, sent_emb, qv, results)}
+
+def answer_kg_sweep(query, ks, ctx):
+    """
+    一次检索扫多个 K：激活、PPR、打分、排序都只做一次，各 K 取排序前缀。
+    返回 {K: {"drugs": [规范名，按别名表顺序], "results": [(pid, score)]}}；
+    每个 K 的药名集合与 answer_kg(query, K, ctx) 一致（只是顺序不按命中段落数）。
+    """
+    meta, M, C = ctx["meta"], ctx["M"], ctx["C"]
+    model, sent_emb = ctx["model"], ctx["sent_emb"]
+    seeds = activate_entities(query, model, sent_emb, M, meta, R=100, sim_th=0.25, rounds=1, ann=ctx.get("ann"),
+                              quant=ctx.get("quant"))
+    para_ids, score, kw_ab = score_paragraphs_ppr(query, model, sent_emb, M, C, meta, seeds, para_emb=ctx["para_emb"],
+                                                  trans=ctx["trans"], kw_hits=ctx["kw_hits"])
+    orders = order_paragraphs(score, kw_ab, ks)
+
+    # 各 K 的顺序只来自两种排序（药名过滤后 / 全量），同一排序只在最长前缀上算一次「首次出现名次」
+    ranked = []   # [(最长前缀, 每个规范名首次出现的名次)]
+    out = {}
+    for k in sorted(ks, reverse=True):
+        order = orders[k]
+        for longest, first in ranked:
+            if np.array_equal(longest[:len(order)], order):
+                break
+        else:
+            first = first_hit_ranks(ctx["drug_hits"], [ctx["row_of"][para_ids[i]] for i in order])
+            ranked.append((order, first))
+        out[k] = {
+            "drugs": [ctx["canon"][ci] for ci in np.flatnonzero(first < len(order))],
+            "results": [(para_ids[i], float(score[i])) for i in order],
+        }
+    return {k: out[k] for k in ks}
+
+def main():
+    use_ann = "--ann" in sys.argv   # 句向量走 IVF 近似检索（ann_index.py）
+    quant, argv = pop_quant_arg([a for a in sys.argv if a != "--ann"])   # 句向量第一遍用压缩副本
+    if len(argv) < 2:
+        print('用法：python src\\answer_drugs.py "你的问题" [topk] [--ann] [--quant int8]')
+        return
+    query = argv[1]
+    topk = int(argv[2]) if len(argv) >= 3 else 12
 
-    hits = Counter()
-    for t in texts_norm:
-        for canon, variants in ALIASES.items():
-            for v in variants:
-                if boundary_loose_contains(t, normalize_text(v)):
-                    hits[canon] += 1
-                    break  # 该规范名已命中一次就够
+    ctx = load_kg_context(ann=use_ann, quant=quant)
+    ans = answer_kg(query, topk, ctx)
+    meta = ctx["meta"]
 
     print("\n================= QUERY =================")
     print(query)
     print("=============== ANSWER (drug list) =============")
-    if hits:
-        ordered = [name for name, _ in hits.most_common()]
-        print(", ".join(ordered))
+    if ans["drugs"]:
+        print(", ".join(ans["drugs"]))
     else:
         print("(Top-K 未匹配到药名；可以把 K 提到 20，或再精炼语料)")
 
     print("============= CITATIONS (Top-K) =============")
-    for i, (pid, sc) in enumerate(results, 1):
+    for i, (pid, sc) in enumerate(ans["results"], 1):
         text = meta["doc_texts"].get(pid, "")
-        short = (text[:260] + "…") if len(text) > 260 else text
+        short = highlight(text, ans["evidence"].get(pid), 260)
         print(f"[{i}] pid={pid}  score={sc:.4f}\n    {short}\n")
 
 if __name__ == "__main__":
@@ -1,60 +1,37 @@
 # -*- coding: utf-8 -*-
 # BM25 基线 + 药名抽取（与 ppr+kw 的 answer_drugs.py 对照）
-import json, re, sys
-from rank_bm25 import BM25Okapi
+# 检索走共享的落盘 BM25 索引（index_bm25/，见 bm25_index.py），不再每次现建
+import re, sys
 
-# —— 简单的同义词/别名归一化（和你之前的一致，足够覆盖 MRSA/MSSA 常见用药）——
-ALIASES = {
-    "vancomycin": ["vancomycin", "vanco"],
-    "linezolid": ["linezolid", "zyvox"],
-    "daptomycin": ["daptomycin", "cubicin"],
-    "teicoplanin": ["teicoplanin"],
-    "ceftaroline": ["ceftaroline", "tazef", "teflaro"],
-    "clindamycin": ["clindamycin"],
-    "doxycycline": ["doxycycline"],
-    "tetracycline": ["tetracycline", "minocycline", "minocyclin"],
-    "trimethoprim-sulfamethoxazole": [
-        "trimethoprim-sulfamethoxazole","trimethoprim sulfamethoxazole",
-        "tmp-smx","tmp smx","co-trimoxazole","cotrimoxazole","bactrim","septra"
-    ],
-    "oxacillin": ["oxacillin", "cloxacillin", "flucloxacillin"],
-    "nafcillin": ["nafcillin"],
-    "cefazolin": ["cefazolin"],
-    "cephalexin": ["cephalexin", "keflex"],
-    "dicloxacillin": ["dicloxacillin"],
-    "gentamicin": ["gentamicin"],
-    "rifampin": ["rifampin", "rifampicin"],
-    # 你数据里出现过的新药也加上
-    "levonadifloxacin": ["levonadifloxacin"],
-}
+from bm25_index import tokenize, get_text, load_bm25_index, bm25_topk, fetch_docs
+from drug_extractor import load_drug_hits, drugs_in_rows, drugs_by_prefix
 
-def norm(s: str) -> str:
-    s = s.lower()
-    s = re.sub(r'\s+', ' ', s)
-    return s
-
-def contains(text_norm: str, alias_norm: str) -> bool:
-    # 宽松包含，兼容连字符/空格/斜杠等写法
-    return alias_norm in text_norm
-
-def load_docs(path="data/docs.jsonl"):
-    docs = []
-    with open(path, "r", encoding="utf-8") as f:
-        for line in f:
-            if not line.strip():
-                continue
-            j = json.loads(line)
-            pid = j.get("pid") or j.get("id") or "?"
-            text = j.get("text") or j.get("abstract") or ""
-            if text:
-                docs.append((pid, text))
-    if not docs:
+def load_bm25_context():
+    """落盘 BM25 索引 + BM25 口径的药名命中矩阵"""
+    index = load_bm25_index()
+    if index["N"] == 0:
         raise RuntimeError("data/docs.jsonl 为空，先运行 prepare_pubmed.py")
-    return docs
+    drug_hits, canon = load_drug_hits("bm25")
+    return {"index": index, "drug_hits": drug_hits, "canon": canon}
+
+def answer_bm25(query, K, ctx):
+    """
+    BM25 取 Top-K 文献（MaxScore 剪枝），药名 = 这些文献在命中矩阵上的行求和
+    （BM25 口径：小写 + 压空白后子串包含）。
+    返回 {"drugs": [规范名，按别名表顺序], "rows": 文献行号, "scores": 分数}
+    """
+    top_idx, top_sc = bm25_topk(tokenize(query), ctx["index"], K)
+    drugs = drugs_in_rows(ctx["drug_hits"], top_idx, ctx["canon"])
+    return {"drugs": drugs, "rows": top_idx, "scores": top_sc}
 
-def tokenize(s: str):
-    # 非字母数字都当分隔
-    return re.findall(r"[A-Za-z0-9\-+/\.]+", s.lower())
+def answer_bm25_sweep(query, ks, ctx):
+    """
+    一次检索扫多个 K：只取一次 max(ks) 的 Top-K，小 K 是它的前缀；
+    返回 {K: {"drugs", "rows", "scores"}}，与逐个 K 调 answer_bm25 一致。
+    """
+    top_idx, top_sc = bm25_topk(tokenize(query), ctx["index"], max(ks))
+    by_k = drugs_by_prefix(ctx["drug_hits"], top_idx, ctx["canon"], ks)
+    return {k: {"drugs": by_k[k], "rows": top_idx[:k], "scores": top_sc[:k]} for k in ks}
 
 def main():
     if len(sys.argv) < 2:
@@ -63,28 +40,14 @@ def main():
     query = sys.argv[1]
     K = int(sys.argv[2]) if len(sys.argv) > 2 else 20
 
-    docs = load_docs()
-    corpus_tokens = [tokenize(text) for _, text in docs]
-    bm25 = BM25Okapi(corpus_tokens)
-
-    scores = bm25.get_scores(tokenize(query))
-    # 取分数 Top-K 索引
-    top_idx = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)[:K]
-    top = [(docs[i][0], docs[i][1], scores[i]) for i in top_idx]
-
-    # 抽药名
-    found = []
-    found_set = set()
-    all_text = " \n ".join([t for _, t, _ in top])
-    all_text_norm = norm(all_text)
-
-    for canon, alias_list in ALIASES.items():
-        for a in alias_list:
-            if contains(all_text_norm, norm(a)):
-                if canon not in found_set:
-                    found.append(canon)
-                    found_set.add(canon)
-                break
+    ctx = load_bm25_context()
+    ans = answer_bm25(query, K, ctx)
+    found = ans["drugs"]
+    # 只把这 K 篇原文从 docs.jsonl 读出来做引文
+    top = []
+    for sc, j in zip(ans["scores"], fetch_docs(ctx["index"], ans["rows"])):
+        pid = j.get("pid") or j.get("id") or "?"
+        top.append((pid, get_text(j), sc))
 
     print("\n================ QUERY =================")
     print(query)
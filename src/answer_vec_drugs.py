@@ -1,120 +1,22 @@
 import argparse
 import json
 import os
-from typing import List, Dict, Set, Tuple
+from pathlib import Path
+from typing import List, Dict, Tuple
 
 import numpy as np
 from sentence_transformers import SentenceTransformer
 
-
-DOCS_PATH = os.path.join("data", "docs.jsonl")
-VEC_EMB_PATH = os.path.join("data", "index_vec_emb.npy")
+# 药名表与抽取器统一放在 drug_extractor.py
+from drug_extractor import get_extractor, load_drug_hits, drugs_in_rows
+from vec_retrieve import vec_topk, load_vec_docs
+from ann_index import ANN_NPROBE, VEC_IVF_PATH, load_ivf
+from quant_store import QUANT_MODES, load_quant
 
 
-# 你关心的“标准药物名”列表（和 qa_med_questions.jsonl 里的 gold 一致）
-CANON_DRUGS: List[str] = [
-    # Staph / MRSA 相关
-    "cefazolin",
-    "ceftaroline",
-    "cephalexin",
-    "clindamycin",
-    "daptomycin",
-    "dicloxacillin",
-    "doxycycline",
-    "flucloxacillin",
-    "gentamicin",
-    "linezolid",
-    "nafcillin",
-    "oxacillin",
-    "rifampin",
-    "teicoplanin",
-    "tetracycline",
-    "trimethoprim-sulfamethoxazole",
-    "vancomycin",
-
-    # 尿路感染
-    "fosfomycin",
-    "nitrofurantoin",
-
-    # 呼吸道 / 肺炎
-    "amoxicillin",
-    "azithromycin",
-    "clarithromycin",
-
-    # 咽炎
-    "penicillin v",
-    "benzathine penicillin g",
-
-    # 蜂窝织炎
-    "amoxicillin-clavulanate",
-
-    # 幽门螺杆菌
-    "levofloxacin",
-    "metronidazole",
-
-    # 抗假单胞菌
-    "cefepime",
-    "ceftazidime",
-    "ciprofloxacin",
-    "imipenem-cilastatin",
-    "meropenem",
-    "piperacillin-tazobactam",
-]
-
-
-# 一点简单的别名（主要是连字符 / 斜杠 / 大写问题）
-DRUG_SYNONYMS: Dict[str, List[str]] = {
-    "trimethoprim-sulfamethoxazole": [
-        "trimethoprim-sulfamethoxazole",
-        "trimethoprim / sulfamethoxazole",
-        "trimethoprim-sulphamethoxazole",
-        "co-trimoxazole",
-        "cotrimoxazole",
-        "tmp-smx",
-        "tmp / smx",
-    ],
-    "amoxicillin-clavulanate": [
-        "amoxicillin-clavulanate",
-        "amoxicillin / clavulanate",
-        "amox-clav",
-        "co-amoxiclav",
-    ],
-    "penicillin v": [
-        "penicillin v",
-        "penicillin vk",
-    ],
-    "benzathine penicillin g": [
-        "benzathine penicillin g",
-        "benzathine benzylpenicillin",
-    ],
-    # 其他没写别名的，就用名字本身做匹配
-}
-
-
-def build_drug_pattern_map() -> Dict[str, List[str]]:
-    """把所有药名和别名都变成小写，用来做包含匹配。"""
-    pat = {}
-    for d in CANON_DRUGS:
-        base = d.lower()
-        pats = [base]
-        extra = DRUG_SYNONYMS.get(d, [])
-        pats.extend([e.lower() for e in extra])
-        pat[d] = pats
-    return pat
-
-
-DRUG_PATTERNS = build_drug_pattern_map()
-
-
-def load_docs(path: str = DOCS_PATH) -> List[Dict]:
-    docs = []
-    with open(path, "r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            docs.append(json.loads(line))
-    return docs
+VEC_EMB_PATH = os.path.join("data", "index_vec_emb.npy")
+VEC_META_PATH = os.path.join("data", "index_vec_meta.json")
+VEC_MODEL = "sentence-transformers/all-mpnet-base-v2"
 
 
 def doc_text(doc: Dict) -> str:
@@ -134,8 +36,8 @@ def doc_text(doc: Dict) -> str:
     return "\n\n".join(parts)
 
 
-def load_vec_index() -> np.ndarray:
-    emb = np.load(VEC_EMB_PATH)
+def load_vec_index(mmap_mode=None) -> np.ndarray:
+    emb = np.load(VEC_EMB_PATH, mmap_mode=mmap_mode)
     return emb
 
 
@@ -145,14 +47,26 @@ def normalize_matrix(mat: np.ndarray) -> np.ndarray:
     return mat / norms
 
 
+def rows_normalized(mat: np.ndarray, n_check: int = 1024, tol: float = 1e-3) -> bool:
+    """均匀抽 n_check 行看模长是否都≈1（建库时 normalize_embeddings=True）；只读这几行，不碰整份 mmap"""
+    if mat.shape[0] == 0:
+        return True
+    rows = np.unique(np.linspace(0, mat.shape[0] - 1, min(n_check, mat.shape[0])).astype(np.int64))
+    norms = np.linalg.norm(np.asarray(mat[rows], dtype=np.float32), axis=1)
+    return bool(np.all(np.abs(norms - 1) < tol))
+
+
 def vec_search(
     query: str,
     model: SentenceTransformer,
     emb: np.ndarray,
     top_k: int = 10,
+    ann: Dict = None,
 ) -> Tuple[np.ndarray, np.ndarray]:
-    """用向量相似度做 Top-K 检索。"""
+    """用向量相似度做 Top-K 检索；ann 为 IVF 索引时走近似检索（见 vec_retrieve.vec_topk）。"""
     q_vec = model.encode([query], normalize_embeddings=True)[0]
+    if ann is not None:
+        return vec_topk(q_vec, emb, top_k, ann=ann)
     emb_norm = normalize_matrix(emb)
     scores = emb_norm @ q_vec
     idx = np.argsort(-scores)[:top_k]
@@ -160,17 +74,60 @@ def vec_search(
 
 
 def extract_drugs_from_text(text: str) -> List[str]:
-    """在一段大文本里，看看有哪些药名 / 别名出现过。"""
-    txt = text.lower()
-    found: Set[str] = set()
+    """在一段大文本里，看看有哪些药名 / 别名出现过（一遍扫描）。"""
+    return sorted(get_extractor("vec").extract(text))
+
+
+def extract_drugs_from_rows(idx, drug_hits=None) -> List[str]:
+    """Top-K 文献里出现过的药名：直接对建索引时存好的 文献 x 药名 命中矩阵做行求和。"""
+    H, canon = drug_hits if drug_hits is not None else load_drug_hits("vec")
+    return sorted(drugs_in_rows(H, idx, canon))
 
-    for canon_name, patterns in DRUG_PATTERNS.items():
-        for p in patterns:
-            if p in txt:
-                found.add(canon_name)
-                break
 
-    return sorted(found)
+def load_vec_context(model_name: str = VEC_MODEL, ann: bool = False, nprobe: int = ANN_NPROBE,
+                     quant: str = None) -> Dict:
+    """
+    一次性加载向量答题要用的东西：文献、归一化好的文献向量、向量模型、vec 口径药名命中矩阵；
+    文献只常驻 pid，原文按行从段落文本库（index_meta/）取（见 vec_retrieve.load_vec_docs），不再整份读 docs.jsonl；
+    ann=True 时再加载文献向量的 IVF 索引（ann_index.py），检索只探查 nprobe 个桶；
+    quant=f16 / int8 / int8_dim 时常驻内存的是压缩副本（quant_store.py），float32 原向量只 mmap
+    """
+    with open(VEC_META_PATH, "r", encoding="utf-8") as f:
+        docs = load_vec_docs(Path("data"), json.load(f))
+    emb = load_vec_index(mmap_mode="r")   # 只读 mmap，多个进程共享页缓存
+
+    if emb.shape[0] != len(docs):
+        raise RuntimeError(
+            f"向量条数 {emb.shape[0]} 和 {VEC_META_PATH} 条数 {len(docs)} 不一致，"
+            "请重新运行 build_vec_index_vec.py。"
+        )
+
+    print(f"🧠 加载向量模型：{model_name}")
+    model = SentenceTransformer(model_name)
+    if not rows_normalized(emb):
+        emb = normalize_matrix(emb)  # 老索引没归一化：只归一化一次（这时才整份进内存），之后每个 query 直接点积
+    if quant:
+        quant = load_quant(VEC_EMB_PATH, quant, emb)
+    if ann:
+        ann = load_ivf(VEC_IVF_PATH, VEC_EMB_PATH, emb, nprobe=nprobe)
+    return {
+        "docs": docs,
+        "emb": emb,
+        "model": model,
+        "drug_hits": load_drug_hits("vec"),
+        "ann": ann or None,
+        "quant": quant or None,
+    }
+
+
+def answer_vec(query: str, K: int, ctx: Dict) -> Dict:
+    """
+    向量检索 Top-K 文献，药名 = 这些文献在 vec 口径命中矩阵上的行求和。
+    返回 {"drugs": [规范名，按字母序], "rows": 文献行号, "scores": 分数}
+    """
+    q_vec = ctx["model"].encode([query], normalize_embeddings=True)[0]
+    idx, scores = vec_topk(q_vec, ctx["emb"], K, ann=ctx.get("ann"), quant=ctx.get("quant"))
+    return {"drugs": extract_drugs_from_rows(idx, ctx["drug_hits"]), "rows": idx, "scores": scores}
 
 
 def main():
@@ -182,35 +139,18 @@ def main():
         default=15,
         help="向量检索 Top-K 文献数（默认 15）",
     )
+    parser.add_argument("--ann", action="store_true", help="用 IVF 近似检索（见 ann_index.py）")
+    parser.add_argument("--nprobe", type=int, default=ANN_NPROBE, help="--ann 时探查的桶数")
+    parser.add_argument("--quant", choices=QUANT_MODES, default=None, help="第一遍用压缩向量（见 quant_store.py）")
     args = parser.parse_args()
 
-    # 1. 读文献 + 向量
-    docs = load_docs(DOCS_PATH)
-    emb = load_vec_index()
-
-    if emb.shape[0] != len(docs):
-        raise RuntimeError(
-            f"向量条数 {emb.shape[0]} 和 docs 条数 {len(docs)} 不一致，"
-            f"请确认 build_vec_index_vec.py 用的也是 {DOCS_PATH}。"
-        )
-
-    # 2. 加载向量模型
-    model_name = "sentence-transformers/all-mpnet-base-v2"
-
-    print(f"🧠 加载向量模型：{model_name}")
-    model = SentenceTransformer(model_name)
-
-    # 3. 做向量检索
-    idx, scores = vec_search(args.query, model, emb, top_k=args.k)
-
-    # 4. 把 Top-K 文献拼成一个“大作文”，从里面抽药名
-    big_chunks = []
-    for i in idx:
-        doc = docs[int(i)]
-        big_chunks.append(doc_text(doc))
-    big_text = "\n\n".join(big_chunks)
+    # 1~2. 读文献 + 向量 + 向量模型
+    ctx = load_vec_context(ann=args.ann, nprobe=args.nprobe, quant=args.quant)
+    docs = ctx["docs"]
 
-    drugs = extract_drugs_from_text(big_text)
+    # 3~4. 向量检索；Top-K 文献里的药名（命中矩阵行求和，不再拼“大作文”重扫）
+    ans = answer_vec(args.query, args.k, ctx)
+    idx, scores, drugs = ans["rows"], ans["scores"], ans["drugs"]
 
     # 5. 打印结果
     print("\n================ QUERY =================")
@@ -225,11 +165,11 @@ def main():
     print("============= CITATIONS (Top-K) =============")
     for rank, i in enumerate(idx):
         doc = docs[int(i)]
-        pmid = doc.get("pmid") or doc.get("PMID") or "?"
+        pid = doc.get("pid") or doc.get("pmid") or doc.get("PMID") or "?"
         title = (doc.get("title") or doc.get("Title") or "").strip()
         if len(title) > 180:
             title = title[:177] + "..."
-        print(f"[{rank+1}] pid=pmid_{pmid}  score={scores[rank]:.4f}")
+        print(f"[{rank+1}] pid={pid}  score={scores[rank]:.4f}")
         print(f"    {title}\n")
 
 
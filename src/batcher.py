@@ -0,0 +1,134 @@
+# src/batcher.py
+# 功能：查询编码的微批处理 —— 套在 SentenceTransformer 外面，接口照旧是 model.encode(texts, ...)；
+#       多个线程同时来的小 encode 请求先排队，凑够 max_batch 条或等满 max_wait_ms 就合成一次 encode，
+#       再把各自那几行向量还回去。等待窗口越长，并发高时批越大（吞吐高），单个请求的延迟也越高；
+#       max_wait_ms=0 只合并「正好同时在排队」的请求，不额外等。
+#       参数（normalize_embeddings 等）不同的请求分开编码；超过 max_batch 条的大请求（比如建句向量）直接透传。
+#       stats() 给出批大小分布，serve.py 的 /metrics 就是它。
+# 用法：from batcher import MicroBatcher
+#       model = MicroBatcher(SentenceTransformer(name), max_batch=32, max_wait_ms=2)
+#       model.encode([query], convert_to_numpy=True)   # 与原模型用法相同，可多线程并发调用
+
+import threading, time
+from collections import Counter
+
+import numpy as np
+
+
+class _Pending:
+    __slots__ = ("texts", "kw", "done", "result", "error", "t_enq")
+
+    def __init__(self, texts, kw):
+        self.texts = texts
+        self.kw = kw
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.t_enq = time.perf_counter()
+
+
+class MicroBatcher:
+    """
+    后台一个线程攒批：队列非空时，从第一条入队起最多等 max_wait_ms，或攒够 max_batch 条文本就发车。
+    模型的其他属性照常透传（__getattr__），可以直接放进各 *_context 的 "model" 位置。
+    """
+
+    def __init__(self, model, max_batch=32, max_wait_ms=2.0, name=None):
+        self.model = model
+        self.max_batch = max(1, int(max_batch))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000
+        self.name = name or getattr(model, "name", type(model).__name__)
+        self._cv = threading.Condition()
+        self._queue = []
+        self._lock = threading.Lock()   # 统计量
+        self.batch_sizes = Counter()    # 批大小（文本条数）-> 次数
+        self.n_requests = 0
+        self.n_bypass = 0
+        self.wait_ms = []               # 每个请求从入队到拿到结果的耗时（最近 10000 个）
+        self._thread = threading.Thread(target=self._loop, name=f"batcher-{self.name}", daemon=True)
+        self._thread.start()
+
+    def __getattr__(self, attr):
+        return getattr(self.model, attr)
+
+    def encode(self, texts, **kw):
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+        if len(texts) > self.max_batch or self.max_batch == 1:
+            with self._lock:
+                self.n_bypass += 1
+            out = self.model.encode(texts, **kw)
+            return out[0] if single else out
+
+        p = _Pending(texts, kw)
+        with self._cv:
+            self._queue.append(p)
+            self._cv.notify()
+        p.done.wait()
+        if p.error is not None:
+            raise p.error
+        with self._lock:
+            self.n_requests += 1
+            self.wait_ms.append((time.perf_counter() - p.t_enq) * 1000)
+            if len(self.wait_ms) > 10000:
+                del self.wait_ms[:len(self.wait_ms) - 10000]
+        return p.result[0] if single else p.result
+
+    def _take(self):
+        """等到有活，再在窗口内攒批；返回这一车的请求"""
+        with self._cv:
+            while not self._queue:
+                self._cv.wait()
+            deadline = self._queue[0].t_enq + self.max_wait
+            while sum(len(p.texts) for p in self._queue) < self.max_batch:
+                left = deadline - time.perf_counter()
+                if left <= 0:
+                    break
+                self._cv.wait(left)
+            batch, n = [], 0
+            while self._queue and n + len(self._queue[0].texts) <= self.max_batch:
+                n += len(self._queue[0].texts)
+                batch.append(self._queue.pop(0))
+            return batch
+
+    def _loop(self):
+        while True:
+            batch = self._take()
+            groups = {}
+            for p in batch:
+                groups.setdefault(tuple(sorted(p.kw.items())), []).append(p)
+            for key, ps in groups.items():
+                texts = [t for p in ps for t in p.texts]
+                try:
+                    out = self.model.encode(texts, **dict(key))
+                    err = None
+                except Exception as e:
+                    out, err = None, e
+                with self._lock:
+                    self.batch_sizes[len(texts)] += 1
+                s = 0
+                for p in ps:
+                    if err is None:
+                        p.result = out[s:s + len(p.texts)]
+                        s += len(p.texts)
+                    p.error = err
+                    p.done.set()
+
+    def stats(self):
+        with self._lock:
+            sizes = dict(sorted(self.batch_sizes.items()))
+            waits = np.asarray(self.wait_ms, dtype=np.float64)
+            n_batches = sum(sizes.values())
+            n_texts = sum(k * v for k, v in sizes.items())
+            return {
+                "model": self.name,
+                "max_batch": self.max_batch,
+                "max_wait_ms": self.max_wait * 1000,
+                "requests": self.n_requests,
+                "bypass": self.n_bypass,
+                "batches": n_batches,
+                "mean_batch": n_texts / n_batches if n_batches else 0.0,
+                "batch_sizes": {str(k): v for k, v in sizes.items()},
+                "latency_p50_ms": float(np.percentile(waits, 50)) if waits.size else None,
+                "latency_p95_ms": float(np.percentile(waits, 95)) if waits.size else None,
+            }
@@ -0,0 +1,90 @@
+# src/bench_activate.py
+# 功能：activate_entities 的微基准 —— 旧版（逐句 getrow + 全量 argsort）vs 向量化版
+#       不需要加载模型：句向量 / 问题向量用随机单位向量代替，M 默认读真实索引
+# 用法：python src\bench_activate.py [--n-sents 0] [--queries 200] [--R 100] [--rounds 1]
+
+import argparse, time
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from retrieve import load_index, activate_from_qv
+
+def activate_loop(qv, sent_emb, M, R=50, sim_th=0.35, rounds=1):
+    """旧实现原样保留，用来对拍 + 计时"""
+    sim = (sent_emb @ qv)
+    top_idx = np.argsort(sim)[-R:]
+    S = set(np.where(sim >= sim_th)[0]) | set(top_idx)
+
+    act_e = set()
+    for sid in S:
+        row = M.getrow(sid)
+        act_e.update(row.indices.tolist())
+
+    for _ in range(rounds - 1):
+        if not act_e:
+            break
+        rows = M[:, list(act_e)].sum(axis=1).A1
+        cand = np.where(rows > 0)[0]
+        sim2 = (sent_emb[cand] @ qv)
+        more = set(cand[np.argsort(sim2)[-R:]])
+        S |= more
+        for sid in more:
+            row = M.getrow(sid)
+            act_e.update(row.indices.tolist())
+
+    return act_e
+
+def synth_M(n_sents, n_ents, ents_per_sent, rng):
+    """随机句子 x 实体矩阵；实体频率近似 Zipf"""
+    nnz = rng.poisson(ents_per_sent, size=n_sents)
+    rows = np.repeat(np.arange(n_sents), nnz)
+    cols = np.minimum(rng.zipf(1.3, size=rows.size) - 1, n_ents - 1)
+    M = csr_matrix((np.ones(rows.size, dtype=np.float32), (rows, cols)), shape=(n_sents, n_ents))
+    M.data[:] = 1.0
+    return M
+
+def unit_rows(n, dim, rng):
+    X = rng.standard_normal((n, dim)).astype(np.float32)
+    return X / np.linalg.norm(X, axis=1, keepdims=True)
+
+def timeit(fn, queries):
+    t0 = time.perf_counter()
+    out = [fn(q) for q in queries]
+    return (time.perf_counter() - t0) * 1000 / len(queries), out
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n-sents", type=int, default=0, help="0 = 用真实索引的 M；>0 = 随机生成这么多句")
+    ap.add_argument("--n-ents", type=int, default=50000)
+    ap.add_argument("--dim", type=int, default=384)
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--R", type=int, default=100)
+    ap.add_argument("--sim-th", type=float, default=0.25)
+    ap.add_argument("--rounds", type=int, default=1)
+    args = ap.parse_args()
+
+    rng = np.random.default_rng(0)
+    if args.n_sents > 0:
+        M = synth_M(args.n_sents, args.n_ents, 3.0, rng)
+    else:
+        _, M, _ = load_index()
+    n_sents = M.shape[0]
+    print(f"📐 M: {M.shape[0]} 句 x {M.shape[1]} 实体，nnz={M.nnz}；R={args.R} rounds={args.rounds}")
+
+    # 随机句向量 + “贴近某句”的问题向量，保证阈值以上有一些句子
+    sent_emb = unit_rows(n_sents, args.dim, rng)
+    anchors = rng.integers(0, n_sents, size=args.queries)
+    qs = sent_emb[anchors] + 0.8 * unit_rows(args.queries, args.dim, rng)
+    qs /= np.linalg.norm(qs, axis=1, keepdims=True)
+
+    kw = dict(R=args.R, sim_th=args.sim_th, rounds=args.rounds)
+    t_old, out_old = timeit(lambda q: activate_loop(q, sent_emb, M, **kw), qs)
+    t_new, out_new = timeit(lambda q: activate_from_qv(q, sent_emb, M, **kw), qs)
+
+    same = sum(1 for a, b in zip(out_old, out_new) if set(a) == b)
+    print(f"旧版（逐句 getrow）：{t_old:8.3f} ms/query")
+    print(f"向量化版         ：{t_new:8.3f} ms/query   加速 {t_old / max(t_new, 1e-9):.1f}x")
+    print(f"实体集合一致：{same}/{len(qs)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+# src/bench_bm25.py
+# 功能：BM25 基准 —— 旧的逐篇逐词纯 Python 打分 vs 稀疏矩阵打分（bm25_index.py）
+#       300 篇 = 真实语料；30k / 300k = 按真实语料的词频分布与文献长度分布随机合成
+#       查询 = data/qa_med_questions.jsonl 里的问题；同时核对分数与 Top-K 是否一致
+#       另测 MaxScore 剪枝 Top-K（maxscore_topk）：耗时、实际扫过的倒排占比、与全量 Top-K 是否一致；
+#       --stopwords 时再测一遍去停用词后的查询（结果会变，只看耗时）
+# 用法：python src\bench_bm25.py [--sizes 300,30000,300000] [--legacy-max 30000] [--stopwords]
+
+import argparse, math, time
+from collections import Counter
+
+import numpy as np
+
+from bm25_index import bm25_weights, topk_indices, term_upper_bounds, maxscore_topk, STOPWORDS
+from qa_med_eval_bm25 import DOC_PATH, QA_PATH, load_docs, load_questions, get_text, tokenize
+
+K1, B, TOP_K = 1.5, 0.75, 20
+
+# ---------- 旧实现（原 qa_med_eval_bm25 的逻辑，仅作对照） ----------
+
+def legacy_build(term_ids, doc_ids, tf, n_docs):
+    doc_tfs = [dict() for _ in range(n_docs)]
+    for t, d, f in zip(term_ids.tolist(), doc_ids.tolist(), tf.tolist()):
+        doc_tfs[d][t] = f
+    df = Counter(term_ids.tolist())
+    return doc_tfs, df
+
+def legacy_scores(q_ids, doc_tfs, doc_lens, df, N, avgdl, k1=K1, b=B):
+    scores = []
+    for i, tf in enumerate(doc_tfs):
+        dl = doc_lens[i]
+        score = 0.0
+        for t in q_ids:
+            f = tf.get(t, 0)
+            if f == 0:
+                continue
+            n_q = df.get(t, 0)
+            idf = math.log((N - n_q + 0.5) / (n_q + 0.5) + 1.0)
+            denom = f + k1 * (1 - b + b * dl / (avgdl + 1e-9))
+            score += idf * f * (k1 + 1) / denom
+        scores.append(score)
+    return scores
+
+# ---------- 语料：真实 / 合成，统一成 (词id, 文献id, 词频) 三元组 ----------
+
+def real_corpus():
+    docs = load_docs(DOC_PATH)
+    vocab = {}
+    term_ids, doc_ids, tfs, doc_lens = [], [], [], []
+    unigram = Counter()
+    for d, doc in enumerate(docs):
+        tokens = tokenize(get_text(doc))
+        doc_lens.append(len(tokens))
+        unigram.update(tokens)
+        for term, f in Counter(tokens).items():
+            term_ids.append(vocab.setdefault(term, len(vocab))); doc_ids.append(d); tfs.append(f)
+    p = np.zeros(len(vocab))
+    for term, c in unigram.items():
+        p[vocab[term]] = c
+    return (np.array(term_ids), np.array(doc_ids), np.array(tfs), np.array(doc_lens)), vocab, p / p.sum()
+
+def synth_corpus(n_docs, p, lens, rng):
+    """每篇长度从真实长度分布里抽，词从真实 unigram 分布里抽"""
+    V = len(p)
+    L = rng.choice(lens, size=n_docs)
+    toks = rng.choice(V, size=int(L.sum()), p=p)
+    docs = np.repeat(np.arange(n_docs, dtype=np.int64), L)
+    key, tf = np.unique(docs * V + toks, return_counts=True)
+    return key % V, key // V, tf, L
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="300,30000,300000")
+    ap.add_argument("--legacy-max", type=int, default=30000, help="超过这个规模就不跑旧实现（太慢）")
+    ap.add_argument("--stopwords", action="store_true", help="加测去停用词后的 MaxScore")
+    args = ap.parse_args()
+
+    real, vocab, p = real_corpus()
+    questions = [q["question"] for q in load_questions(QA_PATH)]
+    q_ids = [[vocab[t] for t in tokenize(q) if t in vocab] for q in questions]
+    q_ids_sw = [[vocab[t] for t in tokenize(q) if t in vocab and t not in STOPWORDS] for q in questions]
+    rng = np.random.default_rng(0)
+    maxscore_rows = []
+
+    print(f"{'N':>8} {'build_old(s)':>13} {'build_new(s)':>13} {'q_old(ms)':>10} {'q_new(ms)':>10} {'speedup':>8}  check")
+    for n in [int(x) for x in args.sizes.split(",")]:
+        term_ids, doc_ids, tf, doc_lens = real if n == len(real[3]) else synth_corpus(n, p, real[3], rng)
+        N = len(doc_lens)
+
+        t0 = time.perf_counter()
+        W, avgdl = bm25_weights(term_ids, doc_ids, tf, len(vocab), doc_lens, k1=K1, b=B)
+        t_build_new = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        new = []
+        for ids in q_ids:
+            s = np.asarray(W[ids].sum(axis=0)).ravel() if ids else np.zeros(N)
+            new.append((s, topk_indices(s, TOP_K)))
+        t_q_new = (time.perf_counter() - t0) * 1000 / len(q_ids)
+
+        index = {"W": W, "N": N, "term_max": term_upper_bounds(W)}
+        t0 = time.perf_counter()
+        pruned = [maxscore_topk(ids, index, TOP_K) for ids in q_ids]
+        t_q_ms = (time.perf_counter() - t0) * 1000 / len(q_ids)
+        touched = sum(st["touched"] for _, _, st in pruned) / max(sum(st["postings"] for _, _, st in pruned), 1)
+        same_ms = all(np.array_equal(top, tb) for (top, _, _), (_, tb) in zip(pruned, new))
+        row = [N, t_q_new, t_q_ms, touched, same_ms]
+        if args.stopwords:
+            t0 = time.perf_counter()
+            for ids in q_ids_sw:
+                maxscore_topk(ids, index, TOP_K)
+            row.append((time.perf_counter() - t0) * 1000 / len(q_ids_sw))
+        maxscore_rows.append(row)
+
+        if N <= args.legacy_max:
+            t0 = time.perf_counter()
+            doc_tfs, df = legacy_build(term_ids, doc_ids, tf, N)
+            t_build_old = time.perf_counter() - t0
+            t0 = time.perf_counter()
+            old = []
+            for ids in q_ids:
+                s = legacy_scores(ids, doc_tfs, doc_lens.tolist(), df, N, avgdl)
+                old.append((s, sorted(range(len(s)), key=lambda i: s[i], reverse=True)[:TOP_K]))
+            t_q_old = (time.perf_counter() - t0) * 1000 / len(q_ids)
+            max_diff = max(float(np.abs(np.asarray(a) - b).max()) for (a, _), (b, _) in zip(old, new))
+            same_top = all(list(tb) == ta for (_, ta), (_, tb) in zip(old, new))
+            check = f"max|Δ|={max_diff:.1e} topK一致={same_top}"
+            print(f"{N:>8} {t_build_old:>13.2f} {t_build_new:>13.2f} {t_q_old:>10.2f} {t_q_new:>10.3f} "
+                  f"{t_q_old / max(t_q_new, 1e-9):>7.0f}x  {check}")
+        else:
+            print(f"{N:>8} {'-':>13} {t_build_new:>13.2f} {'-':>10} {t_q_new:>10.3f} {'-':>8}  (跳过旧实现)")
+
+    print(f"\nMaxScore Top-{TOP_K}")
+    head = f"{'N':>8} {'全量(ms)':>10} {'MaxScore(ms)':>13} {'扫过倒排':>9} {'topK一致':>9}"
+    print(head + (f" {'去停用词(ms)':>13}" if args.stopwords else ""))
+    for row in maxscore_rows:
+        line = f"{row[0]:>8} {row[1]:>10.3f} {row[2]:>13.3f} {row[3]:>8.1%} {str(row[4]):>9}"
+        print(line + (f" {row[5]:>13.3f}" if args.stopwords else ""))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+# src/bench_extract.py
+# 功能：药名抽取基准 —— 四个脚本原来的写法 vs 统一的 DrugExtractor（drug_extractor.py）
+#       1) 在 data/docs.jsonl 每篇文献上核对结果是否完全一致，并计时
+#       2) 别名表从几十个扩到几千个（随机合成药名），看扫描耗时是否随词表增长
+#       3) 随机 Top-K 文献集合：拼接大文本重扫 vs 文献 x 药名 命中矩阵行求和
+# 用法：python src\bench_extract.py [--sizes 30,300,3000] [--reps 3] [--k 20]
+
+import argparse, json, os, re, time
+
+import numpy as np
+
+from drug_extractor import (
+    DrugExtractor, normalize_text, KG_ALIASES, BM25_ALIASES, build_drug_pattern_map,
+    get_extractor, build_drug_hits, drugs_in_rows,
+)
+
+SRC = os.path.dirname(os.path.abspath(__file__))
+DOCS_PATH = os.path.join(os.path.dirname(SRC), "data", "docs.jsonl")
+
+# ---------- 旧写法（仅作对照） ----------
+
+def legacy_loose(text, aliases):
+    """answer_drugs：每个别名一个正则，前后不是字母数字"""
+    t = normalize_text(text)
+    out = []
+    for canon, variants in aliases.items():
+        for v in variants:
+            pat = re.compile(rf"(?<![a-z0-9]){re.escape(normalize_text(v))}(?![a-z0-9])", re.I)
+            if pat.search(t):
+                out.append(canon)
+                break
+    return out
+
+def legacy_space(text, aliases):
+    """answer_drugs_bm25：小写 + 压空白后子串包含"""
+    norm = lambda s: re.sub(r"\s+", " ", s.lower())
+    t = norm(text)
+    return [canon for canon, variants in aliases.items() if any(norm(a) in t for a in variants)]
+
+def legacy_lower(text, patterns):
+    """answer_vec_drugs：小写后逐个子串包含"""
+    t = text.lower()
+    return sorted(canon for canon, pats in patterns.items() if any(p in t for p in pats))
+
+def legacy_regex(text, lexicon):
+    """qa_med_eval_bm25：\\b(长词优先的大正则)\\b"""
+    parts = [re.escape(d) for d in sorted(lexicon, key=len, reverse=True)]
+    drug_re = re.compile(r"\b(" + "|".join(parts) + r")\b", re.I)
+    return sorted(set(m.group(0).lower() for m in drug_re.finditer(text)))
+
+# ---------- 计时 ----------
+
+def timeit(fn, texts, reps):
+    best = float("inf")
+    for _ in range(reps):
+        t0 = time.perf_counter()
+        for t in texts:
+            fn(t)
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000 / len(texts)
+
+def synth_lexicon(n, rng):
+    """随机合成 n 个药名样的小写词（-mycin / -cillin 之类的后缀）"""
+    sufs = ["mycin", "cillin", "floxacin", "cycline", "azole", "penem", "sporin"]
+    letters = np.array(list("abcdefghijklmnopqrstuvwxyz"))
+    out = set()
+    while len(out) < n:
+        out.add("".join(rng.choice(letters, size=rng.integers(3, 7))) + sufs[rng.integers(len(sufs))])
+    return sorted(out)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="30,300,3000")
+    ap.add_argument("--reps", type=int, default=3)
+    ap.add_argument("--k", type=int, default=20)
+    args = ap.parse_args()
+
+    with open(DOCS_PATH, "r", encoding="utf-8") as f:
+        docs = [json.loads(l) for l in f if l.strip()]
+    texts = [(d.get("title", "") + " " + (d.get("text") or d.get("abstract") or "")).strip() for d in docs]
+    vec_patterns = build_drug_pattern_map()
+    lexicon = sorted({a.lower() for v in KG_ALIASES.values() for a in v})
+
+    cases = [
+        ("answer_drugs (loose)", lambda t: legacy_loose(t, KG_ALIASES),
+         DrugExtractor(KG_ALIASES, normalize="loose", boundary="loose"), lambda ex, t: ex.extract(t)),
+        ("answer_drugs_bm25 (space)", lambda t: legacy_space(t, BM25_ALIASES),
+         DrugExtractor(BM25_ALIASES, normalize="space", boundary=None), lambda ex, t: ex.extract(t)),
+        ("answer_vec_drugs (lower)", lambda t: legacy_lower(t, vec_patterns),
+         DrugExtractor(vec_patterns, normalize="lower", boundary=None), lambda ex, t: sorted(ex.extract(t))),
+        ("qa_med_eval_bm25 (word)", lambda t: legacy_regex(t, lexicon),
+         DrugExtractor(lexicon, normalize="lower", boundary="word", overlapping=False),
+         lambda ex, t: sorted(set(ex.extract(t)))),
+    ]
+    print(f"📄 文献 {len(texts)} 篇\n")
+    print(f"{'写法':<28} {'旧(ms/篇)':>10} {'新(ms/篇)':>10}  一致")
+    for name, old_fn, ex, new_fn in cases:
+        same = all(old_fn(t) == new_fn(ex, t) for t in texts)
+        t_old = timeit(old_fn, texts, args.reps)
+        t_new = timeit(lambda t: new_fn(ex, t), texts, args.reps)
+        print(f"{name:<28} {t_old:>10.3f} {t_new:>10.3f}  {same}")
+
+    # find() 给出的原文位置：切出来再归一化应当就是某个别名
+    ex = cases[0][2]
+    ok = all(normalize_text(t[s:e]) in {normalize_text(a) for a in KG_ALIASES[c]}
+             for t in texts for c, s, e in ex.find(t))
+    print(f"\nfind() 偏移回到原文后与别名一致：{ok}")
+
+    print("\n别名表规模扩展（loose 写法；真实别名 + 合成药名）")
+    print(f"{'别名数':>8} {'旧(ms/篇)':>10} {'新(ms/篇)':>10}")
+    rng = np.random.default_rng(0)
+    for n in [int(x) for x in args.sizes.split(",")]:
+        aliases = dict(KG_ALIASES)
+        aliases.update({w: [w] for w in synth_lexicon(n, rng)})
+        ex = DrugExtractor(aliases, normalize="loose", boundary="loose")
+        t_old = timeit(lambda t: legacy_loose(t, aliases), texts[:30], 1)   # 旧写法太慢，只取 30 篇
+        t_new = timeit(ex.extract, texts, args.reps)
+        print(f"{n:>8} {t_old:>10.3f} {t_new:>10.3f}")
+
+    print(f"\nTop-{args.k} 集合取药名（200 组随机文献）")
+    print(f"{'口径':<6} {'重扫(ms)':>10} {'行求和(ms)':>11}  一致")
+    sets = [rng.choice(len(texts), size=min(args.k, len(texts)), replace=False) for _ in range(200)]
+    for profile in ["kg", "bm25", "vec"]:
+        ex = get_extractor(profile)
+        H = build_drug_hits(texts, ex)
+        rescan = lambda rows: ex.extract("\n\n".join(texts[i] for i in rows))
+        rowsum = lambda rows: drugs_in_rows(H, rows, ex.canon)
+        same = sum(rescan(r) == rowsum(r) for r in sets)
+        t_scan = timeit(rescan, sets, args.reps)
+        t_rows = timeit(rowsum, sets, args.reps)
+        print(f"{profile:<6} {t_scan:>10.3f} {t_rows:>11.3f}  {same}/{len(sets)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+# src/bench_latency.py
+# 功能：四条检索管线的分阶段延迟基准 —— BM25（qa_med_eval_bm25）/ 向量（vec_retrieve）/
+#       三部图（activate_entities + rank_paragraphs）/ KG+PPR（rank_paragraphs_ppr）
+#       阶段：index_load / model_load / encode / activate / ppr / rank / extract，分别计时；
+#       每阶段给 p50 / p95 / p99（ms）+ 每条管线的峰值 RSS，写 runs/bench_latency.json，方便跨 commit 对比。
+#       默认每条管线在单独的子进程里跑（加载耗时、峰值内存互不影响）；--inproc 则全在本进程里跑。
+# 用法：python src\bench_latency.py [--methods bm25,vec,tri,kg_ppr] [--repeat 5] [--warmup 1]
+#                                  [--baseline runs\bench_latency_old.json]
+
+import argparse, json, os, platform, subprocess, sys, time
+from pathlib import Path
+
+import numpy as np
+
+SRC = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(SRC)
+QA_PATH = os.path.join("data", "qa_med_questions.jsonl")
+OUT_JSON = os.path.join("runs", "bench_latency.json")
+METHODS = ["bm25", "vec", "tri", "kg_ppr"]
+STAGES = ["index_load", "model_load", "encode", "activate", "ppr", "rank", "extract"]
+QUERY_STAGES = STAGES[2:]
+CHILD_TAG = "BENCH_JSON "
+
+# ---------- 峰值内存 ----------
+
+def _peak_rss_windows():
+    import ctypes
+    from ctypes import wintypes
+
+    class PMC(ctypes.Structure):
+        _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD),
+                    ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                    ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t), ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                    ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t)]
+
+    pmc = PMC()
+    pmc.cb = ctypes.sizeof(PMC)
+    k32 = ctypes.windll.kernel32
+    k32.GetCurrentProcess.restype = wintypes.HANDLE
+    if not ctypes.windll.psapi.GetProcessMemoryInfo(k32.GetCurrentProcess(), ctypes.byref(pmc), pmc.cb):
+        return None
+    return pmc.PeakWorkingSetSize / 2**20
+
+def peak_rss_mb():
+    """本进程到目前为止的峰值常驻内存（MB）；Windows 没有 resource 模块，改走 psapi"""
+    try:
+        import resource
+    except ImportError:
+        try:
+            return _peak_rss_windows()
+        except (OSError, AttributeError):
+            return None
+    r = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return r / 2**20 if sys.platform == "darwin" else r / 2**10   # macOS 是字节，Linux 是 KB
+
+# ---------- 计时 ----------
+
+class StageTimes:
+    """阶段名 -> 每次耗时（ms）列表"""
+
+    def __init__(self):
+        self.ms = {}
+
+    def run(self, stage, fn, *args, **kw):
+        t0 = time.perf_counter()
+        out = fn(*args, **kw)
+        self.ms.setdefault(stage, []).append((time.perf_counter() - t0) * 1000)
+        return out
+
+def summarize(samples):
+    a = np.asarray(samples, dtype=np.float64)
+    return {"n": int(a.size), "mean_ms": float(a.mean()), "p50_ms": float(np.percentile(a, 50)),
+            "p95_ms": float(np.percentile(a, 95)), "p99_ms": float(np.percentile(a, 99)),
+            "max_ms": float(a.max())}
+
+# ---------- 四条管线：load(T) 返回上下文，query(T, ctx, q) 跑一题 ----------
+
+def load_bm25(T):
+    from bm25_index import load_bm25_index
+    from drug_extractor import load_drug_hits
+    from qa_med_eval_bm25 import DOC_PATH, build_drug_lexicon, build_drug_extractor, load_questions
+
+    def load():
+        index = load_bm25_index(docs_path=DOC_PATH)
+        drug_ext = build_drug_extractor(build_drug_lexicon(load_questions(QA_PATH)))
+        return index, load_drug_hits("qa_gold", drug_ext, docs_path=DOC_PATH)
+    index, drug_hits = T.run("index_load", load)
+    return {"index": index, "drug_hits": drug_hits}
+
+def query_bm25(T, ctx, q, k=20):
+    from bm25_index import tokenize, bm25_topk
+    from drug_extractor import drugs_in_rows
+
+    toks = T.run("encode", tokenize, q)
+    idx, _ = T.run("rank", bm25_topk, toks, ctx["index"], k)
+    return T.run("extract", drugs_in_rows, ctx["drug_hits"][0], idx, ctx["drug_hits"][1])
+
+def load_vec(T):
+    from sentence_transformers import SentenceTransformer
+    from vec_retrieve import load_vec_index
+    from drug_extractor import load_drug_hits
+    from qa_med_eval_vec import MODEL_NAME
+
+    emb, _, drug_hits = T.run("index_load", lambda: load_vec_index(Path(ROOT) / "data") + (load_drug_hits("vec"),))
+    model = T.run("model_load", SentenceTransformer, MODEL_NAME)
+    return {"emb": emb, "model": model, "drug_hits": drug_hits}
+
+def query_vec(T, ctx, q, k=20):
+    from vec_retrieve import encode_query, vec_topk
+    from answer_vec_drugs import extract_drugs_from_rows
+
+    q_emb = T.run("encode", encode_query, ctx["model"], q)
+    idx, _ = T.run("rank", vec_topk, q_emb, ctx["emb"], k)
+    return T.run("extract", extract_drugs_from_rows, idx, ctx["drug_hits"])
+
+def load_graph(T, with_ppr):
+    from sentence_transformers import SentenceTransformer
+    from retrieve import SENT_MODEL, load_index, load_sent_emb, load_para_emb
+    from ppr_retrieve import load_transition, load_kw_hits
+    from drug_extractor import load_drug_hits
+    from meta_store import doc_rows
+
+    model = T.run("model_load", SentenceTransformer, SENT_MODEL)
+
+    def load():
+        meta, M, C = load_index()
+        sent_emb = load_sent_emb(meta["sents"], model)
+        ctx = {"meta": meta, "M": M, "C": C, "model": model, "sent_emb": sent_emb,
+               "para_emb": load_para_emb(meta, sent_emb)}
+        if with_ppr:
+            ctx["trans"] = load_transition(M, C)
+            ctx["kw_hits"] = load_kw_hits(meta)
+        ctx["drug_hits"], ctx["canon"] = load_drug_hits("kg")
+        ctx["row_of"] = doc_rows(meta)
+        return ctx
+    return T.run("index_load", load)
+
+def query_tri(T, ctx, q, k=15):
+    from retrieve import encode, activate_from_qv, rank_paragraphs
+    from drug_extractor import rank_drugs_in_rows
+
+    qv = T.run("encode", encode, ctx["model"], q)
+    seeds = T.run("activate", activate_from_qv, qv, ctx["sent_emb"], ctx["M"], R=50, sim_th=0.35, rounds=1)
+    res = T.run("rank", rank_paragraphs, q, ctx["model"], ctx["sent_emb"], ctx["C"], ctx["meta"], seeds,
+                alpha=0.3, topk=k, para_emb=ctx["para_emb"], qv=qv)
+    return T.run("extract", rank_drugs_in_rows, ctx["drug_hits"], [ctx["row_of"][p] for p, _ in res], ctx["canon"])
+
+def query_kg_ppr(T, ctx, q, k=15):
+    from retrieve import encode, activate_from_qv
+    from ppr_retrieve import expand_query, entity_ppr_scores, rank_paragraphs_ppr, PPR_ALPHA
+    from drug_extractor import rank_drugs_in_rows
+
+    # 激活用原问题，段落相似度用扩展后的问题：两次编码都算 encode
+    qv, qv_exp = T.run("encode", lambda: (encode(ctx["model"], q), encode(ctx["model"], expand_query(q))))
+    seeds = T.run("activate", activate_from_qv, qv, ctx["sent_emb"], ctx["M"], R=100, sim_th=0.25, rounds=1)
+    P, deg = ctx["trans"]
+    r_ent = T.run("ppr", entity_ppr_scores, ctx["M"], ctx["C"], seeds, alpha=PPR_ALPHA, iters=50, P=P, deg=deg)
+    res = T.run("rank", rank_paragraphs_ppr, q, ctx["model"], ctx["sent_emb"], ctx["M"], ctx["C"], ctx["meta"], seeds,
+                topk=k, para_emb=ctx["para_emb"], trans=ctx["trans"], r_ent=r_ent, kw_hits=ctx["kw_hits"], qv=qv_exp)
+    return T.run("extract", rank_drugs_in_rows, ctx["drug_hits"], [ctx["row_of"][p] for p, _ in res], ctx["canon"])
+
+PIPELINES = {
+    "bm25": (load_bm25, query_bm25),
+    "vec": (load_vec, query_vec),
+    "tri": (lambda T: load_graph(T, with_ppr=False), query_tri),
+    "kg_ppr": (lambda T: load_graph(T, with_ppr=True), query_kg_ppr),
+}
+
+def bench_method(method, questions, repeat, warmup):
+    """跑一条管线：加载一次，问题集先热身 warmup 遍（不计），再计时 repeat 遍"""
+    load, query = PIPELINES[method]
+    T = StageTimes()
+    ctx = load(T)
+    rss_load = peak_rss_mb()
+    for _ in range(warmup):
+        for q in questions:
+            query(StageTimes(), ctx, q)
+    total = []
+    for _ in range(repeat):
+        for q in questions:
+            t0 = time.perf_counter()
+            query(T, ctx, q)
+            total.append((time.perf_counter() - t0) * 1000)
+    stages = {s: summarize(T.ms[s]) for s in STAGES if s in T.ms}
+    stages["query_total"] = summarize(total)
+    return {"stages": stages, "peak_rss_mb": peak_rss_mb(), "peak_rss_after_load_mb": rss_load}
+
+def run_child(method, args):
+    """单独子进程跑一条管线，结果从最后一行 BENCH_JSON 读回"""
+    cmd = [sys.executable, os.path.abspath(__file__), "--child", method, "--questions", args.questions,
+           "--repeat", str(args.repeat), "--warmup", str(args.warmup)]
+    cp = subprocess.run(cmd, cwd=ROOT, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    out = cp.stdout.decode("utf-8", errors="ignore")
+    for line in reversed(out.splitlines()):
+        if line.startswith(CHILD_TAG):
+            return json.loads(line[len(CHILD_TAG):])
+    err = cp.stderr.decode("utf-8", errors="ignore").strip().splitlines()
+    return {"error": err[-1] if err else f"returncode={cp.returncode}"}
+
+def git_commit():
+    try:
+        cp = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True)
+        return cp.stdout.strip() or None
+    except OSError:
+        return None
+
+def print_report(results, baseline=None):
+    print(f"\n{'method':<8} {'stage':<12} {'n':>5} {'p50(ms)':>10} {'p95(ms)':>10} {'p99(ms)':>10}"
+          + (f" {'p50 Δ':>8}" if baseline else ""))
+    for m, r in results.items():
+        if "error" in r:
+            print(f"{m:<8} ❌ {r['error']}")
+            continue
+        old = ((baseline or {}).get(m) or {}).get("stages", {})
+        for s, st in r["stages"].items():
+            line = f"{m:<8} {s:<12} {st['n']:>5} {st['p50_ms']:>10.3f} {st['p95_ms']:>10.3f} {st['p99_ms']:>10.3f}"
+            if s in old and old[s]["p50_ms"] > 0:
+                ratio = st["p50_ms"] / old[s]["p50_ms"]
+                line += f" {ratio:>7.2f}x" + (" ⚠️" if ratio > 1.2 else "")
+            print(line)
+        rss = r.get("peak_rss_mb")
+        print(f"{m:<8} {'peak_rss':<12} {'':>5} {rss:>9.1f}MB" if rss is not None else f"{m:<8} peak_rss     (不可用)")
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--methods", default=",".join(METHODS))
+    ap.add_argument("--questions", default=QA_PATH)
+    ap.add_argument("--repeat", type=int, default=5, help="问题集计时遍数")
+    ap.add_argument("--warmup", type=int, default=1, help="问题集热身遍数（不计时）")
+    ap.add_argument("--inproc", action="store_true", help="全部管线在本进程里跑（峰值内存会累计）")
+    ap.add_argument("--baseline", default=None, help="旧的 bench_latency.json，打印 p50 变化")
+    ap.add_argument("--out", default=OUT_JSON)
+    ap.add_argument("--child", default=None, help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    os.chdir(ROOT)
+    questions = [json.loads(l)["question"] for l in open(args.questions, "r", encoding="utf-8") if l.strip()]
+
+    if args.child:
+        print(CHILD_TAG + json.dumps(bench_method(args.child, questions, args.repeat, args.warmup)))
+        return
+
+    results = {}
+    for m in [x.strip() for x in args.methods.split(",") if x.strip()]:
+        if m not in PIPELINES:
+            raise SystemExit(f"未知管线：{m}（可选 {', '.join(METHODS)}）")
+        print(f"⏱️ {m} …")
+        results[m] = bench_method(m, questions, args.repeat, args.warmup) if args.inproc else run_child(m, args)
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": np.__version__,
+        "n_questions": len(questions),
+        "repeat": args.repeat,
+        "warmup": args.warmup,
+        "isolated": not args.inproc,
+        "methods": results,
+    }
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f).get("methods")
+    print_report(results, baseline)
+
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n✅ 已写出 {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+# src/bench_scaling.py
+# 功能：扩展性基准 —— 用 synth_corpus.py 生成 1k / 10k / 100k / 1M 篇的合成语料，在每个规模上：
+#         建全部索引（tri 图 + PPR 转移 + 关键词/药名命中 + 句向量、BM25、文献向量），记录耗时、磁盘占用、峰值内存；
+#         再用 QA 问题集跑四条管线的查询（复用 bench_latency.py 的 query_*），记录各阶段 p50/p95/p99 与峰值内存。
+#       NER 与编码器用 stub_models.py 的离线替身（不联网、不装 spaCy）：测的是索引 / 检索代码本身随规模的变化，
+#       模型推理时间不在内；检索质量没有参考意义。
+#       每个构建步骤、每条管线都在单独子进程里跑（峰值内存互不累计）；超时 / 内存不够的步骤记为失败，后面的照跑。
+#       结果写 runs/bench_scaling.json + runs/bench_scaling.csv。
+# 用法：python src\bench_scaling.py [--sizes 1000,10000,100000,1000000] [--work runs\scaling]
+#                                  [--methods bm25,vec,tri,kg_ppr] [--repeat 3] [--timeout 7200] [--keep]
+
+import argparse, csv, json, os, platform, shutil, subprocess, sys, time
+from pathlib import Path
+
+import numpy as np
+
+from bench_latency import (METHODS, STAGES, CHILD_TAG, QA_PATH, StageTimes, summarize, peak_rss_mb,
+                           git_commit, query_bm25, query_vec, query_tri, query_kg_ppr)
+
+SRC = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(SRC)
+WORK_DIR = os.path.join("runs", "scaling")
+OUT_JSON = os.path.join("runs", "bench_scaling.json")   # 同名 .csv 一并写出
+BUILD_STEPS = ["tri", "bm25", "vec"]
+INPUT_FILES = {os.path.join("data", n) for n in ("docs.jsonl", "synth_entities.json", "synth_stats.json")}
+
+def _docs_path(root):
+    return os.path.join(root, "data", "docs.jsonl")
+
+def dir_sizes(root):
+    """相对路径 -> 字节数（不含语料本身）"""
+    out = {}
+    for dp, _, fs in os.walk(root):
+        for f in fs:
+            p = os.path.join(dp, f)
+            rel = os.path.relpath(p, root)
+            if rel not in INPUT_FILES:
+                out[rel] = os.path.getsize(p)
+    return out
+
+# ---------- 构建步骤（子进程里跑） ----------
+
+def _run_script(script, root):
+    """按命令行方式调用 src/ 下的构建脚本的 main()"""
+    import runpy
+    argv = sys.argv
+    sys.argv = [script, "--root", root, "--stub-models"]
+    try:
+        runpy.run_path(os.path.join(SRC, script), run_name="__main__")
+    finally:
+        sys.argv = argv
+
+def build_tri(root):
+    _run_script("build_index.py", root)
+
+def build_bm25(root):
+    from bm25_index import build_bm25_dir
+    from drug_extractor import load_drug_hits
+    from qa_med_eval_bm25 import build_drug_lexicon, build_drug_extractor, load_questions
+
+    build_bm25_dir(_docs_path(root), os.path.join(root, "index_bm25"))
+    ex = build_drug_extractor(build_drug_lexicon(load_questions(os.path.join(ROOT, QA_PATH))))
+    load_drug_hits("qa_gold", ex, docs_path=_docs_path(root), base_dir=root)
+
+def build_vec(root):
+    _run_script("build_vec_index_vec.py", root)
+
+BUILDERS = {"tri": build_tri, "bm25": build_bm25, "vec": build_vec}
+
+# ---------- 查询上下文：与 bench_latency 的 load_* 相同，只是换成合成目录 + 替身编码器 ----------
+
+def load_bm25(T, root):
+    from bm25_index import load_bm25_index
+    from drug_extractor import load_drug_hits
+    from qa_med_eval_bm25 import build_drug_lexicon, build_drug_extractor, load_questions
+
+    def load():
+        index = load_bm25_index(os.path.join(root, "index_bm25"), docs_path=_docs_path(root))
+        ex = build_drug_extractor(build_drug_lexicon(load_questions(os.path.join(ROOT, QA_PATH))))
+        return index, load_drug_hits("qa_gold", ex, docs_path=_docs_path(root), base_dir=root)
+    index, drug_hits = T.run("index_load", load)
+    return {"index": index, "drug_hits": drug_hits}
+
+def load_vec(T, root):
+    from vec_retrieve import load_vec_index
+    from drug_extractor import load_drug_hits
+    from stub_models import StubEncoder
+
+    emb, _, drug_hits = T.run("index_load", lambda: load_vec_index(Path(root) / "data") + (
+        load_drug_hits("vec", docs_path=_docs_path(root), base_dir=root),))
+    model = T.run("model_load", StubEncoder, dim=768)
+    return {"emb": emb, "model": model, "drug_hits": drug_hits}
+
+def load_graph(T, root, with_ppr):
+    from retrieve import load_index, load_sent_emb, load_para_emb
+    from ppr_retrieve import load_transition, load_kw_hits
+    from drug_extractor import load_drug_hits
+    from meta_store import doc_rows
+    from stub_models import StubEncoder, STUB_ENCODER_NAME
+
+    model = T.run("model_load", StubEncoder)
+
+    def load():
+        meta, M, C = load_index(root)
+        sent_emb = load_sent_emb(meta["sents"], model, STUB_ENCODER_NAME)
+        ctx = {"meta": meta, "M": M, "C": C, "model": model, "sent_emb": sent_emb,
+               "para_emb": load_para_emb(meta, sent_emb)}
+        if with_ppr:
+            ctx["trans"] = load_transition(M, C)
+            ctx["kw_hits"] = load_kw_hits(meta)
+        ctx["drug_hits"], ctx["canon"] = load_drug_hits("kg", docs_path=_docs_path(root), base_dir=root)
+        ctx["row_of"] = doc_rows(meta)
+        return ctx
+    return T.run("index_load", load)
+
+PIPELINES = {
+    "bm25": (load_bm25, query_bm25),
+    "vec": (load_vec, query_vec),
+    "tri": (lambda T, root: load_graph(T, root, with_ppr=False), query_tri),
+    "kg_ppr": (lambda T, root: load_graph(T, root, with_ppr=True), query_kg_ppr),
+}
+
+def bench_query(method, root, questions, repeat, warmup):
+    """与 bench_latency.bench_method 相同的口径：加载一次，热身 warmup 遍，计时 repeat 遍"""
+    load, query = PIPELINES[method]
+    T = StageTimes()
+    ctx = load(T, root)
+    rss_load = peak_rss_mb()
+    for _ in range(warmup):
+        for q in questions:
+            query(StageTimes(), ctx, q)
+    total = []
+    for _ in range(repeat):
+        for q in questions:
+            t0 = time.perf_counter()
+            query(T, ctx, q)
+            total.append((time.perf_counter() - t0) * 1000)
+    stages = {s: summarize(T.ms[s]) for s in STAGES if s in T.ms}
+    stages["query_total"] = summarize(total)
+    return {"stages": stages, "peak_rss_mb": peak_rss_mb(), "peak_rss_after_load_mb": rss_load}
+
+# ---------- 子进程调度 ----------
+
+def run_child(kind, name, root, args):
+    """子进程跑一个构建步骤 / 一条查询管线；超时、崩溃（包括被 OOM 杀掉）都记成 {"error": ...}"""
+    cmd = [sys.executable, os.path.abspath(__file__), "--child", f"{kind}:{name}", "--child-root", root,
+           "--questions", args.questions, "--repeat", str(args.repeat), "--warmup", str(args.warmup)]
+    try:
+        cp = subprocess.run(cmd, cwd=ROOT, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=args.timeout)
+    except subprocess.TimeoutExpired:
+        return {"error": f"timeout > {args.timeout}s"}
+    out = cp.stdout.decode("utf-8", errors="ignore")
+    for line in reversed(out.splitlines()):
+        if line.startswith(CHILD_TAG):
+            return json.loads(line[len(CHILD_TAG):])
+    err = cp.stderr.decode("utf-8", errors="ignore").strip().splitlines()
+    return {"error": err[-1] if err else f"returncode={cp.returncode}"}
+
+def child_main(spec, root, args):
+    kind, name = spec.split(":", 1)
+    if kind == "build":
+        t0 = time.perf_counter()
+        BUILDERS[name](root)
+        return {"seconds": time.perf_counter() - t0, "peak_rss_mb": peak_rss_mb()}
+    questions = [json.loads(l)["question"] for l in open(os.path.join(ROOT, args.questions), "r", encoding="utf-8")
+                 if l.strip()]
+    return bench_query(name, root, questions, args.repeat, args.warmup)
+
+def bench_size(n_docs, stats, args, methods):
+    """一个规模：生成 -> 逐步构建（记大小）-> 逐管线查询"""
+    from synth_corpus import generate
+
+    root = os.path.abspath(os.path.join(args.work, f"synth_{n_docs}"))
+    shutil.rmtree(root, ignore_errors=True)
+    res = {"n_docs": n_docs, "build": {}, "query": {}}
+
+    t0 = time.perf_counter()
+    res["corpus"] = generate(n_docs, stats, root, seed=args.seed)
+    res["corpus"]["seconds"] = time.perf_counter() - t0
+    res["corpus"]["bytes"] = os.path.getsize(_docs_path(root))
+    print(f"📄 {n_docs} 篇：{res['corpus']['n_sents']} 句，{res['corpus']['bytes'] / 2 ** 20:.1f}MB，"
+          f"生成 {res['corpus']['seconds']:.1f}s")
+
+    for step in BUILD_STEPS:
+        before = dir_sizes(root)
+        r = run_child("build", step, root, args)
+        after = dir_sizes(root)
+        r["files"] = {p: s for p, s in after.items() if before.get(p) != s}
+        r["bytes"] = sum(r["files"].values())
+        res["build"][step] = r
+        if "error" in r:
+            print(f"   ❌ build {step}: {r['error']}")
+        else:
+            print(f"   🔨 build {step:<5} {r['seconds']:>8.1f}s  {r['bytes'] / 2 ** 20:>8.1f}MB  "
+                  f"peak_rss {r['peak_rss_mb'] or 0:.0f}MB")
+
+    for m in methods:
+        r = run_child("query", m, root, args)
+        res["query"][m] = r
+        if "error" in r:
+            print(f"   ❌ query {m}: {r['error']}")
+        else:
+            st = r["stages"]["query_total"]
+            print(f"   🔎 query {m:<6} p50 {st['p50_ms']:>8.2f}ms  p95 {st['p95_ms']:>8.2f}ms  "
+                  f"p99 {st['p99_ms']:>8.2f}ms  peak_rss {r['peak_rss_mb'] or 0:.0f}MB")
+
+    if not args.keep:
+        shutil.rmtree(root, ignore_errors=True)
+    return res
+
+def csv_rows(results):
+    """扁平表：一行 = (规模, 类别, 名字, 阶段)，方便画 规模 vs 指标 的曲线"""
+    rows = []
+    for r in results:
+        n, c = r["n_docs"], r["corpus"]
+        rows.append([n, "corpus", "synth", "", f"{c['seconds']:.3f}", c["bytes"], "", "", "", "", "", ""])
+        for step, b in r["build"].items():
+            rows.append([n, "build", step, "", f"{b['seconds']:.3f}" if "seconds" in b else "", b.get("bytes", ""),
+                         b.get("peak_rss_mb") or "", "", "", "", "", b.get("error", "")])
+        for m, q in r["query"].items():
+            if "error" in q:
+                rows.append([n, "query", m, "", "", "", "", "", "", "", "", q["error"]])
+                continue
+            for s, st in q["stages"].items():
+                rows.append([n, "query", m, s, "", "", q.get("peak_rss_mb") or "", st["n"],
+                             f"{st['p50_ms']:.3f}", f"{st['p95_ms']:.3f}", f"{st['p99_ms']:.3f}", ""])
+    return rows
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="1000,10000,100000,1000000", help="逗号分隔的文献篇数")
+    ap.add_argument("--methods", default=",".join(METHODS))
+    ap.add_argument("--work", default=WORK_DIR, help="合成语料与索引的工作目录")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--questions", default=QA_PATH)
+    ap.add_argument("--repeat", type=int, default=3, help="问题集计时遍数")
+    ap.add_argument("--warmup", type=int, default=1, help="问题集热身遍数（不计时）")
+    ap.add_argument("--timeout", type=int, default=7200, help="单个子进程的超时（秒）")
+    ap.add_argument("--keep", action="store_true", help="保留每个规模的语料与索引（默认跑完即删）")
+    ap.add_argument("--out", default=OUT_JSON)
+    ap.add_argument("--child", default=None, help=argparse.SUPPRESS)
+    ap.add_argument("--child-root", default=None, help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    os.chdir(ROOT)
+    if args.child:
+        print(CHILD_TAG + json.dumps(child_main(args.child, args.child_root, args)))
+        return
+
+    from retrieve import load_index
+    from synth_corpus import corpus_stats
+
+    methods = [x.strip() for x in args.methods.split(",") if x.strip()]
+    for m in methods:
+        if m not in PIPELINES:
+            raise SystemExit(f"未知管线：{m}（可选 {', '.join(METHODS)}）")
+    sizes = [int(x) for x in args.sizes.split(",")]
+
+    meta, M, _ = load_index()
+    stats = corpus_stats(meta, M)
+    del meta, M
+    print(f"📊 真实语料：{stats['n_docs']} 篇 / {stats['n_sents']} 句；Zipf s={stats['zipf_s']:.3f}，"
+          f"Heaps h={stats['heaps_h']:.3f}")
+
+    results = []
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": np.__version__,
+        "models": "stub",
+        "seed": args.seed,
+        "repeat": args.repeat,
+        "warmup": args.warmup,
+        "results": results,
+    }
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    out_csv = os.path.splitext(args.out)[0] + ".csv"
+    for n in sizes:
+        results.append(bench_size(n, stats, args, methods))
+        # 每个规模跑完就落盘：大规模中途挂掉时前面的结果不丢
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        with open(out_csv, "w", newline="", encoding="utf-8") as f:
+            w = csv.writer(f)
+            w.writerow(["n_docs", "kind", "name", "stage", "seconds", "bytes", "peak_rss_mb",
+                        "n", "p50_ms", "p95_ms", "p99_ms", "error"])
+            w.writerows(csv_rows(results))
+    print(f"\n✅ 已写出 {args.out} 与 {out_csv}")
+
+if __name__ == "__main__":
+    main()
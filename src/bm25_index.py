@@ -0,0 +1,382 @@
+# src/bm25_index.py
+# 功能：稀疏矩阵版 BM25
+#       建索引时把 k1 / b 烘焙进 (词 x 文献) 的 CSR 权重矩阵：
+#           W[t, d] = idf(t) * f * (k1 + 1) / (f + k1 * (1 - b + b * dl / avgdl))
+#       查询 = 取出查询词对应的行求和（一次稀疏行抽取），Top-K 用 argpartition。
+#       与 qa_med_eval_bm25 原来的逐篇逐词实现打分一致（同一分词器下）。
+#       索引落盘到 index_bm25/（词表 + 倒排 + 文献长度 + avgdl），各脚本 mmap 读取，
+#       所有词法检索入口共用这里的分词器，不再各自现建索引。
+#       Top-K 查询用 MaxScore 动态剪枝（bm25_topk）：每个词存一个分数上界 term_max，
+#       剩余词的上界之和够不着当前第 K 名时，不再接纳新文献、只给已有候选补分，
+#       结果与全量打分 + topk_indices 逐位一致；另有可选的停用词 / 高频词查询规划 plan_query。
+
+import json
+import os
+import re
+import threading
+from collections import Counter
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from index_store import save_store, open_store, store_exists
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DOCS_PATH = os.path.join(BASE_DIR, "data", "docs.jsonl")
+BM25_DIR = os.path.join(BASE_DIR, "index_bm25")
+
+# ==== 共用分词器：只要英文字母，统统小写 ====
+
+TOKEN_RE = re.compile(r"[A-Za-z]+")
+
+
+def tokenize(text):
+    return [m.group(0).lower() for m in TOKEN_RE.finditer(text)]
+
+
+def get_text(doc):
+    """把一篇文献变成一段可检索的文本。"""
+    if doc.get("text"):
+        return doc["text"]
+    title = doc.get("title", "")
+    abstract = doc.get("abstract", "")
+    return (title + " " + abstract).strip()
+
+
+def bm25_weights(term_ids, doc_ids, tf, n_terms, doc_lens, k1=1.5, b=0.75):
+    """由 (词, 文献, 词频) 三元组直接算出 BM25 权重矩阵 (词 x 文献)"""
+    doc_lens = np.asarray(doc_lens, dtype=np.float64)
+    N = len(doc_lens)
+    avgdl = doc_lens.sum() / N if N > 0 else 0.0
+
+    df = np.bincount(term_ids, minlength=n_terms).astype(np.float64)
+    # 经典 BM25 idf 公式（+1 保证非负）
+    idf = np.log((N - df + 0.5) / (df + 0.5) + 1.0)
+
+    f = np.asarray(tf, dtype=np.float64)
+    denom = f + k1 * (1 - b + b * doc_lens[doc_ids] / (avgdl + 1e-9))
+    w = idf[term_ids] * f * (k1 + 1) / denom
+    W = csr_matrix((w, (term_ids, doc_ids)), shape=(n_terms, N))
+    W.sort_indices()  # MaxScore 补分时要在倒排里 searchsorted
+    return W, avgdl
+
+
+def term_upper_bounds(W):
+    """每个词在所有文献上的最大权重（MaxScore 的分数上界）"""
+    ub = np.zeros(W.shape[0], dtype=np.float64)
+    nz = np.diff(W.indptr) > 0
+    if nz.any():
+        ub[nz] = np.maximum.reduceat(np.asarray(W.data), np.asarray(W.indptr[:-1])[nz])
+    return ub
+
+
+def build_bm25_matrix(doc_tokens, k1=1.5, b=0.75):
+    """
+    doc_tokens: 每篇文献的分词结果（list of list of str）
+    返回 dict：W（词 x 文献 权重）、vocab（词 -> 行号）、N、avgdl、doc_lens、k1、b
+    """
+    vocab = {}
+    term_ids, doc_ids, tfs, doc_lens = [], [], [], []
+    for d, tokens in enumerate(doc_tokens):
+        doc_lens.append(len(tokens))
+        for term, f in Counter(tokens).items():
+            tid = vocab.setdefault(term, len(vocab))
+            term_ids.append(tid); doc_ids.append(d); tfs.append(f)
+
+    W, avgdl = bm25_weights(
+        np.asarray(term_ids, dtype=np.int64), np.asarray(doc_ids, dtype=np.int64),
+        tfs, len(vocab), doc_lens, k1=k1, b=b,
+    )
+    return {
+        "W": W,
+        "vocab": vocab,
+        "N": len(doc_lens),
+        "avgdl": avgdl,
+        "doc_lens": np.asarray(doc_lens, dtype=np.int64),
+        "k1": k1,
+        "b": b,
+        "term_max": term_upper_bounds(W),
+    }
+
+
+def bm25_matrix_scores(q_tokens, index):
+    """一次查询的全部文献得分：查询词（含重复）对应行求和"""
+    vocab = index["vocab"]
+    tids = [vocab[t] for t in q_tokens if t in vocab]
+    if not tids:
+        return np.zeros(index["N"], dtype=np.float64)
+    return np.asarray(index["W"][tids].sum(axis=0)).ravel()
+
+
+def topk_indices(scores, k):
+    """
+    分数最高的 k 个下标，顺序与 sorted(range(n), key=scores.__getitem__, reverse=True)[:k]
+    完全一致（同分按下标升序）；argpartition 选出第 k 名的分数，只对候选排序。
+    """
+    n = len(scores)
+    k = min(k, n)
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    kth = scores[np.argpartition(-scores, k - 1)[:k]].min()
+    above = np.flatnonzero(scores > kth)
+    ties = np.flatnonzero(scores == kth)[: k - len(above)]
+    cand = np.concatenate([above, ties])
+    return cand[np.lexsort((cand, -scores[cand]))][:k]
+
+
+# ==== MaxScore 动态剪枝 Top-K ====
+
+# 英文问句里几乎每篇都有的功能词；plan_query 可选地把它们从查询里去掉
+STOPWORDS = frozenset("""
+a about above after against all also am an and any are as at be because been before being
+between both but by can could did do does doing during each few for from further had has have
+having how i if in into is it its itself just may might more most no nor not of off on once only
+or other our out over own same should so some such than that the their them then there these
+they this those through to too under until up used using very was we were what when where which
+while who whom why will with would you your
+""".split())
+
+
+def plan_query(q_tokens, index, stopwords=STOPWORDS, max_df=None):
+    """
+    查询规划（会改变打分，默认不用）：去掉停用词，以及文档频率占比超过 max_df 的词。
+    全部被去掉时原样返回，避免空查询。
+    """
+    vocab = index["vocab"]
+    df = np.diff(index["W"].indptr)
+    keep = []
+    for t in q_tokens:
+        if stopwords and t in stopwords:
+            continue
+        if max_df is not None and t in vocab and df[vocab[t]] > max_df * index["N"]:
+            continue
+        keep.append(t)
+    return keep if keep else list(q_tokens)
+
+
+def _add_hits(cand, acc, docs, w, scale=1.0):
+    """给已有候选 cand（升序）补上这一条倒排里的权重；只碰命中的位置，不拷整条倒排"""
+    if len(cand) == 0 or len(docs) == 0:
+        return
+    pos = np.searchsorted(docs, cand)
+    pos[pos == len(docs)] = 0
+    hit = docs[pos] == cand
+    acc[hit] += w[pos[hit]] * scale
+
+
+_SCRATCH_LOCK = threading.Lock()
+
+
+def _take_scratch(index):
+    """按文献号寻址的部分分数组（全 0）：同一个索引的查询之间复用，并发查询各拿一块，不再每次开长度 N 的数组"""
+    with _SCRATCH_LOCK:
+        free = index.setdefault("scratch", [])
+        if free:
+            return free.pop()
+    return np.zeros(index["N"], dtype=np.float64)
+
+
+def _put_scratch(index, dense, dirty):
+    """只把写过的位置清零再放回去（代价与写过的倒排长度成正比）"""
+    for docs in dirty:
+        dense[docs] = 0.0
+    with _SCRATCH_LOCK:
+        index["scratch"].append(dense)
+
+
+def maxscore_topk(tids, index, k):
+    """
+    tids: 查询词行号（含重复）。返回 (Top-K 文献号, 对应分数, 统计)。
+    按上界从大到小处理各词，部分分累加在按文献号寻址的数组里（同一索引的查询之间复用，
+    用完只清零写过的位置）；候选从收下的倒排里记，不扫整个数组 —— 查询代价随扫过的倒排长度增长，不随语料规模 N：
+      - 剩余上界之和 ≥ 门槛 θ（当前第 K 大的部分分）时，整条倒排累加；
+        θ 只需在「上一轮前 K 名 ∪ 本条倒排」里取，因为别的文献部分分没变；
+      - 否则新文献不可能进 Top-K：候选 = 已累加到分数的文献，剔除「部分分 + 剩余上界 < θ」的，
+        之后只给候选补分（候选远少于倒排长度时 searchsorted，否则仍整条累加更快）。
+    最后按原查询词顺序重算候选的精确分，保证与 bm25_matrix_scores 的浮点结果一致。
+    """
+    W = index["W"]
+    N = index["N"]
+    indptr, indices, data = W.indptr, W.indices, W.data
+    stats = {"postings": 0, "touched": 0, "candidates": 0}
+    k = min(k, N)
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0), stats
+
+    cand = np.zeros(0, dtype=indices.dtype)
+    if tids:
+        uniq, cnt = np.unique(np.asarray(tids, dtype=np.int64), return_counts=True)
+        ub = cnt * index["term_max"][uniq]
+        order = np.argsort(-ub, kind="stable")
+        uniq, cnt, ub = uniq[order], cnt[order], ub[order]
+        rest = np.append(np.cumsum(ub[::-1])[::-1], 0.0)
+
+        dense = _take_scratch(index)
+        seen = [cand]     # 整条累加阶段第一次碰到的文献（每段升序、段间不重复）
+        dirty = []        # 只补分阶段整条累加过的倒排（候选以外的位置也写了）
+        pool = cand       # 当前部分分前 K 名
+        theta, tol = -np.inf, 0.0
+        probing = False
+        for i, t in enumerate(uniq):
+            lo, hi = indptr[t], indptr[t + 1]
+            docs, w = indices[lo:hi], data[lo:hi]
+            stats["postings"] += int(hi - lo)
+            if not probing and rest[i] < theta - tol:
+                # 新文献已不可能进 Top-K：候选 = 已累加到分数的文献
+                probing = True
+                cand = np.sort(np.concatenate(seen), kind="stable")
+            if not probing:
+                seen.append(docs[dense[docs] == 0])   # BM25 权重都 > 0：部分分为 0 即没碰过
+                dense[docs] += w * cnt[i]
+                stats["touched"] += int(hi - lo)
+                top = docs[np.argpartition(-dense[docs], k - 1)[:k]] if len(docs) > k else docs
+                pool = np.unique(np.concatenate([pool, top]))
+                if len(pool) > k:
+                    pool = pool[np.argpartition(-dense[pool], k - 1)[:k]]
+                if len(pool) >= k:
+                    theta = dense[pool].min()
+                    tol = 1e-9 * max(abs(theta), 1.0)
+                continue
+            cand = cand[dense[cand] + rest[i] >= theta - tol]
+            if len(cand) * 16 < len(docs):
+                acc = dense[cand]
+                _add_hits(cand, acc, docs, w, cnt[i])
+                dense[cand] = acc
+                stats["touched"] += len(cand)
+            else:
+                dense[docs] += w * cnt[i]
+                dirty.append(docs)
+                stats["touched"] += int(hi - lo)
+            acc = dense[cand]
+            theta = max(theta, np.partition(acc, len(acc) - k)[len(acc) - k])
+            tol = 1e-9 * max(abs(theta), 1.0)
+        if not probing:
+            cand = np.sort(np.concatenate(seen), kind="stable")
+        if len(cand) >= k:
+            cand = cand[dense[cand] >= theta - tol]
+        _put_scratch(index, dense, seen + dirty)
+    stats["candidates"] = len(cand)
+
+    # 精确重算：与全量打分同样按查询词原顺序累加
+    exact = np.zeros(len(cand), dtype=np.float64)
+    for t in tids:
+        lo, hi = indptr[t], indptr[t + 1]
+        _add_hits(cand, exact, indices[lo:hi], data[lo:hi])
+    cand = cand.astype(np.int64)
+    if len(cand) < k:
+        # 命中文献不足 K 篇：和 topk_indices 一样用下标最小的 0 分文献补齐
+        pad = np.setdiff1d(np.arange(min(N, k + len(cand)), dtype=np.int64), cand)[: k - len(cand)]
+        cand = np.concatenate([cand, pad])
+        exact = np.concatenate([exact, np.zeros(len(pad))])
+    top = np.lexsort((cand, -exact))[:k]
+    return cand[top], exact[top], stats
+
+
+def bm25_topk(q_tokens, index, k, stopwords=None, max_df=None):
+    """
+    BM25 Top-K（MaxScore 剪枝），返回 (文献号, 分数)。
+    stopwords / max_df 非空时先经 plan_query 规划查询。
+    """
+    if stopwords or max_df is not None:
+        q_tokens = plan_query(q_tokens, index, stopwords=stopwords, max_df=max_df)
+    vocab = index["vocab"]
+    tids = [vocab[t] for t in q_tokens if t in vocab]
+    top, sc, _ = maxscore_topk(tids, index, k)
+    return top, sc
+
+
+# ==== 落盘 / 读取 ====
+# index_bm25/（index_store 目录格式：带版本号的裸数组 + manifest.json，重建时整套一次切换）
+#   manifest extra.meta   N、avgdl、k1、b、分词器、语料文件的大小与修改时间（判断是否过期）
+#   manifest extra.terms  词表（下标 = 倒排行号）
+#   post_indptr        倒排 CSR：每个词的起止位置
+#   post_docs          倒排 CSR：文献号
+#   post_w             烘焙好 k1/b 的 BM25 权重
+#   doc_len            每篇长度
+#   term_max           每个词的最大权重（MaxScore 上界）
+#   doc_offsets        每篇在 docs.jsonl 中的字节偏移（按需读取原文）
+
+
+def _docs_stamp(docs_path):
+    st = os.stat(docs_path)
+    return {"docs_size": st.st_size, "docs_mtime": int(st.st_mtime)}
+
+
+def build_bm25_dir(docs_path=DOCS_PATH, out_dir=BM25_DIR, k1=1.5, b=0.75):
+    """扫一遍 docs.jsonl：分词、建倒排、算权重，全部写进 out_dir"""
+    offsets, doc_tokens = [], []
+    with open(docs_path, "rb") as f:
+        pos = 0
+        for raw in f:
+            if raw.strip():
+                offsets.append(pos)
+                doc_tokens.append(tokenize(get_text(json.loads(raw))))
+            pos += len(raw)
+
+    index = build_bm25_matrix(doc_tokens, k1=k1, b=b)
+    W = index["W"]
+    idx_dtype = np.int32 if W.nnz < 2 ** 31 else np.int64
+    terms = [None] * len(index["vocab"])
+    for t, i in index["vocab"].items():
+        terms[i] = t
+    meta = {"N": index["N"], "avgdl": index["avgdl"], "k1": k1, "b": b,
+            "tokenizer": TOKEN_RE.pattern, "docs_path": os.path.abspath(docs_path)}
+    meta.update(_docs_stamp(docs_path))
+    # 全部数组写成新版本文件，manifest 最后一次替换：别的进程 mmap 着的旧倒排不会被截断或新旧混读
+    save_store(out_dir, arrays={
+        "post_indptr": W.indptr.astype(idx_dtype),
+        "post_docs": W.indices.astype(idx_dtype),
+        "post_w": W.data,
+        "doc_len": index["doc_lens"].astype(np.int32),
+        "term_max": index["term_max"],
+        "doc_offsets": np.asarray(offsets, dtype=np.int64),
+    }, extra={"meta": meta, "terms": terms})
+    return index
+
+
+def load_bm25_index(index_dir=BM25_DIR, docs_path=DOCS_PATH):
+    """
+    mmap 读取 index_bm25/；不存在、分词器变了、或 docs.jsonl 已更新时自动重建。
+    返回的 dict 与 build_bm25_matrix 相同，另带 doc_offsets / docs_path 供 fetch_docs 用。
+    """
+    store = None
+    if store_exists(index_dir):
+        store = open_store(index_dir)
+        meta = store["extra"].get("meta", {})
+        stamp = _docs_stamp(docs_path)
+        if (meta.get("tokenizer") != TOKEN_RE.pattern
+                or meta.get("docs_size") != stamp["docs_size"]
+                or meta.get("docs_mtime") != stamp["docs_mtime"]):
+            store = None
+    if store is None:
+        print(f"🧮 BM25 索引缺失或已过期，重建：{index_dir}")
+        build_bm25_dir(docs_path, index_dir)
+        store = open_store(index_dir)
+
+    # 同一份 manifest 里的数组、词表、meta 一起取：重建途中也不会拿到新旧混搭的一套
+    arr, meta, terms = store["arrays"], store["extra"]["meta"], store["extra"]["terms"]
+    W = csr_matrix((arr["post_w"], arr["post_docs"], arr["post_indptr"]),
+                   shape=(len(terms), meta["N"]))
+    term_max = arr["term_max"]
+    return {
+        "W": W,
+        "vocab": {t: i for i, t in enumerate(terms)},
+        "N": meta["N"],
+        "avgdl": meta["avgdl"],
+        "doc_lens": arr["doc_len"],
+        "k1": meta["k1"],
+        "b": meta["b"],
+        "term_max": term_max,
+        "doc_offsets": arr["doc_offsets"],
+        "docs_path": docs_path,
+    }
+
+
+def fetch_docs(index, rows):
+    """按行号从 docs.jsonl 直接 seek 读出这几篇（不读整个语料）"""
+    out = []
+    with open(index["docs_path"], "rb") as f:
+        for i in rows:
+            f.seek(int(index["doc_offsets"][int(i)]))
+            out.append(json.loads(f.readline()))
+    return out
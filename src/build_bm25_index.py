@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+# src/build_bm25_index.py
+# 功能：把 data/docs.jsonl 建成落盘 BM25 索引 index_bm25/（answer_drugs_bm25 / qa_med_eval_bm25 共用）
+# 用法：python src/build_bm25_index.py [--k1 1.5] [--b 0.75]
+#       不跑也行：检索脚本发现索引缺失或 docs.jsonl 更新过会自动重建
+
+import argparse
+import time
+
+from bm25_index import DOCS_PATH, BM25_DIR, build_bm25_dir
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--docs", default=DOCS_PATH)
+    ap.add_argument("--out", default=BM25_DIR)
+    ap.add_argument("--k1", type=float, default=1.5)
+    ap.add_argument("--b", type=float, default=0.75)
+    args = ap.parse_args()
+
+    print(f"📄 读取语料：{args.docs}")
+    t0 = time.perf_counter()
+    index = build_bm25_dir(args.docs, args.out, k1=args.k1, b=args.b)
+    dt = time.perf_counter() - t0
+    print(f"✅ 文献 {index['N']} 篇，词表 {len(index['vocab'])}，倒排 {index['W'].nnz} 条，avgdl={index['avgdl']:.1f}")
+    print(f"💾 已写出：{args.out}  （用时 {dt:.1f}s）")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,88 @@
 # src/build_index.py
 # 功能：读取 data/docs.jsonl 里的段落 -> 分句 -> 用 en_core_sci_md 抽实体
 #       生成稀疏矩阵 M(句子x实体)、C(段落x实体) 并保存到项目根目录
+#       并预先编码全部句向量（index_sent_emb.npy），查询时直接 mmap 读取；
+#       各答案口径的 文献 x 药名 命中矩阵（index_drug_hits_*.npz）也在这里一并生成
+#       --root 指向别的工程目录（读 <root>/data/docs.jsonl，索引写到 <root>）；
+#       --stub-models 用 stub_models.py 的离线替身 NER / 编码器（合成语料测速用，见 synth_corpus.py）
+# 用法：python src\build_index.py [--batch-size 256] [--n-process 1] [--incremental] [--skip-sent-emb]
+#                                [--root DIR] [--stub-models] [--ann]
 
-import json, re, sys, os
+import argparse, hashlib, json, re, sys, os
 import numpy as np
 from scipy.sparse import csr_matrix
 from tqdm import tqdm
 
-def split_sentences(text: str):
-    """超简单分句：按 . ? ! 后的空格切。你也可以替换成更强的分句器。"""
+NER_MODEL = "en_core_sci_md"
+NER_CACHE_PATH = "index_ner_cache.json"   # 内容哈希 -> 每句实体列表（增量构建用）
+
+def doc_hash(text: str) -> str:
+    """段落内容哈希：文本不变就复用缓存的实体/向量"""
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+def load_ner_cache(path=NER_CACHE_PATH, model=NER_MODEL):
+    """读增量缓存；模型名不一致（或文件坏了）就当没有缓存"""
+    try:
+        cache = json.load(open(path, "r", encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        return {}
+    if cache.get("model") != model:
+        print(f"⚠️ 缓存模型 {cache.get('model')} ≠ {model}，忽略缓存")
+        return {}
+    return cache.get("docs", {})
+
+def save_ner_cache(doc_ents, path=NER_CACHE_PATH, model=NER_MODEL):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"model": model, "docs": doc_ents}, f, ensure_ascii=False)
+
+SENT_EMB_CACHE = "index_sent_emb_cache.json"   # index_sent_emb.npy 每段的 (内容哈希, 句数)（增量构建用）
+
+def load_sent_emb_cache(model_name, path=SENT_EMB_CACHE):
+    """
+    读上一次的句向量 + 每段 (内容哈希, 句数)，返回 {哈希: 该段的句向量行}。
+    模型不一致 / 与 index_sent_emb.npy 对不上（比如查询时被重新编码过）就当没有缓存。
+    """
+    from retrieve import SENT_EMB_INFO, SENT_EMB_PATH
+    try:
+        cache = json.load(open(path, "r", encoding="utf-8"))
+        info = json.load(open(SENT_EMB_INFO, "r", encoding="utf-8"))
+        emb = np.load(SENT_EMB_PATH)
+    except (FileNotFoundError, ValueError):
+        return {}
+    if cache.get("model") != model_name:
+        print(f"⚠️ 句向量缓存模型 {cache.get('model')} ≠ {model_name}，忽略缓存")
+        return {}
+    if cache.get("fingerprint") != info.get("fingerprint") or sum(n for _, n in cache["docs"]) != emb.shape[0]:
+        print("⚠️ 句向量缓存与 index_sent_emb.npy 对不上，忽略缓存")
+        return {}
+    out, lo = {}, 0
+    for key, n in cache["docs"]:
+        out[key] = emb[lo:lo + n]
+        lo += n
+    return out
+
+def save_sent_emb_cache(doc_keys, doc_counts, model_name, fingerprint, path=SENT_EMB_CACHE):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"model": model_name, "fingerprint": fingerprint,
+                   "docs": [[k, n] for k, n in zip(doc_keys, doc_counts)]}, f)
+
+def split_sentence_spans(text: str):
+    """超简单分句：按 . ? ! 后的空格切。返回每句在 text 里的 (起, 止) 字符区间（已去掉首尾空白）"""
+    spans, start = [], 0
     if not text:
-        return []
-    sents = re.split(r'(?<=[.!?])\s+', text.strip())
-    return [s.strip() for s in sents if s.strip()]
+        return spans
+    cuts = [(m.start(), m.end()) for m in re.finditer(r'(?<=[.!?])\s+', text)]
+    for end, nxt in cuts + [(len(text), len(text))]:
+        seg = text[start:end]
+        lo, hi = len(seg) - len(seg.lstrip()), len(seg.rstrip())
+        if hi > lo:
+            spans.append((start + lo, start + hi))
+        start = nxt
+    return spans
+
+def split_sentences(text: str):
+    """句子文本；你也可以把 split_sentence_spans 换成更强的分句器（只要返回原文里的区间）"""
+    return [text[s:e] for s, e in split_sentence_spans(text)]
 
 def make_csr(pairs, n_rows, n_cols):
     """把 (row, col) 对转成稀疏矩阵"""
@@ -35,16 +105,49 @@ def load_md():
         print("   python -m pip install <本地路径或官方 tar.gz>")
         raise
 
+def ner_disable_list(nlp):
+    """抽实体只需要 ner（以及它监听的 tok2vec）；tagger/parser/lemmatizer 等全部关掉"""
+    keep = {"ner"}
+    for name, proc in nlp.pipeline:
+        # 共享 tok2vec 的情况：ner 是它的 listener，必须保留
+        if "ner" in getattr(proc, "listening_components", []):
+            keep.add(name)
+    return [name for name in nlp.pipe_names if name not in keep]
+
+def iter_sentence_ents(nlp, sents, batch_size=256, n_process=1):
+    """
+    用 nlp.pipe 批量跑 NER，按输入顺序逐句产出实体集合。
+    注意：仍然是“一句一个 Doc”，与旧版 nlp(sent) 的上下文完全一致，结果不变。
+    """
+    disable = ner_disable_list(nlp)
+    docs = nlp.pipe(sents, batch_size=batch_size, n_process=n_process, disable=disable)
+    for doc in docs:
+        yield set(e.text.strip() for e in doc.ents if e.text.strip())
+
 def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--batch-size", type=int, default=256, help="nlp.pipe 每批句子数（默认 256）")
+    ap.add_argument("--n-process", type=int, default=1, help="NER 进程数（默认 1；Windows 下多进程启动较慢）")
+    ap.add_argument("--incremental", action="store_true",
+                    help=f"只对新增/改动的段落跑 NER / 编码句向量，其余复用 {NER_CACHE_PATH} / {SENT_EMB_CACHE}")
+    ap.add_argument("--skip-sent-emb", action="store_true",
+                    help="不预先编码句向量（首次查询时会自动补算）")
+    ap.add_argument("--root", default=None, help="工程目录（默认本仓库根目录）")
+    ap.add_argument("--stub-models", action="store_true",
+                    help="用离线替身 NER / 句向量编码器（stub_models.py），只为测速")
+    ap.add_argument("--ann", action="store_true", help="顺带训练句向量的 IVF 近似检索索引（ann_index.py）")
+    args = ap.parse_args()
+
     # 0) 切到工程根目录（保证输出文件落在根目录）
     here = os.path.dirname(os.path.abspath(__file__))
-    root = os.path.abspath(os.path.join(here, os.pardir))
+    root = os.path.abspath(args.root or os.path.join(here, os.pardir))
     os.chdir(root)
+    ner_model = NER_MODEL
+    if args.stub_models:
+        from stub_models import STUB_NER_NAME
+        ner_model = STUB_NER_NAME
 
-    # 1) 加载 NER
-    nlp = load_md()
-
-    # 2) 读取段落
+    # 1) 读取段落
     docs_path = os.path.join("data", "docs.jsonl")
     try:
         docs = [json.loads(l) for l in open(docs_path, "r", encoding="utf-8") if l.strip()]
@@ -56,63 +159,173 @@ def main():
         sys.exit(1)
 
     ent2id = {}           # 实体字符串 -> ID
-    sents = []            # 所有句子文本
+    sents = []            # 所有句子文本（只在建索引时用；落盘只存区间）
     sent_docid = []       # 每个句子对应的段落ID
+    sent_spans = []       # 每个句子在段落原文里的 (起, 止)
     para_ent_pairs = []   # (段落索引, 实体ID)
     sent_ent_pairs = []   # (句子索引, 实体ID)
     doc_ids = []          # 段落ID（与 docs 顺序一致）
     doc_texts = {}        # 段落ID -> 原文
 
-    print(f"🔧 共 {len(docs)} 个段落，开始分句 + 抽实体…（模型：en_core_sci_md）")
-    for di, d in enumerate(tqdm(docs)):
+    # 2) 先整体分句（很便宜）；增量模式下内容哈希命中缓存的段落直接复用实体
+    cache = load_ner_cache(model=ner_model) if args.incremental else {}
+    doc_sents, doc_keys, doc_ents = [], [], []
+    todo = []             # 需要跑 NER 的句子
+    for d in docs:
         pid = d["id"]; text = d["text"]
         doc_ids.append(pid)
         doc_texts[pid] = text
-
-        ents_para = set()
-        cur_sents = split_sentences(text)
-        for sent in cur_sents:
-            sid = len(sents)
+        cur_spans = split_sentence_spans(text)
+        cur_sents = [text[s:e] for s, e in cur_spans]
+        doc_sents.append(cur_sents)
+        for sent, span in zip(cur_sents, cur_spans):
             sents.append(sent)
             sent_docid.append(pid)
+            sent_spans.append(span)
+
+        key = doc_hash(text)
+        cached = cache.get(key)
+        if cached is not None and len(cached) == len(cur_sents):
+            doc_ents.append(cached)
+        else:
+            doc_ents.append(None)
+            todo.extend(cur_sents)
+        doc_keys.append(key)
+
+    n_cached = sum(1 for e in doc_ents if e is not None)
+    print(f"🔧 共 {len(docs)} 个段落 / {len(sents)} 个句子；缓存命中 {n_cached} 段，"
+          f"需抽实体 {len(todo)} 句")
+
+    # 3) 只对新增/改动段落跑 NER（模型也只在需要时加载）
+    if todo:
+        if args.stub_models:
+            from stub_models import StubNER
+            nlp = StubNER.from_root(root)
+        else:
+            nlp = load_md()
+        print(f"   开始抽实体…（模型：{ner_model}，batch_size={args.batch_size}，n_process={args.n_process}）")
+        ents_iter = iter_sentence_ents(nlp, todo, batch_size=args.batch_size, n_process=args.n_process)
+        with tqdm(total=len(todo), unit="sent") as bar:   # 进度条速率即 句子/秒
+            for di, cur_sents in enumerate(doc_sents):
+                if doc_ents[di] is not None:
+                    continue
+                # NER：实体只要字符串，不做复杂规范化
+                doc_ents[di] = [list(next(ents_iter)) for _ in cur_sents]
+                bar.update(len(cur_sents))
 
-            # NER：实体只要字符串，不做复杂规范化
-            doc = nlp(sent)
-            ents_sent = set(e.text.strip() for e in doc.ents if e.text.strip())
+    # 4) 按段落顺序组装：实体 ID 按首次出现顺序分配，与全量构建一致
+    sid = 0
+    for di, per_sent in enumerate(doc_ents):
+        ents_para = set()
+        for ents_sent in per_sent:
             for e in ents_sent:
                 if e not in ent2id:
                     ent2id[e] = len(ent2id)
                 sent_ent_pairs.append((sid, ent2id[e]))
-            ents_para |= ents_sent
+            ents_para.update(ents_sent)
+            sid += 1
 
         for e in ents_para:
             para_ent_pairs.append((di, ent2id[e]))
 
-    # 3) 稀疏矩阵
+    # 缓存只保留当前语料里的段落
+    save_ner_cache(dict(zip(doc_keys, doc_ents)), model=ner_model)
+
+    # 5) 稀疏矩阵
     M = make_csr(sent_ent_pairs, n_rows=len(sents), n_cols=len(ent2id))
     C = make_csr(para_ent_pairs, n_rows=len(docs),  n_cols=len(ent2id))
 
-    # 4) 保存到工程根目录
-    np.savez_compressed(
-        "index_tri_graph.npz",
-        M_data=M.data, M_indices=M.indices, M_indptr=M.indptr, M_shape=M.shape,
-        C_data=C.data, C_indices=C.indices, C_indptr=C.indptr, C_shape=C.shape
-    )
+    # 6) 保存到工程根目录
+    #    M / C 每个数组一个裸文件（index_store.py），查询进程 mmap 读，不解压
+    #    目录里没有 source_stamp，旧的 index_tri_graph.npz / index_meta.json 即使还在也不会再被读
+    from retrieve import GRAPH_DIR
+    from index_store import save_store
+    save_store(GRAPH_DIR, csr={"M": M, "C": C})
+    #    元信息写成二进制字符串表（meta_store.py），查询进程按 ID 现取，不再整份解析 JSON；
+    #    句子只存段落原文里的区间，不再另存一份文本
+    from retrieve import META_DIR
+    from meta_store import save_meta
+    save_meta(META_DIR, doc_ids, doc_texts, sent_docid, sent_spans, ent2id)
     meta = {
         "docs": doc_ids,
         "doc_texts": doc_texts,
+        "doc_text_rows": [doc_texts[pid] for pid in doc_ids],
         "sents": sents,
         "sent_docid": sent_docid,
         "ent2id": ent2id
     }
-    with open("index_meta.json", "w", encoding="utf-8") as f:
-        json.dump(meta, f, ensure_ascii=False)
+
+    # 7) 实体转移矩阵：PPR 每次查询不再重建 W
+    from ppr_retrieve import TRANS_PATH, build_transition, save_transition, graph_fingerprint
+    P, deg = build_transition(M, C)
+    save_transition(P, deg, graph_fingerprint(M, C), TRANS_PATH)
+
+    # 8) 段落 x 关键词命中矩阵（Aho-Corasick 一遍扫完），查询时只做列求和
+    from ppr_retrieve import KW_TERMS, build_kw_hits, save_kw_hits, kw_fingerprint
+    H = build_kw_hits([doc_texts[pid] for pid in dict.fromkeys(doc_ids)], KW_TERMS)
+    save_kw_hits(H, kw_fingerprint(meta, KW_TERMS))
+
+    # 9) 文献 x 规范药名 命中矩阵：每个口径逐篇抽一次，查询时只做 Top-K 行求和
+    from drug_extractor import PROFILES, get_extractor, build_drug_hits, save_drug_hits, \
+        drug_fingerprint, drug_hits_path
+    from bm25_index import get_text
+    for profile in PROFILES:
+        ex = get_extractor(profile)
+        H = build_drug_hits([get_text(d) for d in docs], ex)
+        save_drug_hits(H, ex, drug_fingerprint(ex, docs_path), drug_hits_path(profile, root))
+
+    # 10) 句向量：建索引时一次算好（带模型名 + 指纹），查询脚本不再重编码；
+    #    增量模式下内容哈希命中缓存的段落直接复用旧行，只编码新增/改动段落的句子；
+    #    顺带生成归一化的段落中心向量
+    if not args.skip_sent_emb:
+        from retrieve import SENT_MODEL, encode_sents, save_sent_emb, save_para_emb, sents_fingerprint
+        if args.stub_models:
+            from stub_models import STUB_ENCODER_NAME
+            model_name = STUB_ENCODER_NAME
+        else:
+            model_name = SENT_MODEL
+        emb_cache = load_sent_emb_cache(model_name) if args.incremental else {}
+        emb_todo = [di for di, key in enumerate(doc_keys)
+                    if key not in emb_cache or len(emb_cache[key]) != len(doc_sents[di])]
+        todo_sents = [s for di in emb_todo for s in doc_sents[di]]
+        print(f"🧠 编码句向量：{model_name}（缓存命中 {len(docs) - len(emb_todo)} 段，需编码 {len(todo_sents)} 句）")
+        new_emb = None
+        if todo_sents:
+            if args.stub_models:
+                from stub_models import StubEncoder
+                model = StubEncoder()
+            else:
+                from sentence_transformers import SentenceTransformer
+                model = SentenceTransformer(SENT_MODEL)
+            new_emb = encode_sents(model, todo_sents)
+        # 按段落顺序拼回完整矩阵：旧行直接复用，新行按顺序填进来
+        dim = new_emb.shape[1] if new_emb is not None else next(iter(emb_cache.values())).shape[1]
+        sent_emb = np.empty((len(sents), dim), dtype=np.float32)
+        todo_set, lo, k = set(emb_todo), 0, 0
+        for di, key in enumerate(doc_keys):
+            n = len(doc_sents[di])
+            if di in todo_set:
+                sent_emb[lo:lo + n] = new_emb[k:k + n]
+                k += n
+            else:
+                sent_emb[lo:lo + n] = emb_cache[key]
+            lo += n
+        del emb_cache
+        save_sent_emb(sents, None, model_name, emb=sent_emb)
+        save_sent_emb_cache(doc_keys, [len(x) for x in doc_sents], model_name, sents_fingerprint(sents, model_name))
+        save_para_emb(meta, sent_emb)
+        if args.ann:
+            from retrieve import SENT_EMB_PATH
+            from ann_index import SENT_IVF_PATH, build_ivf, save_ivf
+            ivf = build_ivf(sent_emb)
+            save_ivf(ivf, SENT_IVF_PATH, SENT_EMB_PATH)
+            print(f"🧭 句向量 IVF：{len(ivf['centroids'])} 个桶 -> {SENT_IVF_PATH}")
 
     print("✅ 索引完成：")
     print(f"   句子数 = {len(sents)}")
     print(f"   实体数 = {len(ent2id)}")
     print(f"   段落数 = {len(docs)}")
-    print("   已生成 index_tri_graph.npz 与 index_meta.json")
+    print(f"   已生成 index_tri_graph/、index_meta/、{NER_CACHE_PATH} 与句向量缓存（{SENT_EMB_CACHE}）")
 
 if __name__ == "__main__":
     main()
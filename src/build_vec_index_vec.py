@@ -1,9 +1,15 @@
+import argparse
 import json
 import os
 from pathlib import Path
 
 import numpy as np
-from sentence_transformers import SentenceTransformer
+
+from build_index import doc_hash
+from index_store import save_npy_atomic
+from meta_store import text_digest
+
+MODEL_NAME = "sentence-transformers/all-mpnet-base-v2"
 
 
 def load_docs(jsonl_path):
@@ -31,8 +37,47 @@ def load_docs(jsonl_path):
     return docs
 
 
+def load_vec_cache(cache_path: Path, emb_path: Path, model_name: str):
+    """
+    读取上一次的向量 + 每行内容哈希，返回 {hash: 向量行}。
+    模型不一致 / 行数对不上时返回空字典（等价于全量重算）。
+    """
+    if not cache_path.exists() or not emb_path.exists():
+        return {}
+    with open(cache_path, "r", encoding="utf-8") as f:
+        cache = json.load(f)
+    if cache.get("model") != model_name:
+        print(f"⚠️ 缓存模型 {cache.get('model')} ≠ {model_name}，忽略缓存")
+        return {}
+    old_emb = np.load(emb_path)
+    hashes = cache.get("hashes", [])
+    if len(hashes) != old_emb.shape[0]:
+        print("⚠️ 缓存哈希数与向量行数不一致，忽略缓存")
+        return {}
+    return {h: old_emb[i] for i, h in enumerate(hashes)}
+
+
 def main():
-    base_dir = Path(__file__).resolve().parent.parent
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="只对新增/改动的文献计算向量，其余复用 index_vec_emb.npy",
+    )
+    parser.add_argument("--root", default=None, help="工程目录（默认本仓库根目录）")
+    parser.add_argument(
+        "--stub-models",
+        action="store_true",
+        help="用离线替身编码器（stub_models.py），合成语料测速用",
+    )
+    parser.add_argument(
+        "--ann",
+        action="store_true",
+        help="顺带训练文献向量的 IVF 近似检索索引（ann_index.py）",
+    )
+    args = parser.parse_args()
+
+    base_dir = Path(args.root).resolve() if args.root else Path(__file__).resolve().parent.parent
     data_dir = base_dir / "data"
     jsonl_path = data_dir / "docs.jsonl"
 
@@ -44,33 +89,70 @@ def main():
     docs = load_docs(jsonl_path)
     print(f"✅ 共读取 {len(docs)} 篇文献")
 
+    out_emb = data_dir / "index_vec_emb.npy"
+    out_meta = data_dir / "index_vec_meta.json"
+    out_cache = data_dir / "index_vec_cache.json"
+
     # 选择一个比较轻的英文向量模型
     # 换成医学领域向量模型（可以根据需要再改）
-    model_name = "sentence-transformers/all-mpnet-base-v2"
-
-    print(f"🧠 加载向量模型：{model_name}")
-    model = SentenceTransformer(model_name)
+    model_name = MODEL_NAME
+    if args.stub_models:
+        from stub_models import StubEncoder, STUB_ENCODER_NAME
+        model_name = STUB_ENCODER_NAME
 
     texts = [d["text"] for d in docs]
-
-    print("⚙️ 开始计算文献向量（embedding）…")
-    embeddings = model.encode(
-        texts,
-        batch_size=32,
-        show_progress_bar=True,
-        convert_to_numpy=True,
-        normalize_embeddings=True,  # 方便后面用点积=相似度
-    )
-
-    out_emb = data_dir / "index_vec_emb.npy"
-    out_meta = data_dir / "index_vec_meta.json"
+    hashes = [doc_hash(t) for t in texts]
+
+    cached = load_vec_cache(out_cache, out_emb, model_name) if args.incremental else {}
+    todo = [i for i, h in enumerate(hashes) if h not in cached]
+    print(f"♻️ 缓存命中 {len(texts) - len(todo)} 篇，需计算 {len(todo)} 篇")
+
+    dim = next(iter(cached.values())).shape[0] if cached else None
+    new_emb = None
+    if todo:
+        print(f"🧠 加载向量模型：{model_name}")
+        if args.stub_models:
+            model = StubEncoder(dim=768)
+        else:
+            from sentence_transformers import SentenceTransformer
+            model = SentenceTransformer(model_name)
+
+        print("⚙️ 开始计算文献向量（embedding）…")
+        new_emb = model.encode(
+            [texts[i] for i in todo],
+            batch_size=32,
+            show_progress_bar=True,
+            convert_to_numpy=True,
+            normalize_embeddings=True,  # 方便后面用点积=相似度
+        )
+        dim = new_emb.shape[1]
+
+    # 按 docs 顺序拼回完整矩阵：旧行直接复用，新行追加进来
+    embeddings = np.empty((len(texts), dim), dtype=np.float32)
+    for i, h in enumerate(hashes):
+        if h in cached:
+            embeddings[i] = cached[h]
+    if todo:
+        embeddings[todo] = new_emb
 
     print(f"💾 保存向量到：{out_emb}")
-    np.save(out_emb, embeddings)
+    save_npy_atomic(out_emb, embeddings)   # 检索进程 mmap 着旧文件也不受影响
 
     print(f"💾 保存元信息到：{out_meta}")
+    # 元信息只记每行的 pid（+ 指纹）；原文不再存第三份，检索时从段落文本库（index_meta/）按行取
+    pids = [d["pid"] for d in docs]
     with open(out_meta, "w", encoding="utf-8") as f:
-        json.dump(docs, f, ensure_ascii=False, indent=2)
+        json.dump({"pids": pids, "pids_sha1": text_digest(pids)}, f, ensure_ascii=False)
+
+    with open(out_cache, "w", encoding="utf-8") as f:
+        json.dump({"model": model_name, "hashes": hashes}, f)
+
+    if args.ann:
+        from ann_index import VEC_IVF_PATH, build_ivf, save_ivf
+        out_ivf = base_dir / VEC_IVF_PATH
+        ivf = build_ivf(embeddings)
+        save_ivf(ivf, out_ivf, out_emb)
+        print(f"🧭 文献向量 IVF：{len(ivf['centroids'])} 个桶 -> {out_ivf}")
 
     print("✅ 向量索引构建完成！")
 
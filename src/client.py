@@ -0,0 +1,100 @@
+# src/client.py
+# 功能：serve.py 常驻检索服务的轻量客户端（只用标准库，不加载任何索引 / 模型），
+#       代替直接跑 retrieve.py / ppr_retrieve.py / answer_drugs.py / answer_drugs_bm25.py /
+#       vec_retrieve.py / answer_vec_drugs.py：打印格式与原脚本一致，--json 输出原始响应。
+# 用法：python src\client.py answer_drugs "你的问题" [--k 12] [--url http://127.0.0.1:8765] [--json]
+#       python src\client.py health | metrics
+#   或：from client import query; query("answer_drugs_bm25", "你的问题", k=20)["drugs"]
+
+import argparse, json, sys
+import urllib.error, urllib.request
+
+DEFAULT_URL = "http://127.0.0.1:8765"
+ENDPOINTS = ["retrieve", "ppr_retrieve", "answer_drugs", "answer_drugs_bm25", "vec_retrieve", "answer_vec_drugs"]
+TITLES = {
+    "retrieve": "TOP-K HITS",
+    "ppr_retrieve": "PPR+KW(FILTER) TOP-K",
+    "vec_retrieve": "VEC TOP-K",
+}
+
+
+def _request(url, data=None, timeout=120):
+    req = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            return json.loads(resp.read().decode("utf-8"))
+    except urllib.error.HTTPError as e:
+        try:
+            msg = json.loads(e.read().decode("utf-8")).get("error")
+        except ValueError:
+            msg = None
+        raise RuntimeError(f"服务返回 {e.code}：{msg or e.reason}") from None
+
+
+def query(endpoint, q, k=None, url=DEFAULT_URL, timeout=120):
+    """调一个端点，返回服务端的 JSON 响应（dict）；k=None 用服务端默认值"""
+    body = {"query": q}
+    if k is not None:
+        body["k"] = k
+    return _request(f"{url.rstrip('/')}/{endpoint}", json.dumps(body).encode("utf-8"), timeout)
+
+
+def health(url=DEFAULT_URL, timeout=10):
+    return _request(f"{url.rstrip('/')}/health", timeout=timeout)
+
+
+def _short(text, n, span=None):
+    """与 retrieve.highlight 一致：给了证据句区间就用【】标出来（区间是原文里的，先标再压空白）"""
+    if span is None:
+        text = " ".join(text.split())
+        return (text[:n] + "…") if len(text) > n else text
+    s, e = span
+    lo = 0 if e <= n else max(0, s - n // 4)
+    hi = max(lo + n, e)
+    out = text[lo:s] + "【" + text[s:e] + "】" + text[e:hi]
+    return ("…" if lo > 0 else "") + " ".join(out.split()) + ("…" if hi < len(text) else "")
+
+
+def pretty_print(resp):
+    print("\n================= QUERY =================")
+    print(resp["query"])
+    if "drugs" in resp:
+        print("=============== ANSWER (drug list) =============")
+        print(", ".join(resp["drugs"]) if resp["drugs"] else "(Top-K 未匹配到药名；可以增大 K)")
+        print("============= CITATIONS (Top-K) =============")
+    else:
+        print(f"=============== {TITLES.get(resp['endpoint'], 'TOP-K')} =============")
+    for r in resp["results"]:
+        short = _short(r["text"], 260, r["evidence"]) if r.get("evidence") else _short(r.get("title") or r["text"], 260)
+        print(f"[{r['rank']}] pid={r['pid']}  score={r['score']:.4f}\n    {short}\n")
+    print(f"⏱️ 服务端耗时 {resp['seconds'] * 1000:.1f}ms")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("endpoint", choices=ENDPOINTS + ["health", "metrics"])
+    ap.add_argument("query", nargs="?", default=None)
+    ap.add_argument("--k", type=int, default=None, help="Top-K（默认与对应脚本一致）")
+    ap.add_argument("--url", default=DEFAULT_URL)
+    ap.add_argument("--json", action="store_true", help="直接输出服务端 JSON")
+    args = ap.parse_args()
+
+    try:
+        if args.endpoint in ("health", "metrics"):
+            resp = _request(f"{args.url.rstrip('/')}/{args.endpoint}", timeout=10)
+        else:
+            if not args.query:
+                ap.error("缺少问题")
+            resp = query(args.endpoint, args.query, args.k, args.url)
+    except (RuntimeError, urllib.error.URLError) as e:
+        print(f"❌ {getattr(e, 'reason', e)}（服务是否已启动？python src\\serve.py）")
+        sys.exit(1)
+
+    if args.json or args.endpoint in ("health", "metrics"):
+        print(json.dumps(resp, ensure_ascii=False, indent=2))
+    else:
+        pretty_print(resp)
+
+
+if __name__ == "__main__":
+    main()
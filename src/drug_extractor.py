@@ -0,0 +1,451 @@
+# src/drug_extractor.py
+# 功能：统一的药名抽取器 —— 别名表只编译一次，放进一个 Aho-Corasick 自动机（ac_matcher.py），
+#       一遍线性扫描找出全部别名，返回规范名及其在原文中的位置；
+#       别名表再大，扫描代价也只和文本长度有关。
+#
+# 各脚本原来的写法都能用参数复现：
+#   answer_drugs        normalize="loose"  boundary="loose"   （normalize_text + 前后不是字母数字）
+#   answer_drugs_bm25   normalize="space"  boundary=None      （小写 + 压空白，子串包含）
+#   answer_vec_drugs    normalize="lower"  boundary=None      （小写，子串包含）
+#   qa_med_eval_bm25    normalize="lower"  boundary="word"  overlapping=False
+#                       （\b(长词优先的大正则)\b 的 finditer：从左到右、不重叠、同起点取最长）
+#
+# 建索引时对每篇文献跑一次抽取，存成稀疏的 文献 x 规范药名 计数矩阵（index_drug_hits_<口径>.npz），
+# 行顺序与 data/docs.jsonl / meta["docs"] / index_vec_emb.npy 一致；
+# 查询时任意 Top-K 的药名列表、命中篇数都只是几行求和，不再扫文本。
+
+import hashlib
+import json
+import os
+import re
+from typing import Dict, List
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from ac_matcher import AhoCorasick
+from bm25_index import DOCS_PATH, get_text
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# ==== 别名表（各答案脚本的口径） ====
+
+# answer_drugs（KG+PPR）：统一到“规范名”: [各种写法/别名]
+KG_ALIASES = {
+    "vancomycin": ["vancomycin"],
+    "linezolid": ["linezolid"],
+    "daptomycin": ["daptomycin"],
+    "teicoplanin": ["teicoplanin"],
+    "ceftaroline": ["ceftaroline"],
+    "clindamycin": ["clindamycin"],
+    "doxycycline": ["doxycycline"],
+    "trimethoprim-sulfamethoxazole": [
+        "trimethoprim-sulfamethoxazole",
+        "trimethoprim sulfamethoxazole",
+        "trimethoprim/sulfamethoxazole",
+        "tmp-smx", "co-trimoxazole", "cotrimoxazole"
+    ],
+    "nafcillin": ["nafcillin"],
+    "oxacillin": ["oxacillin"],
+    "dicloxacillin": ["dicloxacillin"],
+    "flucloxacillin": ["flucloxacillin"],
+    "cefazolin": ["cefazolin"],
+    "cephalexin": ["cephalexin"],
+    "gentamicin": ["gentamicin"],
+    "rifampin": ["rifampin", "rifampicin"],
+    "tetracycline": ["tetracycline"],
+}
+
+# answer_drugs_bm25 —— 简单的同义词/别名归一化（足够覆盖 MRSA/MSSA 常见用药）
+BM25_ALIASES = {
+    "vancomycin": ["vancomycin", "vanco"],
+    "linezolid": ["linezolid", "zyvox"],
+    "daptomycin": ["daptomycin", "cubicin"],
+    "teicoplanin": ["teicoplanin"],
+    "ceftaroline": ["ceftaroline", "tazef", "teflaro"],
+    "clindamycin": ["clindamycin"],
+    "doxycycline": ["doxycycline"],
+    "tetracycline": ["tetracycline", "minocycline", "minocyclin"],
+    "trimethoprim-sulfamethoxazole": [
+        "trimethoprim-sulfamethoxazole","trimethoprim sulfamethoxazole",
+        "tmp-smx","tmp smx","co-trimoxazole","cotrimoxazole","bactrim","septra"
+    ],
+    "oxacillin": ["oxacillin", "cloxacillin", "flucloxacillin"],
+    "nafcillin": ["nafcillin"],
+    "cefazolin": ["cefazolin"],
+    "cephalexin": ["cephalexin", "keflex"],
+    "dicloxacillin": ["dicloxacillin"],
+    "gentamicin": ["gentamicin"],
+    "rifampin": ["rifampin", "rifampicin"],
+    # 你数据里出现过的新药也加上
+    "levonadifloxacin": ["levonadifloxacin"],
+}
+
+# answer_vec_drugs：“标准药物名”列表（和 qa_med_questions.jsonl 里的 gold 一致）
+CANON_DRUGS: List[str] = [
+    # Staph / MRSA 相关
+    "cefazolin",
+    "ceftaroline",
+    "cephalexin",
+    "clindamycin",
+    "daptomycin",
+    "dicloxacillin",
+    "doxycycline",
+    "flucloxacillin",
+    "gentamicin",
+    "linezolid",
+    "nafcillin",
+    "oxacillin",
+    "rifampin",
+    "teicoplanin",
+    "tetracycline",
+    "trimethoprim-sulfamethoxazole",
+    "vancomycin",
+
+    # 尿路感染
+    "fosfomycin",
+    "nitrofurantoin",
+
+    # 呼吸道 / 肺炎
+    "amoxicillin",
+    "azithromycin",
+    "clarithromycin",
+
+    # 咽炎
+    "penicillin v",
+    "benzathine penicillin g",
+
+    # 蜂窝织炎
+    "amoxicillin-clavulanate",
+
+    # 幽门螺杆菌
+    "levofloxacin",
+    "metronidazole",
+
+    # 抗假单胞菌
+    "cefepime",
+    "ceftazidime",
+    "ciprofloxacin",
+    "imipenem-cilastatin",
+    "meropenem",
+    "piperacillin-tazobactam",
+]
+
+
+# 一点简单的别名（主要是连字符 / 斜杠 / 大写问题）
+DRUG_SYNONYMS: Dict[str, List[str]] = {
+    "trimethoprim-sulfamethoxazole": [
+        "trimethoprim-sulfamethoxazole",
+        "trimethoprim / sulfamethoxazole",
+        "trimethoprim-sulphamethoxazole",
+        "co-trimoxazole",
+        "cotrimoxazole",
+        "tmp-smx",
+        "tmp / smx",
+    ],
+    "amoxicillin-clavulanate": [
+        "amoxicillin-clavulanate",
+        "amoxicillin / clavulanate",
+        "amox-clav",
+        "co-amoxiclav",
+    ],
+    "penicillin v": [
+        "penicillin v",
+        "penicillin vk",
+    ],
+    "benzathine penicillin g": [
+        "benzathine penicillin g",
+        "benzathine benzylpenicillin",
+    ],
+    # 其他没写别名的，就用名字本身做匹配
+}
+
+
+def build_drug_pattern_map() -> Dict[str, List[str]]:
+    """把所有药名和别名都变成小写，用来做包含匹配。"""
+    pat = {}
+    for d in CANON_DRUGS:
+        base = d.lower()
+        pats = [base]
+        extra = DRUG_SYNONYMS.get(d, [])
+        pats.extend([e.lower() for e in extra])
+        pat[d] = pats
+    return pat
+
+
+# 口径名 -> 抽取器参数；建索引时每个口径各存一份命中矩阵
+PROFILES = {
+    "kg": dict(aliases=KG_ALIASES, normalize="loose", boundary="loose"),
+    "bm25": dict(aliases=BM25_ALIASES, normalize="space", boundary=None),
+    "vec": dict(aliases=build_drug_pattern_map(), normalize="lower", boundary=None),
+}
+
+# ==== 归一化 ====
+
+_WS_RE = re.compile(r"\s+")
+
+
+def normalize_text(s: str) -> str:
+    """宽松归一化：小写，各种横线 / 斜杠都当空格，连续空白压成一个"""
+    s = s.lower()
+    s = s.replace("–", "-").replace("—", "-")
+    s = s.replace("/", " ").replace("-", " ")
+    s = re.sub(r"\s+", " ", s)
+    return s
+
+
+def _normalize_space(s):
+    return _WS_RE.sub(" ", s.lower())
+
+
+def _normalize_lower(s):
+    return s.lower()
+
+
+_NORMALIZERS = {
+    "loose": normalize_text,
+    "space": _normalize_space,
+    "lower": _normalize_lower,
+}
+
+
+def _normalize_with_offsets(text, mode):
+    """
+    逐字符做与 _NORMALIZERS[mode] 相同的归一化，同时记下每个输出字符来自原文哪个位置。
+    返回 (归一化文本, 偏移表)，偏移表长度 = 归一化文本长度 + 1（末尾 = len(text)）。
+    """
+    out, offs = [], []
+    prev_space = False
+    for i, ch in enumerate(text):
+        for c in ch.lower():
+            if mode == "loose":
+                if c in "–—/-":
+                    c = " "
+            if mode != "lower" and c.isspace():
+                if prev_space:
+                    continue
+                c = " "
+            prev_space = c == " " and mode != "lower"
+            out.append(c)
+            offs.append(i)
+    offs.append(len(text))
+    return "".join(out), offs
+
+
+def _is_alnum_ascii(c):
+    return c.isascii() and c.isalnum()
+
+
+def _is_word(c):
+    return c.isalnum() or c == "_"
+
+
+class DrugExtractor:
+    """
+    aliases: {规范名: [别名, ...]}，或者直接给一串名字（每个名字自己就是规范名）
+    normalize: "loose" / "space" / "lower"（文本和别名用同一种归一化）
+    boundary:  "loose"（前后不是 [a-z0-9]）/ "word"（正则 \\b）/ None（子串即可）
+    overlapping: True 报告所有出现（含重叠）；False 从左到右不重叠、同起点取最长
+    """
+
+    def __init__(self, aliases, normalize="loose", boundary="loose", overlapping=True):
+        if not isinstance(aliases, dict):
+            aliases = {name: [name] for name in aliases}
+        self.canon = list(aliases)
+        self.normalize = normalize
+        self.boundary = boundary
+        self.overlapping = overlapping
+        self._norm = _NORMALIZERS[normalize]
+
+        # 归一化后相同的别名合并成一个模式；一个模式可能对应多个规范名
+        pat_index, self._pat_canon = {}, []
+        for ci, name in enumerate(self.canon):
+            for a in aliases[name]:
+                p = self._norm(a)
+                if not p:
+                    continue
+                pi = pat_index.setdefault(p, len(pat_index))
+                if pi == len(self._pat_canon):
+                    self._pat_canon.append([])
+                if ci not in self._pat_canon[pi]:
+                    self._pat_canon[pi].append(ci)
+        self._patterns = list(pat_index)
+        self._plen = [len(p) for p in self._patterns]
+        self._ac = AhoCorasick(self._patterns)
+
+    def _boundary_ok(self, s, start, end, orig=None, offs=None):
+        if self.boundary is None:
+            return True
+        if self.boundary == "loose":
+            before = s[start - 1] if start > 0 else ""
+            after = s[end] if end < len(s) else ""
+            return not (before and _is_alnum_ascii(before)) and not (after and _is_alnum_ascii(after))
+        # "word"：与正则 \b 一致 —— 两侧「是否单词字符」不同；
+        # 小写会改变长度时（如 'İ' -> 'i̇'）按原文字符判断，和原文上跑正则一样
+        if orig is not None:
+            s, start, end = orig, offs[start], offs[end - 1] + 1
+        before = s[start - 1] if start > 0 else ""
+        after = s[end] if end < len(s) else ""
+        return (bool(before) and _is_word(before)) != _is_word(s[start]) and \
+               _is_word(s[end - 1]) != (bool(after) and _is_word(after))
+
+    def _scan(self, s, orig=None, offs=None):
+        """在归一化文本上扫一遍，返回 [(start, end, 模式编号)]，按起点排序"""
+        ms = []
+        for end, pi in self._ac.iter_matches(s):
+            start = end - self._plen[pi]
+            if self._boundary_ok(s, start, end, orig, offs):
+                ms.append((start, end, pi))
+        if self.overlapping:
+            ms.sort()
+            return ms
+        ms.sort(key=lambda m: (m[0], m[0] - m[1]))
+        picked, last = [], 0
+        for m in ms:
+            if m[0] >= last:
+                picked.append(m)
+                last = m[1]
+        return picked
+
+    def config(self):
+        """抽取口径（别名表 + 参数），用作命中矩阵缓存的指纹"""
+        return {"canon": self.canon, "patterns": self._patterns, "pat_canon": self._pat_canon,
+                "normalize": self.normalize, "boundary": self.boundary, "overlapping": self.overlapping}
+
+    def count(self, text):
+        """{规范名编号: 命中次数}"""
+        cnt = {}
+        for _, _, pi in self._scan(*self._prepare(text)):
+            for ci in self._pat_canon[pi]:
+                cnt[ci] = cnt.get(ci, 0) + 1
+        return cnt
+
+    def _prepare(self, text):
+        s = self._norm(text)
+        if self.boundary == "word" and len(s) != len(text):
+            s, offs = _normalize_with_offsets(text, self.normalize)
+            return s, text, offs
+        return s, None, None
+
+    def extract(self, text):
+        """text 里出现过的规范名（去重，按别名表顺序）"""
+        hit = set()
+        for _, _, pi in self._scan(*self._prepare(text)):
+            hit.update(self._pat_canon[pi])
+        return [self.canon[ci] for ci in sorted(hit)]
+
+    def find(self, text):
+        """所有命中：[(规范名, 原文起点, 原文终点)]，原文切片 text[start:end] 即命中的写法"""
+        s, offs = _normalize_with_offsets(text, self.normalize)
+        orig = text if self.boundary == "word" else None
+        out = []
+        for start, end, pi in self._scan(s, orig, offs):
+            for ci in self._pat_canon[pi]:
+                out.append((self.canon[ci], offs[start], offs[end - 1] + 1))
+        return out
+
+
+def get_extractor(profile):
+    """按口径名取抽取器（每个口径只编译一次）"""
+    ex = _EXTRACTORS.get(profile)
+    if ex is None:
+        ex = _EXTRACTORS[profile] = DrugExtractor(**PROFILES[profile])
+    return ex
+
+
+_EXTRACTORS = {}
+
+# ==== 文献 x 规范药名 命中矩阵 ====
+
+
+def drug_hits_path(profile, base_dir=BASE_DIR):
+    return os.path.join(base_dir, f"index_drug_hits_{profile}.npz")
+
+
+def drug_fingerprint(ex, docs_path=DOCS_PATH):
+    """抽取口径 + 语料文件（大小、修改时间）"""
+    st = os.stat(docs_path)
+    h = hashlib.sha1(json.dumps(ex.config(), ensure_ascii=False, sort_keys=True).encode("utf-8"))
+    h.update(f"{st.st_size}:{int(st.st_mtime)}".encode("utf-8"))
+    return h.hexdigest()
+
+
+def build_drug_hits(texts, ex):
+    """每篇文献跑一次抽取：返回 文献 x 规范药名 的命中次数（CSR）"""
+    rows, cols, vals = [], [], []
+    for i, t in enumerate(texts):
+        for ci, c in sorted(ex.count(t).items()):
+            rows.append(i); cols.append(ci); vals.append(c)
+    return csr_matrix((np.array(vals, dtype=np.int32), (rows, cols)), shape=(len(texts), len(ex.canon)))
+
+
+def save_drug_hits(H, ex, fingerprint, path):
+    np.savez(path, data=H.data, indices=H.indices, indptr=H.indptr, shape=H.shape,
+             canon=np.array(ex.canon), fingerprint=np.array(fingerprint))
+
+
+def load_drug_hits(profile, ex=None, docs_path=DOCS_PATH, base_dir=BASE_DIR):
+    """
+    读某个口径的命中矩阵；别名表 / 参数 / docs.jsonl 变了就重扫一遍并落盘。
+    profile 不在 PROFILES 里时（比如按 gold 词表临时拼的口径）需要传 ex。
+    base_dir = 矩阵所在目录（合成语料等别的工程目录）。
+    返回 (H, 规范名列表)，H 的行 = docs.jsonl 中的非空行。
+    """
+    ex = ex or get_extractor(profile)
+    path = drug_hits_path(profile, base_dir)
+    fp = drug_fingerprint(ex, docs_path)
+    if os.path.exists(path):
+        Z = np.load(path)
+        if str(Z["fingerprint"]) == fp:
+            return csr_matrix((Z["data"], Z["indices"], Z["indptr"]), shape=tuple(Z["shape"])), ex.canon
+    print(f"⚠️ 药名命中矩阵（{profile}）缺失或已过期，重新扫描…")
+    with open(docs_path, "r", encoding="utf-8") as f:
+        texts = [get_text(json.loads(l)) for l in f if l.strip()]
+    H = build_drug_hits(texts, ex)
+    save_drug_hits(H, ex, fp, path)
+    return H, ex.canon
+
+
+def drug_doc_counts(H, rows):
+    """这几篇文献里，每个规范名出现在几篇（稀疏行抽取 + 二值化列求和）"""
+    sub = H[np.asarray(rows, dtype=np.int64)]
+    return np.asarray((sub > 0).sum(axis=0)).ravel()
+
+
+def drugs_in_rows(H, rows, canon):
+    """这几篇文献里出现过的规范名（按别名表顺序）"""
+    return [canon[ci] for ci in np.flatnonzero(drug_doc_counts(H, rows))]
+
+
+def first_hit_ranks(H, rows):
+    """每个规范名在 rows（已排好序的文献）里第一次出现的名次；没出现记 len(rows)"""
+    sub = H[np.asarray(rows, dtype=np.int64)]
+    sub.eliminate_zeros()
+    first = np.full(sub.shape[1], len(rows), dtype=np.int64)
+    # CSR 按行存，行号单调不减 —— 每个列号第一次出现的位置就是最早名次
+    cols, pos = np.unique(sub.indices, return_index=True)
+    first[cols] = np.searchsorted(sub.indptr, pos, side="right") - 1
+    return first
+
+
+def drugs_by_prefix(H, rows, canon, ks):
+    """
+    rows 按名次排好，一次算出每个前缀 rows[:K] 里出现过的规范名：{K: [规范名，按别名表顺序]}；
+    与对每个 K 调 drugs_in_rows(H, rows[:K], canon) 一致，多加几个 K 几乎不花时间。
+    """
+    first = first_hit_ranks(H, rows)
+    return {k: [canon[ci] for ci in np.flatnonzero(first < min(k, len(rows)))] for k in ks}
+
+
+def rank_drugs_in_rows(H, rows, canon):
+    """
+    按命中篇数从多到少排规范名；同篇数时谁先在 rows 里出现谁在前，再按别名表顺序
+    （与逐段抽取后 Counter.most_common() 的顺序一致）。返回 [(规范名, 篇数)]。
+    """
+    sub = (H[np.asarray(rows, dtype=np.int64)] > 0).tocsc()
+    out = []
+    for ci in range(sub.shape[1]):
+        r = sub.indices[sub.indptr[ci]:sub.indptr[ci + 1]]
+        if len(r):
+            out.append((-len(r), int(r.min()), ci))
+    return [(canon[ci], -n) for n, _, ci in sorted(out)]
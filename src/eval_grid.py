@@ -1,6 +1,11 @@
 # -*- coding: utf-8 -*-
-# 批量扫不同K，比较 BM25 vs KG+PPR 的 P/R/F1，并输出CSV（Windows 编码安全版）
-import os, csv, subprocess, locale, re
+# 批量扫不同K，比较 BM25 vs KG+PPR 的 P/R/F1，并输出CSV
+# 进程内调用（runner.EvalRunner），索引和模型整个网格只加载一次；
+# 默认每个方法只检索一次（取最大 K），各 K 直接用排序前缀的累计药名集合；--per-k 则逐个 K 重新检索（对照用）
+# 用法：python src\eval_grid.py [--k-list 5,10,15,20,30,50] [--per-k]
+import argparse, os, csv
+
+from runner import EvalRunner
 
 # —— Gold 集（固定 17 项）——
 GOLD = {
@@ -13,44 +18,6 @@ GOLD = {
 QUESTION = "Which antibiotics are commonly used to treat Staphylococcus aureus (including MRSA) infections?"
 K_LIST = [5, 10, 15, 20, 30, 50]
 
-def safe_decode(b: bytes) -> str:
-    """优先 UTF-8；失败则用 Windows 本地编码（mbcs/系统首选编码），忽略非法字节"""
-    try:
-        return b.decode("utf-8")
-    except UnicodeDecodeError:
-        try:
-            return b.decode("mbcs", errors="ignore")
-        except LookupError:
-            return b.decode(locale.getpreferredencoding(False), errors="ignore")
-
-def run_cmd(cmd: str) -> str:
-    """不要用 text=True/encoding，直接拿字节再自己解码，避免 UnicodeDecodeError"""
-    cp = subprocess.run(cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
-    out_bytes = cp.stdout or b""
-    return safe_decode(out_bytes)
-
-def parse_answer_list(stdout: str):
-    """
-    在输出里定位
-      'ANSWER (drug list)'
-    下一行的逗号分隔药名；如果出现多次，取最后一段。
-    """
-    lines = stdout.splitlines()
-    hit_idx = -1
-    for i, line in enumerate(lines):
-        if "ANSWER (drug list)" in line:
-            hit_idx = i
-    if hit_idx == -1:
-        return []
-    if hit_idx + 1 >= len(lines):
-        return []
-    raw = lines[hit_idx + 1].strip()
-    if raw.startswith("("):  # 没匹配到药名
-        return []
-    # 拆分并标准化
-    drugs = [re.sub(r"\s+", " ", x.strip().lower()) for x in raw.split(",")]
-    return [d for d in drugs if d]
-
 def prf1(pred_set, gold_set):
     tp = len(pred_set & gold_set)
     fp = len(pred_set - gold_set)
@@ -61,22 +28,30 @@ def prf1(pred_set, gold_set):
     return tp, fp, fn, p, r, f1
 
 def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--k-list", default=",".join(map(str, K_LIST)))
+    ap.add_argument("--per-k", action="store_true", help="每个 K 单独检索一次（旧做法，对照用）")
+    args = ap.parse_args()
+    k_list = [int(x) for x in args.k_list.split(",")]
+
+    runner = EvalRunner()
     os.makedirs("runs", exist_ok=True)
     out_csv = "runs/compare_grid.csv"
     rows = []
 
-    for K in K_LIST:
+    if args.per_k:
+        found = {m: {K: runner.answer(m, QUESTION, K)["drugs"] for K in k_list} for m in runner.METHODS}
+    else:
+        found = {m: {K: ans["drugs"] for K, ans in runner.sweep(m, QUESTION, k_list).items()} for m in runner.METHODS}
+
+    for K in k_list:
         # —— BM25 —— #
-        bm_out = run_cmd(f'python src\\answer_drugs_bm25.py "{QUESTION}" {K}')
-        bm_list = parse_answer_list(bm_out)
-        bm_set = set(bm_list)
+        bm_set = set(found["BM25"][K])
         tp, fp, fn, p, r, f1 = prf1(bm_set, GOLD)
         rows.append(["BM25", K, tp, fp, fn, round(p,3), round(r,3), round(f1,3), ";".join(sorted(bm_set))])
 
         # —— KG+PPR —— #
-        pp_out = run_cmd(f'python src\\answer_drugs.py "{QUESTION}" {K}')
-        pp_list = parse_answer_list(pp_out)
-        pp_set = set(pp_list)
+        pp_set = set(found["KG+PPR"][K])
         tp, fp, fn, p, r, f1 = prf1(pp_set, GOLD)
         rows.append(["KG+PPR", K, tp, fp, fn, round(p,3), round(r,3), round(f1,3), ";".join(sorted(pp_set))])
 
@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
-import subprocess, csv, locale, re
+# 多个问法的宏平均；进程内调用（runner.EvalRunner），模型只加载一次
+from runner import EvalRunner
 
 GOLD = {
     "vancomycin","linezolid","daptomycin","teicoplanin","ceftaroline",
@@ -17,32 +18,6 @@ QUESTIONS = [
 ]
 K = 15  # 你可以改成 30 再跑一次
 
-def safe_decode(b: bytes) -> str:
-    try:
-        return b.decode("utf-8")
-    except UnicodeDecodeError:
-        try:
-            return b.decode("mbcs", errors="ignore")
-        except:
-            return b.decode(locale.getpreferredencoding(False), errors="ignore")
-
-def run_cmd(cmd: str) -> str:
-    cp = subprocess.run(cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
-    return safe_decode(cp.stdout or b"")
-
-def parse_answer_list(stdout: str):
-    lines = stdout.splitlines()
-    hit = -1
-    for i, line in enumerate(lines):
-        if "ANSWER (drug list)" in line:
-            hit = i
-    if hit == -1 or hit+1 >= len(lines):
-        return []
-    raw = lines[hit+1].strip()
-    if raw.startswith("("):
-        return []
-    return [re.sub(r"\s+"," ",x.strip().lower()) for x in raw.split(",") if x.strip()]
-
 def prf1(pred, gold):
     pred = set(pred); gold = set(gold)
     tp = len(pred & gold)
@@ -53,18 +28,18 @@ def prf1(pred, gold):
     f1 = 2*p*r/(p+r) if p+r else 0.0
     return p, r, f1
 
-def one_method(name, cmd):
-    out = run_cmd(cmd)
-    lst = parse_answer_list(out)
+def one_method(runner, name, q):
+    lst = runner.answer(name, q, K)["drugs"]
     p,r,f1 = prf1(lst, GOLD)
     return p,r,f1,lst
 
 def main():
     sums = {'BM25':[0,0,0], 'KG+PPR':[0,0,0]}
     n = len(QUESTIONS)
+    runner = EvalRunner()
     for q in QUESTIONS:
-        p_bm, r_bm, f1_bm, lst_bm = one_method('BM25',   f'python src\\answer_drugs_bm25.py "{q}" {K}')
-        p_pp, r_pp, f1_pp, lst_pp = one_method('KG+PPR', f'python src\\answer_drugs.py "{q}" {K}')
+        p_bm, r_bm, f1_bm, lst_bm = one_method(runner, 'BM25',   q)
+        p_pp, r_pp, f1_pp, lst_pp = one_method(runner, 'KG+PPR', q)
         print(f"\nQ: {q}\n  [BM25]   P={p_bm:.3f} R={r_bm:.3f} F1={f1_bm:.3f}")
         print(f"  [KG+PPR] P={p_pp:.3f} R={r_pp:.3f} F1={f1_pp:.3f}")
         sums['BM25'][0]+=p_bm; sums['BM25'][1]+=r_bm; sums['BM25'][2]+=f1_bm
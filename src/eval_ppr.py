@@ -0,0 +1,84 @@
+# src/eval_ppr.py
+# 功能：在 data/qa_med_questions.jsonl 上对比两种实体 PPR：
+#       power = 现有的全图幂迭代；push = 局部 push 近似（不同 eps）
+#       指标：实体分布 L1 误差、Top-K 段落与幂迭代结果的重合率、PPR 单次耗时
+#       另外对比：逐题幂迭代 vs entity_ppr_scores_batch 一次算完全部问题
+# 用法：python src\eval_ppr.py [K]
+
+import os, sys, json, time, csv
+import numpy as np
+
+from retrieve import load_index, build_embeddings, activate_entities, load_para_emb
+from ppr_retrieve import (entity_ppr_scores, entity_ppr_scores_batch, entity_ppr_push,
+                          load_transition, load_kw_hits, rank_paragraphs_ppr)
+
+QA_PATH = os.path.join("data", "qa_med_questions.jsonl")
+OUT_CSV = os.path.join("runs", "eval_ppr.csv")
+EPS_LIST = [1e-3, 1e-4, 1e-5, 1e-6]
+
+def timed(fn, *args, **kw):
+    t0 = time.perf_counter()
+    out = fn(*args, **kw)
+    return out, (time.perf_counter() - t0) * 1000
+
+def main():
+    K = int(sys.argv[1]) if len(sys.argv) >= 2 else 15
+
+    meta, M, C = load_index()
+    model, sent_emb = build_embeddings(meta["sents"])
+    para_emb = load_para_emb(meta, sent_emb)
+    P, deg = load_transition(M, C)
+    kw_hits = load_kw_hits(meta)
+    print(f"📐 实体数 {P.shape[0]}，转移矩阵 nnz={P.nnz}")
+
+    qs = [json.loads(l) for l in open(QA_PATH, "r", encoding="utf-8") if l.strip()]
+    rows = []
+    all_seeds = []
+    for q in qs:
+        qtext = q["question"]
+        seeds = activate_entities(qtext, model, sent_emb, M, meta, R=100, sim_th=0.25, rounds=1)
+        all_seeds.append(seeds)
+        r_pow, t_pow = timed(entity_ppr_scores, M, C, seeds, alpha=0.15, iters=50, P=P, deg=deg)
+        top_pow = rank_paragraphs_ppr(qtext, model, sent_emb, M, C, meta, seeds, topk=K,
+                                      para_emb=para_emb, trans=(P, deg), ppr="power", kw_hits=kw_hits)
+        pids_pow = {pid for pid, _ in top_pow}
+        rows.append([q.get("id", "?"), "power", "", len(seeds), f"{t_pow:.3f}", "0", "1.000"])
+
+        for eps in EPS_LIST:
+            r_push, t_push = timed(entity_ppr_push, P, deg, seeds, alpha=0.15, eps=eps)
+            top_push = rank_paragraphs_ppr(qtext, model, sent_emb, M, C, meta, seeds, topk=K,
+                                           para_emb=para_emb, trans=(P, deg), ppr="push", eps=eps,
+                                           kw_hits=kw_hits)
+            overlap = len(pids_pow & {pid for pid, _ in top_push}) / max(len(pids_pow), 1)
+            l1 = float(np.abs(r_pow - r_push).sum())
+            rows.append([q.get("id", "?"), "push", eps, len(seeds), f"{t_push:.3f}", f"{l1:.5f}", f"{overlap:.3f}"])
+
+    os.makedirs("runs", exist_ok=True)
+    with open(OUT_CSV, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["id", "method", "eps", "n_seeds", "ppr_ms", "l1_vs_power", f"top{K}_overlap"])
+        w.writerows(rows)
+
+    # 汇总：每种设置的平均耗时 / 误差 / 重合率
+    print(f"\n=== 汇总（{len(qs)} 个问题，Top-{K}）===")
+    print(f"{'method':<14}{'ppr_ms':>10}{'L1':>10}{'overlap':>10}")
+    for name, eps in [("power", "")] + [("push", e) for e in EPS_LIST]:
+        sel = [r for r in rows if r[1] == name and r[2] == eps]
+        ms = np.mean([float(r[4]) for r in sel])
+        l1 = np.mean([float(r[5]) for r in sel])
+        ov = np.mean([float(r[6]) for r in sel])
+        label = name if not eps else f"push eps={eps:g}"
+        print(f"{label:<14}{ms:>10.3f}{l1:>10.4f}{ov:>10.3f}")
+
+    # 批量：所有问题的种子一起做幂迭代
+    loop, t_loop = timed(lambda: [entity_ppr_scores(M, C, sd, alpha=0.15, iters=50, P=P, deg=deg)
+                                  for sd in all_seeds])
+    batch, t_batch = timed(entity_ppr_scores_batch, M, C, all_seeds, alpha=0.15, iters=50, P=P, deg=deg)
+    max_diff = max(float(np.abs(r - batch[:, j]).max()) for j, r in enumerate(loop))
+    print(f"\n=== 批量 PPR（{len(all_seeds)} 个问题）===")
+    print(f"逐题幂迭代：{t_loop:.2f} ms   批量：{t_batch:.2f} ms   "
+          f"加速 {t_loop / max(t_batch, 1e-9):.1f}x   最大差异 {max_diff:.2e}")
+    print(f"\n✅ 已写出 {OUT_CSV}")
+
+if __name__ == "__main__":
+    main()
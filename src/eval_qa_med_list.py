@@ -1,18 +1,19 @@
 # -*- coding: utf-8 -*-
 """
-批量评测医疗问答（英文 + 中文），调用 answer_drugs.py，
+批量评测医疗问答（英文 + 中文），进程内调用 answer_drugs 的 KG+PPR（runner.EvalRunner，模型只加载一次），
 对每个问题计算：TP/FP/FN、Precision、Recall、F1，并输出到 CSV。
 """
 
 import json
 import os
-import subprocess
 import csv
 from typing import List, Tuple, Set
 
+from runner import EvalRunner
+
 
 QA_PATH = "data/qa_med_questions.jsonl"   # 你刚才已经建好的文件
-TOP_K = 15                               # 调用 answer_drugs.py 的 K 值
+TOP_K = 15                               # KG+PPR 的 K 值
 OUT_DIR = "runs"
 OUT_CSV = os.path.join(OUT_DIR, "qa_med_eval.csv")
 
@@ -24,40 +25,6 @@ def normalize_drug(name: str) -> str:
     return name.strip().lower()
 
 
-def parse_answer_drug_list(stdout: str) -> List[str]:
-    """
-    从 answer_drugs.py 的输出里，把 “ANSWER (drug list)” 那一行后面的药名提取出来。
-    如果没有答案，则返回空列表。
-    """
-    if not stdout:
-        return []
-
-    lines = stdout.splitlines()
-    in_answer = False
-
-    for line in lines:
-        # 找到答案标题行
-        if "ANSWER (drug list)" in line:
-            in_answer = True
-            continue
-
-        if in_answer:
-            text = line.strip()
-            # 如果是空行或接下来是分隔线，就结束
-            if not text or text.startswith("============"):
-                break
-
-            # 如果是那种“未从 Top-K 引文中匹配到常见药名”之类的提示，就视为空答案
-            if text.startswith("("):
-                return []
-
-            # 正常情况：vancomycin, linezolid, ...
-            parts = [normalize_drug(p) for p in text.split(",") if p.strip()]
-            return parts
-
-    return []
-
-
 def eval_one(gold: List[str], pred: List[str]) -> Tuple[int, int, int, float, float, float, List[str]]:
     """
     对单个问题计算：
@@ -80,6 +47,7 @@ def eval_one(gold: List[str], pred: List[str]) -> Tuple[int, int, int, float, fl
 
 
 def main():
+    runner = EvalRunner()
     os.makedirs(OUT_DIR, exist_ok=True)
 
     qa_list = []
@@ -108,33 +76,15 @@ def main():
         print(f"[{qid}] 问题：{question}")
         print(f"金标准药物列表 ({len(gold_drugs)}): {gold_drugs}")
 
-        # 调用 answer_drugs.py
-        cmd = [
-            "python",
-            "src/answer_drugs.py",
-            question,
-            str(TOP_K),
-        ]
-        proc = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            encoding="utf-8",
-            errors="ignore",
-        )
-
-        stdout = proc.stdout
-        if proc.returncode != 0:
-            print(f"⚠️ answer_drugs.py 运行出错，returncode={proc.returncode}")
-            print("stdout:", stdout)
-            print("stderr:", proc.stderr)
+        try:
+            ans = runner.kg_ppr(question, TOP_K)
+        except Exception as e:
+            print(f"⚠️ KG+PPR 运行出错：{e!r}")
             pred_drugs = []
         else:
-            # 把完整输出打印一遍方便你看
-            print(stdout)
-            # 解析答案药物列表
-            pred_drugs = parse_answer_drug_list(stdout)
-            print(f"解析出的预测药物列表 ({len(pred_drugs)}): {pred_drugs}")
+            pred_drugs = [normalize_drug(d) for d in ans["drugs"]]
+            print(f"Top-K 引文 {len(ans['results'])} 段，用时 {ans['seconds']:.3f}s")
+            print(f"预测药物列表 ({len(pred_drugs)}): {pred_drugs}")
 
         tp, fp, fn, p, r, f1, pred_unique = eval_one(gold_drugs, pred_drugs)
 
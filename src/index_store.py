@@ -0,0 +1,149 @@
+# src/index_store.py
+# 功能：索引的「目录格式」—— 每个数组一个裸二进制文件（小端、不压缩、没有文件头，从偏移 0 开始，天然页对齐），
+#       外加 manifest.json 记录每个文件的 dtype / shape；读取时 np.memmap 只读映射，不解压、不拷贝：
+#         启动耗时与索引大小基本无关，同一台机器上的多个进程共享同一份页缓存。
+#       稀疏矩阵按 CSR 存 indptr / indices（放得下就用 int32）；
+#       0/1 关联矩阵（M 句子x实体、C 段落x实体）不存 data，读回来用步长为 0 的全 1 视图代替。
+#       manifest.json 最后写：目录里没有 manifest 就当作没建完。
+#       重建时不覆盖别的进程正 mmap 着的文件：数组文件名带版本号，全部写完后 manifest 经临时文件
+#       os.replace 一次切换，旧版本的文件随后删掉（已经映射的进程继续读旧 inode，直到重新打开）；
+#       单个 .npy / .npz / .json 同理用 save_npy_atomic / save_npz_atomic / save_json_atomic 先写临时文件再替换。
+# 用法：from index_store import save_store, open_store
+#       save_store("index_tri_graph", csr={"M": M, "C": C})
+#       mats = open_store("index_tri_graph")["csr"]    # {"M": csr_matrix, "C": csr_matrix}
+
+import json, os, time
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+MANIFEST = "manifest.json"
+STORE_FORMAT = 1
+
+def store_exists(path):
+    return os.path.exists(os.path.join(path, MANIFEST))
+
+def file_stamp(path):
+    st = os.stat(path)
+    return {"size": int(st.st_size), "mtime": int(st.st_mtime)}
+
+def _index_dtype(*maxvals):
+    return np.int32 if max(maxvals) < 2 ** 31 else np.int64
+
+def _tmp_name(path):
+    return f"{path}.tmp{os.getpid()}"
+
+def save_npy_atomic(path, arr):
+    """np.save 到临时文件再 os.replace：别的进程 mmap 着的旧文件不会被截断、也不会读到一半新一半旧"""
+    tmp = _tmp_name(path)
+    with open(tmp, "wb") as f:
+        np.save(f, arr)
+    os.replace(tmp, path)
+
+def save_npz_atomic(path, **arrays):
+    """np.savez 同理：写给文件对象（不会再补 .npz 后缀），path 本身要带 .npz"""
+    tmp = _tmp_name(path)
+    with open(tmp, "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(tmp, path)
+
+def save_json_atomic(path, obj, **kw):
+    tmp = _tmp_name(path)
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(obj, f, **kw)
+    os.replace(tmp, path)
+
+def _write(path, name, arr, version):
+    arr = np.ascontiguousarray(arr)
+    arr = arr.astype(arr.dtype.newbyteorder("<"), copy=False)
+    fn = f"{name}.{version}.bin"
+    arr.tofile(os.path.join(path, fn))
+    return {"file": fn, "dtype": arr.dtype.str, "shape": list(arr.shape)}
+
+def save_store(path, arrays=None, csr=None, extra=None):
+    """
+    arrays：名字 -> ndarray；csr：名字 -> 稀疏矩阵；extra：原样记进 manifest 的附加信息。
+    数组写成带版本号的新文件，写完再原子替换 manifest：中途失败时旧 manifest 和它的文件原样可用；
+    替换之后，新 manifest 没引用的 .bin（旧版本）删掉，删不掉（比如 Windows 下还被映射着）就留到下次。
+    """
+    os.makedirs(path, exist_ok=True)
+    version = f"{time.time_ns():x}"
+    man = {"format": STORE_FORMAT, "arrays": {}, "csr": {}, "extra": extra or {}}
+    for name, arr in (arrays or {}).items():
+        man["arrays"][name] = _write(path, name, arr, version)
+    for name, X in (csr or {}).items():
+        X = csr_matrix(X, copy=True)
+        X.sum_duplicates()   # 排好序、去重：读回来直接标成 canonical，不再检查
+        idt = _index_dtype(X.nnz, X.shape[1])
+        binary = bool(np.all(X.data == 1))
+        spec = {"shape": list(X.shape), "nnz": int(X.nnz), "binary": binary, "dtype": X.data.dtype.str,
+                "indptr": _write(path, f"{name}.indptr", X.indptr.astype(idt, copy=False), version),
+                "indices": _write(path, f"{name}.indices", X.indices.astype(idt, copy=False), version)}
+        if not binary:
+            spec["data"] = _write(path, f"{name}.data", X.data, version)
+        man["csr"][name] = spec
+    save_json_atomic(os.path.join(path, MANIFEST), man, ensure_ascii=False, indent=1)
+    keep = _files(man)
+    for fn in os.listdir(path):
+        if fn.endswith(".bin") and fn not in keep:
+            try:
+                os.remove(os.path.join(path, fn))
+            except OSError:
+                pass
+    return man
+
+def _files(man):
+    out = {spec["file"] for spec in man.get("arrays", {}).values()}
+    for spec in man.get("csr", {}).values():
+        out.update(spec[k]["file"] for k in ("indptr", "indices", "data") if k in spec)
+    return out
+
+def open_array(path, spec):
+    """只读 mmap 一个裸数组；返回普通 ndarray 视图（不是 np.memmap 子类），空数组不映射"""
+    shape = tuple(spec["shape"])
+    if int(np.prod(shape)) == 0:
+        return np.empty(shape, dtype=np.dtype(spec["dtype"]))
+    return np.asarray(np.memmap(os.path.join(path, spec["file"]), dtype=np.dtype(spec["dtype"]), mode="r",
+                                shape=shape))
+
+def open_csr(path, spec):
+    indptr = open_array(path, spec["indptr"])
+    indices = open_array(path, spec["indices"])
+    if spec["binary"]:
+        data = np.broadcast_to(np.ones(1, dtype=np.dtype(spec["dtype"])), (spec["nnz"],))
+    else:
+        data = open_array(path, spec["data"])
+    X = csr_matrix((data, indices, indptr), shape=tuple(spec["shape"]), copy=False)
+    X.has_sorted_indices = True
+    X.has_canonical_format = True
+    return X
+
+def read_manifest(path):
+    with open(os.path.join(path, MANIFEST), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def converted_stale(path, legacy):
+    """目录还没建，或目录是从旧格式文件 legacy 转换来的、而 legacy 之后又变了（直接建的目录不看 legacy）"""
+    if not store_exists(path):
+        return True
+    src = read_manifest(path).get("extra", {}).get("source_stamp")
+    return bool(src) and os.path.exists(legacy) and src != file_stamp(legacy)
+
+def open_store(path, retries=3):
+    """
+    读 manifest，把全部数组 / 矩阵 mmap 出来：{"arrays", "csr", "extra"}。
+    读完 manifest 还没来得及映射、旧版本文件就被重建进程删掉时，重读 manifest 再来一次。
+    """
+    for attempt in range(retries):
+        man = read_manifest(path)
+        if man.get("format") != STORE_FORMAT:
+            raise RuntimeError(f"❌ 不认识的索引目录格式：{path}（format={man.get('format')}），请重新运行 build_index.py")
+        try:
+            return {
+                "arrays": {name: open_array(path, spec) for name, spec in man["arrays"].items()},
+                "csr": {name: open_csr(path, spec) for name, spec in man["csr"].items()},
+                "extra": man.get("extra", {}),
+            }
+        except FileNotFoundError:
+            if attempt == retries - 1:
+                raise
@@ -0,0 +1,342 @@
+# src/meta_store.py
+# 功能：索引元信息（段落 ID、段落原文、句子、句子所属段落、实体表）的二进制存储，代替整份 index_meta.json：
+#         字符串列 = 偏移数组 (n+1,) int64 + UTF-8 大块，每个字符串后面跟一个 "\n"（所以整块的 sha1 就是内容指纹）；
+#         句子不另存文本，只存 (段落行号, 起, 止) 三个 int32 数组 —— 段落原文里的字符区间，取句子时现切；
+#         ent2id / 段落 ID -> 行号 = 按字符串排好序的下标数组，二分查找。
+#       文件由 index_store.py 写成目录（index_meta/），全部 mmap 只读；IndexMeta 是一个惰性 mapping，
+#       键与旧的 meta dict 一样（docs / doc_texts / sents / sent_docid / ent2id），按 ID 取到哪个字符串才解码哪个：
+#       启动耗时与常驻内存都不再随语料文本大小增长。
+#       另外多给几个键：doc_row（段落 ID -> 第一次出现的行号）、doc_text_rows（按行的段落原文）、
+#       sent_docrow / sent_start / sent_end（int32 数组）。
+# 用法：from meta_store import save_meta, open_meta
+#       save_meta("index_meta", doc_ids, doc_texts, sent_docid, sent_spans, ent2id)
+#       meta = open_meta("index_meta"); meta["doc_texts"].get(pid, ""); meta["ent2id"]["aspirin"]
+
+import bisect, hashlib
+from collections.abc import Mapping, Sequence
+
+import numpy as np
+
+from index_store import open_store, save_store
+
+META_FORMAT = 2   # 2：句子改存为段落原文里的区间
+
+def text_digest(strings):
+    """字符串序列的内容指纹：StringTable / SpanTable 直接用建表时记下的 sha1（O(1)），普通 list 现算，两者结果一致"""
+    if isinstance(strings, (StringTable, SpanTable)):
+        return strings.sha1
+    h = hashlib.sha1()
+    for s in strings:
+        h.update(s.encode("utf-8"))
+        h.update(b"\n")
+    return h.hexdigest()
+
+def encode_table(strings):
+    """list[str] -> (offsets int64 (n+1,), blob uint8, sha1)"""
+    parts = [s.encode("utf-8") + b"\n" for s in strings]
+    offsets = np.zeros(len(parts) + 1, dtype=np.int64)
+    np.cumsum([len(p) for p in parts], out=offsets[1:])
+    blob = b"".join(parts)
+    return offsets, np.frombuffer(blob, dtype=np.uint8), hashlib.sha1(blob).hexdigest()
+
+def sorted_order(strings):
+    """按字符串（相同时按行号）排好的行号，供 StringIndex 二分查找"""
+    return np.array(sorted(range(len(strings)), key=lambda i: (strings[i], i)), dtype=np.int32)
+
+
+class StringTable(Sequence):
+    """偏移 + UTF-8 大块的只读字符串列；table[i] 才解码第 i 个"""
+
+    def __init__(self, offsets, blob, sha1):
+        self.offsets = offsets
+        self.blob = blob
+        self.sha1 = sha1
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self.blob[self.offsets[i]:self.offsets[i + 1] - 1].tobytes().decode("utf-8")
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+
+class SpanTable(Sequence):
+    """句子 = 段落原文 texts[rows[i]] 的 [starts[i], ends[i]) 字符区间；顺序迭代时同一段只解码一次"""
+
+    def __init__(self, texts, rows, starts, ends, sha1):
+        self.texts = texts
+        self.rows = rows
+        self.starts = starts
+        self.ends = ends
+        self.sha1 = sha1
+
+    def __len__(self):
+        return len(self.rows)
+
+    def span(self, i):
+        """(段落行号, 起, 止)"""
+        return int(self.rows[i]), int(self.starts[i]), int(self.ends[i])
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        row, s, e = self.span(i)
+        return self.texts[row][s:e]
+
+    def __iter__(self):
+        row, text = -1, ""
+        for i in range(len(self)):
+            r, s, e = self.span(i)
+            if r != row:
+                row, text = r, self.texts[r]
+            yield text[s:e]
+
+
+class StringIndex(Mapping):
+    """
+    字符串 -> 行号（重复的字符串取第一次出现的行），在排好序的下标上二分；迭代顺序 = 行号顺序（去重）。
+    len = 不重复的键数（与迭代一致）；n_unique 已知（建表时记下的）就直接用，否则第一次 len 时沿排好序的键数一遍
+    """
+
+    def __init__(self, table, order, n_unique=None):
+        self.table = table
+        self.order = order
+        self._keys = _SortedKeys(table, order)
+        self._n_unique = n_unique
+
+    def _find(self, key):
+        lo = bisect.bisect_left(self._keys, key)
+        if lo < len(self.order) and self._keys[lo] == key:
+            return int(self.order[lo])
+        return None
+
+    def __getitem__(self, key):
+        i = self._find(key) if isinstance(key, str) else None
+        if i is None:
+            raise KeyError(key)
+        return i
+
+    def __contains__(self, key):
+        return isinstance(key, str) and self._find(key) is not None
+
+    def __len__(self):
+        if self._n_unique is None:
+            n, prev = 0, None
+            for k in self._keys:
+                if n == 0 or k != prev:
+                    n, prev = n + 1, k
+            self._n_unique = n
+        return self._n_unique
+
+    def __iter__(self):
+        seen = set()
+        for s in self.table:
+            if s not in seen:
+                seen.add(s)
+                yield s
+
+    def items(self):
+        seen = set()
+        for i, s in enumerate(self.table):
+            if s not in seen:
+                seen.add(s)
+                yield s, i
+
+
+class _SortedKeys(Sequence):
+    """按排序位置取字符串，给 bisect 用"""
+
+    def __init__(self, table, order):
+        self.table = table
+        self.order = order
+
+    def __len__(self):
+        return len(self.order)
+
+    def __getitem__(self, k):
+        return self.table[int(self.order[k])]
+
+
+class RowLookup(Mapping):
+    """键 -> 行号，再到另一张字符串列里取值：doc_texts[pid] = texts[doc_row[pid]]"""
+
+    def __init__(self, index, values):
+        self.index = index
+        self.values = values
+
+    def __getitem__(self, key):
+        return self.values[self.index[key]]
+
+    def __contains__(self, key):
+        return key in self.index
+
+    def __len__(self):
+        return len(self.index)
+
+    def __iter__(self):
+        return iter(self.index)
+
+
+class RowKeys(Sequence):
+    """行号数组 -> 字符串：sent_docid[i] = docs[sent_docrow[i]]"""
+
+    def __init__(self, rows, table):
+        self.rows = rows
+        self.table = table
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self.table[int(r)] for r in self.rows[i]]
+        return self.table[int(self.rows[i])]
+
+
+class IndexMeta(Mapping):
+    """
+    旧 meta dict 的惰性替身：docs 是 StringTable，sents 是 SpanTable（段落原文里的区间），
+    doc_texts / ent2id / doc_row 是 Mapping，sent_docid 是按行号现取的序列，sent_* 是 int32 数组。视图第一次被用到时才建。
+    """
+
+    KEYS = ("docs", "doc_texts", "sents", "sent_docid", "ent2id", "doc_row", "doc_text_rows",
+            "sent_docrow", "sent_start", "sent_end")
+
+    def __init__(self, store):
+        self.arrays = store["arrays"]
+        self.extra = store["extra"]
+        self._cache = {}
+
+    def table(self, name):
+        return StringTable(self.arrays[f"{name}.offsets"], self.arrays[f"{name}.blob"], self.extra["sha1"][name])
+
+    def _build(self, key):
+        if key == "docs":
+            return self.table(key)
+        if key == "doc_text_rows":
+            return self.table("doc_texts")
+        if key == "sents":
+            return SpanTable(self["doc_text_rows"], self.arrays["sent_docrow"], self.arrays["sent_start"],
+                             self.arrays["sent_end"], self.extra["sha1"]["sents"])
+        if key == "doc_row":
+            docs = self["docs"]
+            return StringIndex(docs, self.arrays["docs.order"], len(docs) if self.docs_unique else None)
+        if key == "doc_texts":
+            return RowLookup(self["doc_row"], self["doc_text_rows"])
+        if key in ("sent_docrow", "sent_start", "sent_end"):
+            return self.arrays[key]
+        if key == "sent_docid":
+            return RowKeys(self.arrays["sent_docrow"], self["docs"])
+        if key == "ent2id":
+            ents = self.table("ents")
+            return StringIndex(ents, self.arrays["ents.order"], len(ents))   # 实体表来自 ent2id 的键，本身不重复
+        raise KeyError(key)
+
+    def __getitem__(self, key):
+        if key not in self._cache:
+            self._cache[key] = self._build(key)
+        return self._cache[key]
+
+    def __len__(self):
+        return len(self.KEYS)
+
+    def __iter__(self):
+        return iter(self.KEYS)
+
+    @property
+    def docs_unique(self):
+        return bool(self.extra["docs_unique"])
+
+
+def spans_in_docs(doc_texts, sents, sent_docid):
+    """旧格式（句子存成字符串）转区间：在所属段落原文里从上一句的结尾往后找；找不到说明句子不是原文的子串"""
+    spans, pos, prev = [], 0, None
+    for s, pid in zip(sents, sent_docid):
+        if pid != prev:
+            pos, prev = 0, pid
+        text = doc_texts.get(pid, "")
+        start = text.find(s, pos)
+        if start < 0:
+            raise ValueError(f"句子不在段落 {pid} 的原文里：{s[:60]!r}")
+        spans.append((start, start + len(s)))
+        pos = start + len(s)
+    return spans
+
+def save_meta(path, docs, doc_texts, sent_docid, sent_spans, ent2id, extra=None):
+    """
+    docs：段落 ID 列表；doc_texts：段落 ID -> 原文；sent_docid / sent_spans：每句所属段落 ID 与它在原文里的
+    (起, 止) 字符区间（句子按段落顺序排）；ent2id：实体 -> ID（ID 为 0..n-1）。写成 index_store 目录，返回 manifest。
+    """
+    first_row = {}
+    for i, pid in enumerate(docs):
+        first_row.setdefault(pid, i)
+    ents = [None] * len(ent2id)
+    for e, i in ent2id.items():
+        ents[i] = e
+
+    arrays, sha1 = {}, {}
+    for name, strings in (("docs", docs), ("doc_texts", [doc_texts.get(pid, "") for pid in docs]), ("ents", ents)):
+        arrays[f"{name}.offsets"], arrays[f"{name}.blob"], sha1[name] = encode_table(strings)
+    arrays["docs.order"] = sorted_order(docs)
+    arrays["ents.order"] = sorted_order(ents)
+    arrays["sent_docrow"] = np.array([first_row[pid] for pid in sent_docid], dtype=np.int32)
+    arrays["sent_start"] = np.array([s for s, _ in sent_spans], dtype=np.int32)
+    arrays["sent_end"] = np.array([e for _, e in sent_spans], dtype=np.int32)
+    sha1["sent_docrow"] = hashlib.sha1(arrays["sent_docrow"].tobytes()).hexdigest()
+    sha1["sents"] = text_digest(doc_texts.get(pid, "")[s:e] for pid, (s, e) in zip(sent_docid, sent_spans))
+    info = {"format": META_FORMAT, "sha1": sha1, "docs_unique": len(first_row) == len(docs)}
+    info.update(extra or {})
+    return save_store(path, arrays=arrays, extra=info)
+
+def open_meta(path):
+    store = open_store(path)
+    if store["extra"].get("format") != META_FORMAT:
+        raise RuntimeError(f"❌ 不认识的元信息格式：{path}，请重新运行 build_index.py")
+    return IndexMeta(store)
+
+# ---------- 旧 dict 与 IndexMeta 通用的小工具 ----------
+
+def para_ids(meta):
+    """去重后的段落 ID（行顺序）；段落 ID 没有重复时直接就是 meta["docs"]，不展开"""
+    if isinstance(meta, IndexMeta) and meta.docs_unique:
+        return meta["docs"]
+    return list(dict.fromkeys(meta["docs"]))
+
+def doc_rows(meta):
+    """段落 ID -> 第一次出现的行号"""
+    if isinstance(meta, IndexMeta):
+        return meta["doc_row"]
+    out = {}
+    for i, pid in enumerate(meta["docs"]):
+        out.setdefault(pid, i)
+    return out
+
+def sent_docrows(meta):
+    """每句所属段落的行号（int 数组）"""
+    if isinstance(meta, IndexMeta):
+        return meta["sent_docrow"]
+    row_of = doc_rows(meta)
+    return np.array([row_of[pid] for pid in meta["sent_docid"]], dtype=np.int32)
+
+def doc_sent_range(meta, row):
+    """第 row 段的句子是 [lo, hi)（句子按段落顺序存，sent_docrow 单调不减）"""
+    rows = sent_docrows(meta)
+    return int(np.searchsorted(rows, row, "left")), int(np.searchsorted(rows, row, "right"))
+
+def sent_docrow_digest(meta):
+    if isinstance(meta, IndexMeta):
+        return meta.extra["sha1"]["sent_docrow"]
+    return hashlib.sha1(np.ascontiguousarray(sent_docrows(meta), dtype=np.int32).tobytes()).hexdigest()
@@ -1,12 +1,13 @@
 # src/ppr_retrieve.py  —— PPR + 关键词加权 + “必须含药名”硬过滤 + 负面词惩罚（强化版）
 
-import os, sys, json
+import os, sys, json, hashlib
 import numpy as np
 from scipy.sparse import csr_matrix, diags
-from sklearn.preprocessing import normalize
 from sentence_transformers import SentenceTransformer
 
-from retrieve import load_index, build_embeddings, activate_entities, encode
+from retrieve import load_index, build_embeddings, activate_entities, encode, load_para_emb, evidence_spans, highlight
+from meta_store import para_ids, text_digest
+from ac_matcher import AhoCorasick
 
 # —— 领域同义词 ——
 STAPH_SYNONYMS = [
@@ -41,6 +42,16 @@ REQUIRE_ANTIBIOTIC = True   # ⚠️ 必须命中“药名”才优先
 BETA  = 0.30                # 语义相似度权重
 GAMMA = 1.20                # 关键词权重（越大越“听话”）
 DELTA = 0.50                # 负面词惩罚
+PPR_ALPHA = 0.15            # PPR 重启概率（调参见 tune_ppr.py）
+PPR_METHOD = "power"        # "power" = 全图幂迭代；"push" = 局部 push 近似
+PPR_EPS = 1e-5              # push 模式的残差阈值（越小越准、越慢）
+
+# 段落 x 关键词 的命中次数矩阵（列顺序 = KW_TERMS），建索引时用 Aho-Corasick 扫一遍
+KW_TERMS = STAPH_SYNONYMS + ANTIBIOTIC_TERMS + NEG_TERMS
+KW_HITS_PATH = "index_kw_hits.npz"
+
+# 实体转移矩阵 P（W = MᵀM + CᵀC 去对角后行归一化）在建索引时算好
+TRANS_PATH = "index_ent_trans.npz"
 
 def _row_norm(mat: csr_matrix):
     row_sum = np.array(mat.sum(axis=1)).ravel()
@@ -48,18 +59,51 @@ def _row_norm(mat: csr_matrix):
     inv = 1.0 / row_sum
     return diags(inv) @ mat
 
-def entity_ppr_scores(M: csr_matrix, C: csr_matrix, seed_entities, alpha=0.15, iters=50, tol=1e-6):
-    W = (M.T @ M) + (C.T @ C)
+def graph_fingerprint(M: csr_matrix, C: csr_matrix):
+    """M / C 的结构指纹：矩阵一变，缓存的转移矩阵就作废"""
+    h = hashlib.sha1()
+    for X in (M, C):
+        h.update(np.asarray(X.shape, dtype=np.int64).tobytes())
+        h.update(np.ascontiguousarray(X.indptr).tobytes())
+        h.update(np.ascontiguousarray(X.indices).tobytes())
+    return h.hexdigest()
+
+def build_transition(M: csr_matrix, C: csr_matrix):
+    """返回 (P, deg)：P 为行归一化的实体转移矩阵，deg 为 W 的行和（度）"""
+    W = ((M.T @ M) + (C.T @ C)).tocsr()
     W.setdiag(0); W.eliminate_zeros()
-    P = _row_norm(W)
+    deg = np.array(W.sum(axis=1)).ravel()
+    P = _row_norm(W).tocsr()
+    return P, deg
+
+def save_transition(P: csr_matrix, deg, fingerprint, path=TRANS_PATH):
+    np.savez(path, data=P.data, indices=P.indices, indptr=P.indptr, shape=P.shape,
+             deg=deg, fingerprint=np.array(fingerprint))
+
+def load_transition(M: csr_matrix, C: csr_matrix, path=TRANS_PATH):
+    """读缓存的 (P, deg)；缺失或与当前 M/C 不符就重建并落盘"""
+    fp = graph_fingerprint(M, C)
+    if os.path.exists(path):
+        Z = np.load(path)
+        if str(Z["fingerprint"]) == fp:
+            P = csr_matrix((Z["data"], Z["indices"], Z["indptr"]), shape=tuple(Z["shape"]))
+            return P, Z["deg"]
+    print("⚠️ 实体转移矩阵缓存缺失或已过期，重建中…")
+    P, deg = build_transition(M, C)
+    save_transition(P, deg, fp, path)
+    return P, deg
 
-    E = W.shape[0]
-    v = np.zeros(E, dtype=np.float32)
+def entity_ppr_scores(M: csr_matrix, C: csr_matrix, seed_entities, alpha=0.15, iters=50, tol=1e-6, P=None, deg=None):
+    """幂迭代 PPR；传入预先算好的 (P, deg) 就不再每次重建 W"""
+    if P is None:
+        P, deg = build_transition(M, C)
+
+    E = P.shape[0]
+    v = np.zeros(E, dtype=np.float64)
     seeds = list(seed_entities) if seed_entities else []
     if seeds:
         v[seeds] = 1.0 / len(seeds)
     else:
-        deg = np.array(W.sum(axis=1)).ravel()
         v = deg / (deg.sum() + 1e-12) if deg.sum() > 0 else np.ones(E) / max(E, 1)
 
     r = v.copy()
@@ -70,87 +114,304 @@ def entity_ppr_scores(M: csr_matrix, C: csr_matrix, seed_entities, alpha=0.15, i
         r = r_next
     return r / (r.sum() + 1e-12)
 
-def _hits(text: str, vocab):
-    t = text.lower()
-    return sum(1 for k in vocab if k in t)
-
-def rank_paragraphs_ppr(query, model, sent_emb, M, C, meta, activated_entities, beta=BETA, gamma=GAMMA, delta=DELTA, topk=5):
-    # 段落聚合向量
-    para_sids = {}
-    for i, pid in enumerate(meta["sent_docid"]):
-        para_sids.setdefault(pid, []).append(i)
-    para_ids = list(dict.fromkeys(meta["docs"]))
-
-    P_vecs = np.zeros((len(para_ids), sent_emb.shape[1]), dtype=np.float32)
-    para_texts = []
-    for i, pid in enumerate(para_ids):
-        sids = para_sids.get(pid, [])
-        if sids:
-            P_vecs[i] = sent_emb[sids].mean(axis=0)
-        para_texts.append(meta["doc_texts"].get(pid, ""))
-    P_vecs = normalize(P_vecs)
-
-    # 查询扩展（含 staph 词就拼上同义词+药名）
+def entity_ppr_scores_batch(M: csr_matrix, C: csr_matrix, seed_sets, alpha=0.15, iters=50, tol=1e-6, P=None, deg=None):
+    """
+    多个问题一起跑幂迭代：R 是 (实体 x 问题) 的稠密块，每步一次稀疏 x 稠密乘法。
+    每列单独判收敛，收敛的列不再参与后续迭代。返回 (实体 x 问题)，每列与
+    entity_ppr_scores 对同一组种子的结果一致（同为 float64 迭代，只差求和顺序带来的舍入）。
+    """
+    if P is None:
+        P, deg = build_transition(M, C)
+
+    E, Q = P.shape[0], len(seed_sets)
+    V = np.zeros((E, Q), dtype=np.float64)   # float32 会把每步的乘积截断，tol 也就比到了舍入噪声上
+    for j, seed_entities in enumerate(seed_sets):
+        seeds = list(seed_entities) if seed_entities else []
+        if seeds:
+            V[seeds, j] = 1.0 / len(seeds)
+        else:
+            V[:, j] = deg / (deg.sum() + 1e-12) if deg.sum() > 0 else 1.0 / max(E, 1)
+
+    R = V.copy()
+    active = np.arange(Q)
+    for _ in range(iters):
+        if not active.size:
+            break
+        R_act = R[:, active]
+        R_next = (1 - alpha) * (P @ R_act) + alpha * V[:, active]
+        R[:, active] = R_next
+        diff = np.abs(R_next - R_act).sum(axis=0)
+        active = active[diff >= tol]
+    return R / (R.sum(axis=0, keepdims=True) + 1e-12)
+
+def _grow(a, m):
+    """局部数组容量不够 m 时按倍数扩容（新位置补 0）"""
+    if m <= a.size:
+        return a
+    out = np.zeros(max(m, 2 * a.size), dtype=a.dtype)
+    out[:a.size] = a
+    return out
+
+def entity_ppr_push_sparse(P: csr_matrix, deg, seed_entities, alpha=0.15, eps=PPR_EPS):
+    """
+    局部 push 近似 PPR，返回 (实体号, 分数)：只含被 push 过的实体，分数已归一化（和为 1）。
+    与 entity_ppr_scores 解同一个方程 r = (1-α)·P r + α·v。
+    因为 W 对称、P = D⁻¹W，令 y = D r 得 y = (1-α)·Pᵀ y + α·D v，
+    即标准的 PPR，可以用 push：把节点 u 的残差按 P 的第 u 行分给邻居，
+    直到所有残差 < eps·deg(u)。最后 r = y / deg。
+    eps 是相对度的残差阈值：单个实体的误差约为 eps 量级。
+    残差与估计值只存在「碰到过的实体」的紧凑数组里：实体号 -> 局部下标用稀疏集合
+    （pos 是 np.empty，不初始化；x 在集合里当且仅当 pos[x] < n 且 ids[pos[x]] == x），
+    单次代价只随种子附近被碰到的边数增长，与实体总数无关；
+    只有前沿铺满大半张图、改走整图 mat-vec 的那几轮是 O(实体数)（此时与幂迭代同价）。
+    """
+    seeds = np.unique(np.asarray(list(seed_entities), dtype=np.int64))
+    E = P.shape[0]
+    v0 = 1.0 / len(seeds)
+
+    pos = np.empty(E, dtype=np.int64)
+    ids = np.zeros(max(64, 4 * seeds.size), dtype=np.int64)
+    res = np.zeros(ids.size, dtype=np.float64)
+    y = np.zeros(ids.size, dtype=np.float64)
+    n = 0
+
+    def local(g):
+        """实体号（可重复）-> 局部下标；没见过的实体顺手加进集合"""
+        nonlocal n, ids, res, y
+        p = pos[g]
+        hit = (p >= 0) & (p < n)
+        hit[hit] = ids[p[hit]] == g[hit]
+        new = g[~hit]
+        if new.size:
+            pos[new] = np.arange(new.size)
+            new = new[pos[new] == np.arange(new.size)]   # 去重（同一实体只留一个）
+            m = n + new.size
+            ids, res, y = _grow(ids, m), _grow(res, m), _grow(y, m)
+            ids[n:m] = new
+            pos[new] = np.arange(n, m)
+            n = m
+            p = pos[g]
+        return p
+
+    iso = seeds[deg[seeds] <= 0]          # 孤立实体：P 的该行为 0，r_u = α·v_u
+    frontier = local(seeds[deg[seeds] > 0])
+    res[frontier] = v0 * deg[ids[frontier]]
+
+    # 按“前沿”批量 push：本轮所有残差超阈值的节点一起推，一次稀疏行抽取完成；
+    # 前沿已铺满大半张图时，改用一次整图稀疏 mat-vec
+    dense_at = P.nnz // 8
+    while frontier.size:
+        g = ids[frontier]
+        ru = res[frontier]
+        y[frontier] += alpha * ru
+        res[frontier] = 0.0
+        if P.indptr[g + 1].sum() - P.indptr[g].sum() > dense_at:
+            vec = np.zeros(E, dtype=np.float64)
+            vec[g] = (1 - alpha) * ru
+            add = P.T @ vec
+            tg = np.flatnonzero(add)
+            tl = local(tg)
+            res[tl] += add[tg]
+        else:
+            sub = P[g]
+            w = np.repeat((1 - alpha) * ru, np.diff(sub.indptr)) * sub.data
+            tl = local(sub.indices)
+            np.add.at(res, tl, w)
+        # 只有本轮收到残差的节点才可能越过阈值；局部下标上同样用 pos 技巧去重，避免排序
+        cand = tl[res[tl] >= eps * deg[ids[tl]]]
+        lpos = np.empty(n, dtype=np.int64)
+        lpos[cand] = np.arange(cand.size)
+        frontier = cand[lpos[cand] == np.arange(cand.size)]
+
+    keep = np.flatnonzero(y[:n] > 0)
+    out_ids = np.concatenate([iso, ids[keep]])
+    vals = np.concatenate([np.full(iso.size, alpha * v0), y[keep] / deg[ids[keep]]])
+    return out_ids, vals / (vals.sum() + 1e-12)
+
+def entity_ppr_push(P: csr_matrix, deg, seed_entities, alpha=0.15, eps=PPR_EPS):
+    """
+    entity_ppr_push_sparse 的稠密版（float32，长度 = 实体数），供 C @ r_ent 等按实体下标取用；
+    push 本身是局部的，这里唯一随实体总数增长的是返回的这个数组（np.zeros 按需分配页，只写被碰到的位置）。
+    """
+    seeds = list(seed_entities) if seed_entities else []
+    if not seeds:
+        # 没有种子时退化成全局分布，push 没有优势，直接走幂迭代
+        return entity_ppr_scores(None, None, seeds, alpha=alpha, P=P, deg=deg)
+    idx, vals = entity_ppr_push_sparse(P, deg, seeds, alpha=alpha, eps=eps)
+    r = np.zeros(P.shape[0], dtype=np.float32)
+    r[idx] = vals
+    return r
+
+def kw_fingerprint(meta, terms=KW_TERMS):
+    """词表 + 段落 ID + 段落原文（字符串表建表时已算好内容 sha1）；ID 不变只改原文也会重扫"""
+    h = hashlib.sha1("\n".join(terms).encode("utf-8"))
+    h.update(text_digest(meta["docs"]).encode("utf-8"))
+    h.update(b"\0")
+    h.update(text_digest(meta["doc_text_rows"]).encode("utf-8"))
+    return h.hexdigest()
+
+def build_kw_hits(texts, terms=KW_TERMS):
+    """段落 x 关键词 的出现次数（小写后的子串匹配，与逐词 `k in t` 口径一致）"""
+    ac = AhoCorasick(terms)
+    rows, cols, vals = [], [], []
+    for i, t in enumerate(texts):
+        for j, c in enumerate(ac.count(t.lower())):
+            if c:
+                rows.append(i); cols.append(j); vals.append(c)
+    return csr_matrix((np.array(vals, dtype=np.float32), (rows, cols)), shape=(len(texts), len(terms)))
+
+def save_kw_hits(H: csr_matrix, fingerprint, terms=KW_TERMS, path=KW_HITS_PATH):
+    np.savez(path, data=H.data, indices=H.indices, indptr=H.indptr, shape=H.shape,
+             terms=np.array(terms), fingerprint=np.array(fingerprint))
+
+def load_kw_hits(meta, terms=KW_TERMS, path=KW_HITS_PATH):
+    """读缓存的命中矩阵；词表、段落列表或段落原文变了就重扫一遍并落盘"""
+    fp = kw_fingerprint(meta, terms)
+    if os.path.exists(path):
+        Z = np.load(path)
+        if str(Z["fingerprint"]) == fp:
+            return csr_matrix((Z["data"], Z["indices"], Z["indptr"]), shape=tuple(Z["shape"]))
+    print("⚠️ 关键词命中矩阵缓存缺失或已过期，重新扫描…")
+    para_texts = [meta["doc_texts"].get(pid, "") for pid in para_ids(meta)]
+    H = build_kw_hits(para_texts, terms)
+    save_kw_hits(H, fp, terms, path)
+    return H
+
+def _kw_counts(H: csr_matrix, lo, hi):
+    """命中的不同关键词个数：对应列二值化后按行求和"""
+    return np.asarray((H[:, lo:hi] > 0).sum(axis=1), dtype=np.float32).ravel()
+
+def expand_query(query):
+    """查询扩展：含 staph 词就拼上同义词+药名"""
     q_low = query.lower()
     need_expand = any(x in q_low for x in ["staphyl", "aureus", "mrsa", "mssa"])
-    expanded = (query + " " + " ".join(STAPH_SYNONYMS + ANTIBIOTIC_TERMS)) if need_expand else query
-    qv = encode(model, expanded)
+    return (query + " " + " ".join(STAPH_SYNONYMS + ANTIBIOTIC_TERMS)) if need_expand else query
+
+def ppr_coverage(C: csr_matrix, r_ent):
+    """段落的 PPR 覆盖：段落 x 实体 乘实体 PPR 分数，再按最大值归一化（唯一随 alpha 变的分量）"""
+    cov = C @ r_ent
+    return cov / (cov.max() + 1e-12)
+
+def paragraph_components(query, model, sent_emb, M, C, meta, activated_entities, para_emb=None, trans=None,
+                         ppr=PPR_METHOD, eps=PPR_EPS, alpha=PPR_ALPHA, r_ent=None, kw_hits=None, qv=None):
+    """
+    打分的各个分量（都已归一化到 [0,1]，与权重无关）：
+    返回 (para_ids, {"sim", "cov_ppr", "kw", "neg", "kw_ab"})；
+    kw_ab = 每段命中的药名关键词数，供 order_paragraphs 做硬过滤。
+    """
+    # 段落聚合向量（建索引时已算好并归一化）
+    pids = para_ids(meta)
+    if para_emb is None:
+        para_emb = load_para_emb(meta, sent_emb)
+    if kw_hits is None:
+        kw_hits = load_kw_hits(meta)
+
+    # 扩展后的问题向量（qv 可由调用方预先编码好传入）
+    if qv is None:
+        qv = encode(model, expand_query(query))
 
     # 语义相似度（归一化）
-    sim = (P_vecs @ qv)
+    sim = (para_emb @ qv)
     sim = (sim - sim.min()) / (sim.max() - sim.min() + 1e-12)
 
-    # PPR 覆盖
-    r_ent = entity_ppr_scores(M, C, activated_entities, alpha=0.15, iters=50)
-    cov_ppr = (C @ r_ent)
-    cov_ppr = cov_ppr / (cov_ppr.max() + 1e-12)
+    # PPR 覆盖（批量评测时可直接传入 entity_ppr_scores_batch 算好的 r_ent）
+    if r_ent is None:
+        P, deg = trans if trans is not None else load_transition(M, C)
+        if ppr == "push":
+            r_ent = entity_ppr_push(P, deg, activated_entities, alpha=alpha, eps=eps)
+        else:
+            r_ent = entity_ppr_scores(M, C, activated_entities, alpha=alpha, iters=50, P=P, deg=deg)
+    cov_ppr = ppr_coverage(C, r_ent)
 
     # 关键词：Staph 命中 *2 + 药名 *1；负面词惩罚
-    kw_staph = np.array([_hits(t, STAPH_SYNONYMS) for t in para_texts], dtype=np.float32)
-    kw_ab    = np.array([_hits(t, ANTIBIOTIC_TERMS) for t in para_texts], dtype=np.float32)
+    n_s, n_a = len(STAPH_SYNONYMS), len(ANTIBIOTIC_TERMS)
+    kw_staph = _kw_counts(kw_hits, 0, n_s)
+    kw_ab    = _kw_counts(kw_hits, n_s, n_s + n_a)
     kw = 2 * kw_staph + kw_ab
     if kw.max() > 0: kw = kw / kw.max()
 
-    neg = np.array([_hits(t, NEG_TERMS) for t in para_texts], dtype=np.float32)
+    neg = _kw_counts(kw_hits, n_s + n_a, n_s + n_a + len(NEG_TERMS))
     if neg.max() > 0: neg = neg / neg.max()
 
-    score = beta * sim + (1 - beta) * cov_ppr + gamma * kw - delta * neg
+    return pids, {"sim": sim, "cov_ppr": cov_ppr, "kw": kw, "neg": neg, "kw_ab": kw_ab}
+
+def combine_scores(comp, beta=BETA, gamma=GAMMA, delta=DELTA):
+    """线性组合：beta·sim + (1-beta)·cov_ppr + gamma·kw - delta·neg"""
+    return beta * comp["sim"] + (1 - beta) * comp["cov_ppr"] + gamma * comp["kw"] - delta * comp["neg"]
 
-    # —— 硬过滤：优先在“命中药名”的集合内排序；若太少再回退全量 ——
+def score_paragraphs_ppr(query, model, sent_emb, M, C, meta, activated_entities, beta=BETA, gamma=GAMMA, delta=DELTA, para_emb=None,
+                         trans=None, ppr=PPR_METHOD, eps=PPR_EPS, alpha=PPR_ALPHA, r_ent=None, kw_hits=None, qv=None):
+    """
+    给全部段落打分（与 K 无关）；返回 (para_ids, score, kw_ab)。
+    """
+    para_ids, comp = paragraph_components(query, model, sent_emb, M, C, meta, activated_entities, para_emb=para_emb,
+                                          trans=trans, ppr=ppr, eps=eps, alpha=alpha, r_ent=r_ent, kw_hits=kw_hits, qv=qv)
+    return para_ids, combine_scores(comp, beta, gamma, delta), comp["kw_ab"]
+
+def order_paragraphs(score, kw_ab, ks):
+    """
+    一次排序给出多个 K 的 Top-K 段落下标：{K: order}。
+    硬过滤：优先在“命中药名”的集合内排序；若太少再回退全量 ——
+    每个 K 的结果都是「过滤后排序」或「全量排序」两者之一的前缀，所以两种排序各算一次即可。
+    """
+    full = np.argsort(score)[::-1]
     if REQUIRE_ANTIBIOTIC:
         idx_ab = np.where(kw_ab > 0)[0]
-        if len(idx_ab) >= max(topk, 3):
-            order = idx_ab[np.argsort(score[idx_ab])[::-1][:topk]]
+        ab = idx_ab[np.argsort(score[idx_ab])[::-1]]
+    out = {}
+    for k in ks:
+        if REQUIRE_ANTIBIOTIC and len(idx_ab) >= max(k, 3):
+            out[k] = ab[:k]
         else:
-            order = np.argsort(score)[::-1][:topk]
-    else:
-        order = np.argsort(score)[::-1][:topk]
+            out[k] = full[:k]
+    return out
 
+def rank_paragraphs_ppr(query, model, sent_emb, M, C, meta, activated_entities, beta=BETA, gamma=GAMMA, delta=DELTA, topk=5, para_emb=None,
+                        trans=None, ppr=PPR_METHOD, eps=PPR_EPS, alpha=PPR_ALPHA, r_ent=None, kw_hits=None, qv=None):
+    para_ids, score, kw_ab = score_paragraphs_ppr(query, model, sent_emb, M, C, meta, activated_entities, beta=beta, gamma=gamma,
+                                                  delta=delta, para_emb=para_emb, trans=trans, ppr=ppr, eps=eps, alpha=alpha,
+                                                  r_ent=r_ent, kw_hits=kw_hits, qv=qv)
+    order = order_paragraphs(score, kw_ab, [topk])[topk]
     return [(para_ids[i], float(score[i])) for i in order]
 
-def pretty_print(query, results, meta, title="PPR+KW(FILTER) TOP-K"):
+def pretty_print(query, results, meta, title="PPR+KW(FILTER) TOP-K", evidence=None):
     print("\n================= QUERY =================")
     print(query)
     print(f"=============== {title} =============")
     for rank, (pid, sc) in enumerate(results, 1):
         text = meta["doc_texts"].get(pid, "")
-        short = (text[:320] + "…") if len(text) > 320 else text
+        short = highlight(text, (evidence or {}).get(pid), 320)
         print(f"[{rank}] pid={pid}  score={sc:.4f}\n    {short}\n")
 
 def main():
-    if len(sys.argv) < 2:
-        print('用法：python src\\ppr_retrieve.py "你的问题" [topk]')
+    use_ann = "--ann" in sys.argv   # 句向量走 IVF 近似检索（ann_index.py）
+    from quant_store import load_quant, pop_quant_arg
+    quant, argv = pop_quant_arg([a for a in sys.argv if a != "--ann"])   # 句向量第一遍用压缩副本
+    if len(argv) < 2:
+        print('用法：python src\\ppr_retrieve.py "你的问题" [topk] [--ann] [--quant int8]')
         sys.exit(0)
-    query = sys.argv[1]
-    topk = int(sys.argv[2]) if len(sys.argv) >= 3 else 5
+    query = argv[1]
+    topk = int(argv[2]) if len(argv) >= 3 else 5
 
     meta, M, C = load_index()
     model, sent_emb = build_embeddings(meta["sents"])
+    para_emb = load_para_emb(meta, sent_emb)
+    trans = load_transition(M, C)
+    kw_hits = load_kw_hits(meta)
+    ann = None
+    if use_ann:
+        from ann_index import SENT_IVF_PATH, load_ivf
+        from retrieve import SENT_EMB_PATH
+        ann = load_ivf(SENT_IVF_PATH, SENT_EMB_PATH, sent_emb)
+    if quant:
+        from retrieve import SENT_EMB_PATH
+        quant = load_quant(SENT_EMB_PATH, quant, sent_emb)
 
     # 注意：activate_entities 需要 meta
-    seeds = activate_entities(query, model, sent_emb, M, meta, R=100, sim_th=0.25, rounds=1)
-    results = rank_paragraphs_ppr(query, model, sent_emb, M, C, meta, seeds, beta=BETA, gamma=GAMMA, delta=DELTA, topk=topk)
-    pretty_print(query, results, meta, title="PPR+KW(FILTER) TOP-K")
+    seeds = activate_entities(query, model, sent_emb, M, meta, R=100, sim_th=0.25, rounds=1, ann=ann, quant=quant)
+    results = rank_paragraphs_ppr(query, model, sent_emb, M, C, meta, seeds, beta=BETA, gamma=GAMMA, delta=DELTA, topk=topk, para_emb=para_emb, trans=trans, kw_hits=kw_hits)
+    pretty_print(query, results, meta, title="PPR+KW(FILTER) TOP-K",
+                 evidence=evidence_spans(meta, sent_emb, encode(model, query), results))
 
 if __name__ == "__main__":
     main()
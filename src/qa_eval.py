@@ -3,7 +3,7 @@
 # “Top-K 段落的拼接文本，是否包含任一标准答案子串”
 
 import os, json, sys
-from retrieve import load_index, build_embeddings, activate_entities, rank_paragraphs
+from retrieve import load_index, build_embeddings, activate_entities, rank_paragraphs, load_para_emb
 
 def main():
     here = os.path.dirname(os.path.abspath(__file__))
@@ -14,6 +14,7 @@ def main():
 
     meta, M, C = load_index()
     model, sent_emb = build_embeddings(meta["sents"])
+    para_emb = load_para_emb(meta, sent_emb)
 
     qas_path = os.path.join("data", "qas.jsonl")
     qas = [json.loads(l) for l in open(qas_path, "r", encoding="utf-8") if l.strip()]
@@ -24,7 +25,7 @@ def main():
         answers = [a.lower() for a in ex.get("answers", []) if a]
 
         act_e = activate_entities(q, model, sent_emb, M, meta, R=50, sim_th=0.35, rounds=1)
-        results = rank_paragraphs(q, model, sent_emb, C, meta, act_e, alpha=0.3, topk=topk)
+        results = rank_paragraphs(q, model, sent_emb, C, meta, act_e, alpha=0.3, topk=topk, para_emb=para_emb)
 
         bag = " ".join([meta["doc_texts"].get(pid, "") for pid, _ in results]).lower()
         ok = any(a in bag for a in answers)
@@ -6,14 +6,21 @@
 最终输出：
 - 控制台打印每个问题的 P/R/F1
 - 写一份 CSV 到 runs/qa_med_eval_bm25.csv
+
+Top-K 用 MaxScore 剪枝（结果与全量打分一致）；
+--stopwords / --max-df 0.5 打开查询规划（去停用词 / 高频词，结果会变）。
 """
 
 import os
 import json
-import re
-import math
 import csv
-from collections import Counter
+import argparse
+
+from drug_extractor import DrugExtractor, load_drug_hits, drugs_in_rows
+from bm25_index import (
+    tokenize, get_text,
+    bm25_topk, load_bm25_index, fetch_docs, STOPWORDS,
+)
 
 # ==== 路径设置 ====
 BASE_DIR = os.path.dirname(os.path.dirname(__file__))
@@ -50,86 +57,7 @@ def load_questions(path):
     return qs
 
 
-def get_text(doc):
-    """把一篇文献变成一段可检索的文本。"""
-    if doc.get("text"):
-        return doc["text"]
-    title = doc.get("title", "")
-    abstract = doc.get("abstract", "")
-    return (title + " " + abstract).strip()
-
-
-# ==== BM25 实现（简易版，自己算，不依赖外部库） ====
-
-TOKEN_RE = re.compile(r"[A-Za-z]+")
-
-
-def tokenize(text):
-    """只要英文字母，统统小写。"""
-    return [m.group(0).lower() for m in TOKEN_RE.finditer(text)]
-
-
-def build_bm25_index(docs):
-    """
-    为所有文献预计算：
-    - 每篇的 term 频率
-    - 每篇长度
-    - 每个 term 出现在哪些文献里（文档频率 df）
-    - 平均文档长度 avgdl
-    """
-    doc_tfs = []
-    doc_lens = []
-    df = Counter()
-
-    for doc in docs:
-        tokens = tokenize(get_text(doc))
-        tf = Counter(tokens)
-        doc_tfs.append(tf)
-        doc_lens.append(len(tokens))
-        for term in tf.keys():
-            df[term] += 1
-
-    N = len(docs)
-    avgdl = sum(doc_lens) / N if N > 0 else 0.0
-
-    return {
-        "doc_tfs": doc_tfs,
-        "doc_lens": doc_lens,
-        "df": df,
-        "N": N,
-        "avgdl": avgdl,
-    }
-
-
-def bm25_scores(query, index, k1=1.5, b=0.75):
-    """对一个查询，算出每篇文献的 BM25 分数。"""
-    q_tokens = tokenize(query)
-    doc_tfs = index["doc_tfs"]
-    doc_lens = index["doc_lens"]
-    df = index["df"]
-    N = index["N"]
-    avgdl = index["avgdl"]
-
-    scores = []
-    for i, tf in enumerate(doc_tfs):
-        dl = doc_lens[i]
-        score = 0.0
-        for t in q_tokens:
-            f = tf.get(t, 0)
-            if f == 0:
-                continue
-            n_q = df.get(t, 0)
-            if n_q == 0:
-                continue
-            # 经典 BM25 idf 公式
-            idf = math.log((N - n_q + 0.5) / (n_q + 0.5) + 1.0)
-            denom = f + k1 * (1 - b + b * dl / (avgdl + 1e-9))
-            score += idf * f * (k1 + 1) / denom
-        scores.append(score)
-    return scores
-
-
-# ==== 药物抽取：词表 + 正则 ====
+# ==== 药物抽取：词表 + 自动机（drug_extractor.py） ====
 
 def build_drug_lexicon(questions):
     """
@@ -146,40 +74,41 @@ def build_drug_lexicon(questions):
     return {d.lower() for d in lex}
 
 
-def build_drug_regex(lexicon):
+def build_drug_extractor(lexicon):
     """
-    根据药物词表构造一个大正则：
-    \b(drug1|drug2|...)\b
+    根据药物词表构造抽取器，语义同原来的大正则 \b(drug1|drug2|...)\b（长词优先）：
+    从左到右、不重叠、同一起点取最长，前后要求单词边界。
     """
     if not lexicon:
         return None
-    # 长的药名放前面，避免短词乱匹配
-    parts = [re.escape(d) for d in sorted(lexicon, key=len, reverse=True)]
-    pattern = r"\b(" + "|".join(parts) + r")\b"
-    return re.compile(pattern, re.I)
+    return DrugExtractor(sorted(lexicon), normalize="lower", boundary="word", overlapping=False)
 
 
-def extract_drugs(text, drug_re):
-    if not drug_re:
+def extract_drugs(text, drug_ext):
+    if not drug_ext:
         return []
-    found = set(m.group(0).lower() for m in drug_re.finditer(text))
-    return sorted(found)
+    return sorted(set(drug_ext.extract(text)))
 
 
 # ==== 单题评测 ====
 
-def eval_one(q, docs, index, drug_re, top_k=20):
+def eval_one(q, docs, index, drug_ext, top_k=20, stopwords=None, max_df=None, drug_hits=None):
+    """
+    drug_hits=(H, 规范名) 时药名直接取 Top-K 行的命中矩阵，不读原文；
+    否则拼接 Top-K 原文重扫（docs 为 None 时原文按行号从 docs.jsonl 现读）。
+    """
     qid = q.get("id", "?")
     qtext = q["question"]
     gold = {d.lower() for d in q.get("gold_drugs", [])}
 
-    scores = bm25_scores(qtext, index)
-    # 取分数最高的 top_k 篇文献
-    top_idx = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)[:top_k]
-    combined_text = "\n\n".join(get_text(docs[i]) for i in top_idx)
-
-    pred_list = extract_drugs(combined_text, drug_re)
-    pred = set(pred_list)
+    # 取分数最高的 top_k 篇文献（MaxScore 剪枝，不给全部文献打分）
+    top_idx, _ = bm25_topk(tokenize(qtext), index, top_k, stopwords=stopwords, max_df=max_df)
+    if drug_hits is not None:
+        pred = set(drugs_in_rows(drug_hits[0], top_idx, drug_hits[1]))
+    else:
+        top_docs = fetch_docs(index, top_idx) if docs is None else [docs[i] for i in top_idx]
+        combined_text = "\n\n".join(get_text(d) for d in top_docs)
+        pred = set(extract_drugs(combined_text, drug_ext))
 
     tp = len(pred & gold)
     fp = len(pred - gold)
@@ -213,27 +142,33 @@ def eval_one(q, docs, index, drug_re, top_k=20):
 # ==== 主函数 ====
 
 def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--stopwords", action="store_true", help="查询去停用词")
+    ap.add_argument("--max-df", type=float, default=None, help="去掉文档频率占比超过该值的查询词")
+    args = ap.parse_args()
+    stopwords = STOPWORDS if args.stopwords else None
+
     print(f"📄 读取问题文件：{QA_PATH}")
     questions = load_questions(QA_PATH)
     print(f"✅ 共读取 {len(questions)} 个问题")
 
-    print(f"📄 读取语料：{DOC_PATH}")
-    docs = load_docs(DOC_PATH)
-    print(f"✅ 文献条数：{len(docs)}")
-
-    print("🧮 构建 BM25 索引…")
-    index = build_bm25_index(docs)
+    print("🧮 读取 BM25 索引（index_bm25/）…")
+    index = load_bm25_index(docs_path=DOC_PATH)
+    print(f"✅ 文献条数：{index['N']}")
 
     print("📚 根据 gold_drugs 构建药物词表…")
     drug_lex = build_drug_lexicon(questions)
-    drug_re = build_drug_regex(drug_lex)
+    drug_ext = build_drug_extractor(drug_lex)
     print(f"✅ 词表大小：{len(drug_lex)}")
+    # 文献 x 药名 命中矩阵（按 gold 词表口径，缓存在 index_drug_hits_qa_gold.npz）
+    drug_hits = load_drug_hits("qa_gold", drug_ext, docs_path=DOC_PATH) if drug_ext else None
 
     results = []
     micro_tp = micro_fp = micro_fn = 0
 
     for q in questions:
-        r = eval_one(q, docs, index, drug_re, top_k=20)
+        r = eval_one(q, None, index, drug_ext, top_k=20, stopwords=stopwords, max_df=args.max_df,
+                     drug_hits=drug_hits)
         results.append(r)
         micro_tp += r["tp"]
         micro_fp += r["fp"]
@@ -11,9 +11,9 @@ from answer_vec_drugs import (
     load_docs,
     load_vec_index,
     vec_search,
-    doc_text,
-    extract_drugs_from_text,
+    extract_drugs_from_rows,
 )
+from drug_extractor import load_drug_hits
 
 DOCS_PATH = os.path.join("data", "docs.jsonl")
 VEC_EMB_PATH = os.path.join("data", "index_vec_emb.npy")
@@ -38,27 +38,21 @@ def eval_one_question(
     emb: np.ndarray,
     model: SentenceTransformer,
     top_k: int = TOP_K,
+    drug_hits=None,
 ) -> Tuple[List[str], int, int, int, int, int, float, float, float]:
     """
     对单个问题做：
       - 向量检索 Top-K
-      - 把这 K 篇文章拼起来抽药名
+      - 取这 K 篇文章里出现过的药名（文献 x 药名 命中矩阵）
       - 和 gold 对比，算 P/R/F1
     """
     # 1) 向量检索
     idx, scores = vec_search(question, model, emb, top_k=top_k)
 
-    # 2) 拼接文本
-    big_chunks = []
-    for i in idx:
-        doc = docs[int(i)]
-        big_chunks.append(doc_text(doc))
-    big_text = "\n\n".join(big_chunks)
+    # 2) 抽药名：Top-K 行在 文献 x 药名 命中矩阵上求和
+    pred_drugs = extract_drugs_from_rows(idx, drug_hits)
 
-    # 3) 抽药名
-    pred_drugs = extract_drugs_from_text(big_text)
-
-    # 4) 计算指标
+    # 3) 计算指标
     gold_set: Set[str] = set(d.lower() for d in gold_drugs)
     pred_set: Set[str] = set(d.lower() for d in pred_drugs)
 
@@ -123,6 +117,10 @@ def main():
     print(f"🧠 加载向量模型：{MODEL_NAME}")
     model = SentenceTransformer(MODEL_NAME)
 
+    drug_hits = load_drug_hits("vec")
+    if drug_hits[0].shape[0] != len(docs):
+        raise RuntimeError("❌ 药名命中矩阵行数和 docs 条数不一致，请重新运行 build_index.py。")
+
     rows = []
 
     # micro 统计
@@ -151,7 +149,7 @@ def main():
             p,
             r,
             f1,
-        ) = eval_one_question(qtext, gold_drugs, docs, emb, model, top_k=TOP_K)
+        ) = eval_one_question(qtext, gold_drugs, docs, emb, model, top_k=TOP_K, drug_hits=drug_hits)
 
         print(
             f"TP={tp} FP={fp} FN={fn}  P={p:.4f} R={r:.4f} F1={f1:.4f}"
@@ -0,0 +1,222 @@
+# src/quant_store.py
+# 功能：向量的压缩存储 + 精确重排 —— 句向量（index_sent_emb.npy，MiniLM）与文献向量（data/index_vec_emb.npy，mpnet）
+#       各可以存一份紧凑副本常驻内存，第一遍点积在紧凑数组上算，只把候选短名单回到 float32 原向量上重算：
+#         f16       float16，内存 1/2
+#         int8      每个向量一个缩放系数（按该向量的最大绝对值），内存约 1/4
+#         int8_dim  每一维一个缩放系数（按该维的最大绝对值），内存约 1/4
+#       float32 原文件保持不动，查询时只 mmap 读短名单那几行，不整份进内存。
+#       短名单 = 近似分数前 max(k·RESCORE_FACTOR, RESCORE_MIN) 名；给了阈值时再并上「近似分数 + 量化误差上界 ≥ 阈值」的行，
+#       所以激活实体时阈值以上的句子一个不漏。
+#       和 IVF（ann_index.py）一起用时，第一遍只在 IVF 候选行上算，短名单同样回 float32 重排。
+#       压缩副本带原向量文件的 大小 + mtime 戳，向量重建后自动重算。
+#       report 子命令：QA 问题集上对比 精确 vs 各压缩模式的 内存、recall@k、单次查询耗时。
+# 用法：python src\quant_store.py build [--which sent,vec] [--modes f16,int8,int8_dim]
+#       python src\quant_store.py report [--which sent,vec] [--modes f16,int8,int8_dim] [--k-list 10,50,100]
+
+import argparse, json, os, time
+
+import numpy as np
+
+from ann_index import emb_stamp
+from index_store import save_npz_atomic
+
+QUANT_MODES = ("f16", "int8", "int8_dim")
+RESCORE_FACTOR = 4      # 短名单 = k 的几倍
+RESCORE_MIN = 64
+CHUNK_ROWS = 65536      # 分块解码成 float32 再点积，临时内存只有一块
+
+def quant_path(emb_path, mode):
+    """index_sent_emb.npy -> index_sent_emb.int8.npz"""
+    return f"{os.path.splitext(emb_path)[0]}.{mode}.npz"
+
+def quantize(emb, mode):
+    """(N, d) float32 -> {"mode", "codes", "scale"}；scale：int8 为 (N,)，int8_dim 为 (d,)，f16 为空"""
+    if mode not in QUANT_MODES:
+        raise ValueError(f"未知压缩模式：{mode}（可选 {', '.join(QUANT_MODES)}）")
+    if mode == "f16":
+        codes = np.empty(emb.shape, dtype=np.float16)
+        for s in range(0, emb.shape[0], CHUNK_ROWS):
+            codes[s:s + CHUNK_ROWS] = emb[s:s + CHUNK_ROWS]
+        return {"mode": mode, "codes": codes, "scale": np.zeros(0, dtype=np.float32)}
+    if mode == "int8_dim":
+        scale = np.zeros(emb.shape[1], dtype=np.float32)
+        for s in range(0, emb.shape[0], CHUNK_ROWS):
+            scale = np.maximum(scale, np.abs(np.asarray(emb[s:s + CHUNK_ROWS], dtype=np.float32)).max(axis=0))
+        scale = np.maximum(scale, 1e-12) / 127
+    codes = np.empty(emb.shape, dtype=np.int8)
+    vec_scale = np.empty(emb.shape[0], dtype=np.float32)
+    for s in range(0, emb.shape[0], CHUNK_ROWS):
+        X = np.asarray(emb[s:s + CHUNK_ROWS], dtype=np.float32)
+        if mode == "int8":
+            sc = np.maximum(np.abs(X).max(axis=1), 1e-12) / 127
+            vec_scale[s:s + len(X)] = sc
+            X = X / sc[:, None]
+        else:
+            X = X / scale
+        codes[s:s + len(X)] = np.clip(np.rint(X), -127, 127)
+    return {"mode": mode, "codes": codes, "scale": vec_scale if mode == "int8" else scale}
+
+def save_quant(qs, emb_path):
+    path = quant_path(emb_path, qs["mode"])
+    save_npz_atomic(path, codes=qs["codes"], scale=qs["scale"], mode=qs["mode"],
+                    stamp=json.dumps(emb_stamp(emb_path)))   # 临时文件 + os.replace：读者不会碰到写了一半的压缩包
+    return path
+
+def load_quant(emb_path, mode, emb=None):
+    """读压缩副本；不存在或原向量变了就重新量化并落盘"""
+    path = quant_path(emb_path, mode)
+    if os.path.exists(path):
+        Z = np.load(path)
+        if str(Z["mode"]) == mode and json.loads(str(Z["stamp"])) == emb_stamp(emb_path):
+            return {"mode": mode, "codes": Z["codes"], "scale": Z["scale"]}
+    print(f"⚠️ 压缩向量缺失或与原向量不一致，重建：{path}")
+    qs = quantize(emb if emb is not None else np.load(emb_path, mmap_mode="r"), mode)
+    save_quant(qs, emb_path)
+    return qs
+
+def pop_quant_arg(argv):
+    """给按位置取参数的脚本用：从 argv 里摘出 --quant MODE / --quant=MODE，返回 (mode 或 None, 剩下的 argv)"""
+    mode, rest, i = None, [], 0
+    while i < len(argv):
+        a = argv[i]
+        if a == "--quant" and i + 1 < len(argv):
+            mode, i = argv[i + 1], i + 2
+            continue
+        if a.startswith("--quant="):
+            mode = a.split("=", 1)[1]
+        else:
+            rest.append(a)
+        i += 1
+    if mode is not None and mode not in QUANT_MODES:
+        raise SystemExit(f"❌ 未知压缩模式：{mode}（可选 {', '.join(QUANT_MODES)}）")
+    return mode, rest
+
+def quant_nbytes(qs):
+    return int(qs["codes"].nbytes + qs["scale"].nbytes)
+
+def quant_scores(qs, q, rows=None):
+    """第一遍：全部行（或只 rows 这些行，如 IVF 候选）的近似内积（分块解码，临时内存只有 CHUNK_ROWS 行）"""
+    codes, mode = qs["codes"], qs["mode"]
+    q = np.asarray(q, dtype=np.float32)
+    qd = q * qs["scale"] if mode == "int8_dim" else q     # 每维缩放直接折进 query
+    n = codes.shape[0] if rows is None else len(rows)
+    out = np.empty(n, dtype=np.float32)
+    for s in range(0, n, CHUNK_ROWS):
+        block = codes[s:s + CHUNK_ROWS] if rows is None else codes[rows[s:s + CHUNK_ROWS]]
+        out[s:s + CHUNK_ROWS] = block.astype(np.float32) @ qd
+    if mode == "int8":
+        out *= qs["scale"] if rows is None else qs["scale"][rows]
+    return out
+
+def quant_error_bound(qs, q, rows=None):
+    """近似内积与精确内积之差的上界（每行一个，或整体一个标量）：舍入误差 ≤ 半个量化步长"""
+    q = np.abs(np.asarray(q, dtype=np.float32))
+    if qs["mode"] == "int8":
+        return 0.5 * (qs["scale"] if rows is None else qs["scale"][rows]) * q.sum()
+    if qs["mode"] == "int8_dim":
+        return 0.5 * float((qs["scale"] * q).sum())
+    return 2.0 ** -11 * float(q.sum())   # float16 相对误差 2^-11，向量已归一化 |x_j| ≤ 1
+
+def quant_shortlist(qs, emb, q, n_short, th=None, rows=None):
+    """
+    近似分数取前 n_short 名（给了阈值 th 再并上 近似 + 误差上界 ≥ th 的行），回 float32 原向量精确重算。
+    rows（升序，如 IVF 候选）给了就只在这些行里挑。返回 (行号 升序, 精确内积)
+    """
+    approx = quant_scores(qs, q, rows)
+    n = len(approx)
+    sel = np.zeros(n, dtype=bool)
+    sel[np.arange(n) if n_short >= n else np.argpartition(approx, n - n_short)[n - n_short:]] = True
+    if th is not None:
+        sel |= approx + quant_error_bound(qs, q, rows) >= th
+    sel = np.flatnonzero(sel)
+    if rows is not None:
+        sel = rows[sel]
+    return sel, np.asarray(emb[sel], dtype=np.float32) @ np.asarray(q, dtype=np.float32)
+
+def quant_topk(qs, emb, q, k, rows=None):
+    """压缩第一遍 + float32 重排的 Top-K：(行号, 分数)，分数从高到低；rows 同 quant_shortlist"""
+    rows, s = quant_shortlist(qs, emb, q, max(k * RESCORE_FACTOR, RESCORE_MIN), rows=rows)
+    order = np.argsort(-s, kind="stable")[:k]
+    return rows[order], s[order]
+
+# ---------- 命令行：建副本 / 报告 ----------
+
+def _stores(which):
+    """名字 -> (向量文件, 编码模型)"""
+    from retrieve import SENT_EMB_PATH, SENT_MODEL
+    from answer_vec_drugs import VEC_EMB_PATH, VEC_MODEL
+    all_ = {"sent": (SENT_EMB_PATH, SENT_MODEL), "vec": (VEC_EMB_PATH, VEC_MODEL)}
+    return {w: all_[w] for w in which}
+
+def report(name, emb_path, model_name, qs_text, modes, ks):
+    from ann_index import recall_at_k
+    from sentence_transformers import SentenceTransformer
+    from sklearn.preprocessing import normalize
+
+    emb = np.load(emb_path, mmap_mode="r")
+    Q = normalize(SentenceTransformer(model_name).encode(qs_text, convert_to_numpy=True)).astype(np.float32)
+    k_max = max(ks)
+    full = np.asarray(emb, dtype=np.float32)
+
+    t0 = time.perf_counter()
+    exact = [np.argsort(-(full @ q), kind="stable")[:k_max] for q in Q]
+    t_exact = (time.perf_counter() - t0) / len(Q) * 1000
+    mb = full.nbytes / 2 ** 20
+
+    print(f"\n=== {name}: {emb.shape[0]} 条 x {emb.shape[1]} 维，{len(Q)} 个问题 ===")
+    print(f"{'mode':>9} {'内存MB':>9} {'节省':>6} {'ms/query':>9} "
+          + " ".join(f"{'R@' + str(k):>7}" for k in ks) + "   " + " ".join(f"{'无重排R@' + str(k):>10}" for k in ks))
+    print(f"{'float32':>9} {mb:>9.2f} {0:>6.0%} {t_exact:>9.3f} " + " ".join(f"{1.0:>7.3f}" for _ in ks))
+    rows = []
+    for mode in modes:
+        qs = load_quant(emb_path, mode, emb)
+        t0 = time.perf_counter()
+        approx = [quant_topk(qs, emb, q, k_max)[0] for q in Q]
+        t_q = (time.perf_counter() - t0) / len(Q) * 1000
+        raw = [np.argsort(-quant_scores(qs, q), kind="stable")[:k_max] for q in Q]
+        rec = [np.mean([recall_at_k(a[:k], e[:k]) for a, e in zip(approx, exact)]) for k in ks]
+        rec_raw = [np.mean([recall_at_k(a[:k], e[:k]) for a, e in zip(raw, exact)]) for k in ks]
+        qmb = quant_nbytes(qs) / 2 ** 20
+        print(f"{mode:>9} {qmb:>9.2f} {1 - qmb / mb:>6.0%} {t_q:>9.3f} " + " ".join(f"{r:>7.3f}" for r in rec)
+              + "   " + " ".join(f"{r:>10.3f}" for r in rec_raw))
+        rows.append({"mode": mode, "mb": qmb, "saved": 1 - qmb / mb, "ms_per_query": t_q,
+                     "recall": {str(k): float(r) for k, r in zip(ks, rec)},
+                     "recall_no_rescore": {str(k): float(r) for k, r in zip(ks, rec_raw)}})
+    return {"n": int(emb.shape[0]), "dim": int(emb.shape[1]), "float32_mb": mb, "exact_ms_per_query": t_exact,
+            "rescore": {"factor": RESCORE_FACTOR, "min": RESCORE_MIN}, "modes": rows}
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("cmd", choices=["build", "report"])
+    ap.add_argument("--which", default="sent,vec", help="sent = 句向量，vec = 文献向量")
+    ap.add_argument("--modes", default=",".join(QUANT_MODES))
+    ap.add_argument("--k-list", default="10,50,100")
+    ap.add_argument("--questions", default=os.path.join("data", "qa_med_questions.jsonl"))
+    ap.add_argument("--out", default=os.path.join("runs", "quant_recall.json"))
+    args = ap.parse_args()
+
+    os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    stores = _stores([w.strip() for w in args.which.split(",") if w.strip()])
+    modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+
+    if args.cmd == "build":
+        for name, (emb_path, _) in stores.items():
+            emb = np.load(emb_path, mmap_mode="r")
+            for mode in modes:
+                t0 = time.perf_counter()
+                qs = quantize(emb, mode)
+                path = save_quant(qs, emb_path)
+                print(f"✅ {name} {mode}: {emb.nbytes / 2 ** 20:.1f}MB -> {quant_nbytes(qs) / 2 ** 20:.1f}MB，"
+                      f"用时 {time.perf_counter() - t0:.2f}s -> {path}")
+        return
+
+    qs_text = [json.loads(l)["question"] for l in open(args.questions, "r", encoding="utf-8") if l.strip()]
+    ks = [int(x) for x in args.k_list.split(",")]
+    out = {name: report(name, e, m, qs_text, modes, ks) for name, (e, m) in stores.items()}
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(out, f, ensure_ascii=False, indent=2)
+    print(f"\n✅ 已写出 {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -1,110 +1,292 @@
 # src/retrieve.py
-# 功能：加载索引（index_meta.json / index_tri_graph.npz），
+# 功能：加载索引（index_meta/ / index_tri_graph/），
 #       对一个查询做“两步检索”，打印 Top-K 段落与得分。
 
-import json, sys, os
+import hashlib, json, sys, os
 import numpy as np
 from scipy.sparse import csr_matrix
 from sklearn.preprocessing import normalize
 from sentence_transformers import SentenceTransformer
 
-def load_index():
+from index_store import save_json_atomic, save_npy_atomic
+from meta_store import doc_rows, doc_sent_range, para_ids, sent_docrow_digest, sent_docrows, text_digest
+
+# M（句子 x 实体）/ C（段落 x 实体）：目录格式（index_store.py），mmap 读，不解压不拷贝；
+# 旧版本建的 index_tri_graph.npz 第一次加载时转换一次
+GRAPH_DIR = "index_tri_graph"
+LEGACY_GRAPH_PATH = "index_tri_graph.npz"
+
+def load_graph():
+    """返回 (M, C)；只有旧的 npz（或 npz 比目录里记的新）时先转换成目录格式"""
+    from index_store import converted_stale, file_stamp, open_store, save_store
+    if converted_stale(GRAPH_DIR, LEGACY_GRAPH_PATH):
+        print(f"⚠️ 三元图还是旧的 npz 格式或已过期，转换为目录格式（只需一次）：{GRAPH_DIR}/")
+        Z = np.load(LEGACY_GRAPH_PATH)
+        M = csr_matrix((Z['M_data'], Z['M_indices'], Z['M_indptr']), shape=tuple(Z['M_shape']))
+        C = csr_matrix((Z['C_data'], Z['C_indices'], Z['C_indptr']), shape=tuple(Z['C_shape']))
+        save_store(GRAPH_DIR, csr={"M": M, "C": C}, extra={"source_stamp": file_stamp(LEGACY_GRAPH_PATH)})
+    store = open_store(GRAPH_DIR)
+    return store["csr"]["M"], store["csr"]["C"]
+
+# 元信息（段落 ID / 原文 / 句子 / 实体表）：二进制字符串表（meta_store.py），按 ID 现取；
+# 旧版本建的 index_meta.json 第一次加载时转换一次
+META_DIR = "index_meta"
+LEGACY_META_PATH = "index_meta.json"
+
+def load_meta(base_dir="."):
+    """
+    返回惰性 meta（用法与旧的 dict 相同）；只有旧的 index_meta.json（或它比目录里记的新，
+    或目录是从它转换来的旧版格式）时先转换
+    """
+    from index_store import converted_stale, file_stamp, read_manifest
+    from meta_store import META_FORMAT, open_meta, save_meta, spans_in_docs
+    path, legacy = os.path.normpath(os.path.join(base_dir, META_DIR)), os.path.join(base_dir, LEGACY_META_PATH)
+    stale = converted_stale(path, legacy)
+    if not stale:
+        extra = read_manifest(path).get("extra", {})
+        stale = bool(extra.get("source_stamp")) and extra.get("format") != META_FORMAT and os.path.exists(legacy)
+    if stale:
+        print(f"⚠️ 元信息还是旧的 index_meta.json 或已过期，转换为二进制字符串表（只需一次）：{path}/")
+        m = json.load(open(legacy, "r", encoding="utf-8"))
+        spans = spans_in_docs(m["doc_texts"], m["sents"], m["sent_docid"])
+        save_meta(path, m["docs"], m["doc_texts"], m["sent_docid"], spans, m["ent2id"],
+                  extra={"source_stamp": file_stamp(legacy)})
+    return open_meta(path)
+
+def load_index(root=None):
+    """切到工程目录（默认本仓库根目录）后读 index_meta/ / index_tri_graph/"""
     here = os.path.dirname(os.path.abspath(__file__))
-    root = os.path.abspath(os.path.join(here, os.pardir))
+    root = os.path.abspath(root or os.path.join(here, os.pardir))
     os.chdir(root)
 
-    meta = json.load(open("index_meta.json", "r", encoding="utf-8"))
-    Z = np.load("index_tri_graph.npz")
-    M = csr_matrix((Z['M_data'], Z['M_indices'], Z['M_indptr']), shape=tuple(Z['M_shape']))
-    C = csr_matrix((Z['C_data'], Z['C_indices'], Z['C_indptr']), shape=tuple(Z['C_shape']))
+    meta = load_meta()
+    M, C = load_graph()
     return meta, M, C
 
+# 句向量在建索引时算好，存在 index_tri_graph/ 旁边；查询时 mmap 读取
+SENT_MODEL = 'sentence-transformers/all-MiniLM-L6-v2'
+SENT_EMB_PATH = "index_sent_emb.npy"
+SENT_EMB_INFO = "index_sent_emb.json"   # {model, fingerprint, n, dim}
+
+def sents_fingerprint(sents, model_name=SENT_MODEL):
+    """索引指纹：模型名 + 全部句子内容（字符串表建表时已算好内容 sha1，不用逐句再读）；句子表一变指纹就变"""
+    h = hashlib.sha1(model_name.encode("utf-8"))
+    h.update(b"\n")
+    h.update(text_digest(sents).encode("utf-8"))
+    return h.hexdigest()
+
+def encode_sents(model, sents):
+    """句子 -> 归一化的 float32 句向量"""
+    return normalize(model.encode(list(sents), convert_to_numpy=True)).astype(np.float32)
+
+def save_sent_emb(sents, model, model_name=SENT_MODEL, emb=None):
+    """编码全部句子并落盘（build_index.py 建索引时调用）；emb 给了就不再编码（增量构建已拼好）"""
+    if emb is None:
+        emb = encode_sents(model, sents)
+    # 先写临时文件再替换：别的查询进程正 mmap 着的旧文件不会被截断
+    save_npy_atomic(SENT_EMB_PATH, emb)
+    info = {"model": model_name, "fingerprint": sents_fingerprint(sents, model_name),
+            "n": int(emb.shape[0]), "dim": int(emb.shape[1])}
+    save_json_atomic(SENT_EMB_INFO, info)
+    return emb
+
+def load_sent_emb(sents, model, model_name=SENT_MODEL):
+    """指纹一致就直接 mmap；否则（首次 / 索引已重建）重新编码一次并落盘"""
+    try:
+        info = json.load(open(SENT_EMB_INFO, "r", encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        info = {}
+    if info.get("fingerprint") == sents_fingerprint(sents, model_name) and os.path.exists(SENT_EMB_PATH):
+        return np.load(SENT_EMB_PATH, mmap_mode="r")
+    print("⚠️ 句向量缓存缺失或与索引不一致，重新编码（只需一次）…")
+    return save_sent_emb(sents, model, model_name)
+
+# 段落向量 = 段内句向量平均；归一化后的段落向量在建索引时算好（池化矩阵只在生成时临时用）
+PARA_EMB_PATH = "index_para_emb.npy"
+PARA_EMB_INFO = "index_para_emb.json"   # {fingerprint, n}
+
+def build_para_pool(meta):
+    """句子 -> 段落 的平均池化矩阵 (段落 x 句子)，每行非零元 = 1/该段句数"""
+    pids = para_ids(meta)  # 保序去重
+    rows = np.asarray(sent_docrows(meta), dtype=np.int64)
+    if len(pids) != len(meta["docs"]):   # 段落 ID 有重复：行号换成去重后的序号
+        pid2row = {pid: i for i, pid in enumerate(pids)}
+        rows = np.array([pid2row[meta["docs"][r]] for r in rows], dtype=np.int64)
+    counts = np.bincount(rows, minlength=len(pids))
+    data = (1.0 / counts[rows]).astype(np.float32)
+    return csr_matrix((data, (rows, np.arange(len(rows)))), shape=(len(pids), len(rows)))
+
+def para_fingerprint(meta):
+    """句向量指纹 + 段落/句子归属；任何一个变了段落向量就要重算"""
+    try:
+        sent_fp = json.load(open(SENT_EMB_INFO, "r", encoding="utf-8")).get("fingerprint", "")
+    except (FileNotFoundError, ValueError):
+        sent_fp = ""
+    h = hashlib.sha1(sent_fp.encode("utf-8"))
+    h.update(text_digest(meta["docs"]).encode("utf-8"))
+    h.update(b"\0")
+    h.update(sent_docrow_digest(meta).encode("utf-8"))
+    return h.hexdigest()
+
+def save_para_emb(meta, sent_emb):
+    """池化一次，落盘归一化的段落中心向量"""
+    pool = build_para_pool(meta)
+    P = normalize(pool @ np.asarray(sent_emb)).astype(np.float32)
+    save_npy_atomic(PARA_EMB_PATH, P)
+    save_json_atomic(PARA_EMB_INFO, {"fingerprint": para_fingerprint(meta), "n": int(P.shape[0])})
+    return P
+
+def load_para_emb(meta, sent_emb):
+    """指纹一致就 mmap 段落向量；否则用池化矩阵重算一次"""
+    try:
+        info = json.load(open(PARA_EMB_INFO, "r", encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        info = {}
+    if info.get("fingerprint") == para_fingerprint(meta) and os.path.exists(PARA_EMB_PATH):
+        return np.load(PARA_EMB_PATH, mmap_mode="r")
+    return save_para_emb(meta, sent_emb)
+
 def build_embeddings(sents):
-    model = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
-    emb = normalize(model.encode(sents, convert_to_numpy=True))
+    model = SentenceTransformer(SENT_MODEL)
+    emb = load_sent_emb(sents, model)
     return model, emb
 
 def encode(model, text):
     return normalize(model.encode([text], convert_to_numpy=True))[0]
 
-def activate_entities(query, model, sent_emb, M, meta, R=50, sim_th=0.35, rounds=1):
-    """从问题出发 → 找相似句 → 点亮这些句子里的实体；可迭代 rounds 轮"""
-    qv = encode(model, query)
-    sim = (sent_emb @ qv)
-    # 选阈值以上的句子 + Top-R
-    top_idx = np.argsort(sim)[-R:]
-    S = set(np.where(sim >= sim_th)[0]) | set(top_idx)
+def _top_r(scores, R):
+    """取分数最高的 R 个下标（不排序）；argpartition 是 O(n)，比整体 argsort 便宜"""
+    n = len(scores)
+    if R >= n:
+        return np.arange(n)
+    return np.argpartition(scores, n - R)[n - R:]
+
+def activate_from_qv(qv, sent_emb, M, R=50, sim_th=0.35, rounds=1, ann=None, quant=None):
+    """
+    activate_entities 的向量化内核：输入已编码好的问题向量 qv。
+    ann：句向量的 IVF 索引（ann_index.load_ivf）；给了就只在最近的 nprobe 个桶里找相似句，不再扫全部句子。
+    quant：句向量的压缩副本（quant_store.load_quant）；第一遍在压缩向量上算，短名单回 float32 重算。
+    两个都给时第一遍只在 IVF 候选上用压缩向量算，短名单再回 float32 重算。
+    """
+    if ann is None and quant is None:
+        sim = (sent_emb @ qv)
+        # 选阈值以上的句子 + Top-R
+        sel = sim >= sim_th
+        sel[_top_r(sim, R)] = True
+        sel = np.flatnonzero(sel)
+    else:
+        if quant is None:
+            from ann_index import ivf_scores
+            cand, s = ivf_scores(ann, sent_emb, qv)
+        else:
+            from quant_store import RESCORE_FACTOR, quant_shortlist
+            rows = None
+            if ann is not None:
+                from ann_index import ivf_candidates
+                rows = np.sort(ivf_candidates(ann, qv))
+            cand, s = quant_shortlist(quant, sent_emb, qv, R * RESCORE_FACTOR, th=sim_th, rows=rows)
+        keep = s >= sim_th
+        keep[_top_r(s, R)] = True
+        sel = cand[keep]
 
-    # 句子 -> 实体
-    act_e = set()
-    for sid in S:
-        row = M.getrow(sid)
-        act_e.update(row.indices.tolist())
+    # 句子 -> 实体：一次稀疏行抽取，直接在实体掩码上打点
+    act = np.zeros(M.shape[1], dtype=bool)
+    act[M[sel].indices] = True
 
     # 迭代扩一小圈：根据已激活实体，再反找包含它们的句子再过一轮相似度
     for _ in range(rounds - 1):
-        if not act_e:
+        if not act.any():
             break
-        rows = M[:, list(act_e)].sum(axis=1).A1
-        cand = np.where(rows > 0)[0]
-        sim2 = (sent_emb[cand] @ qv)
-        more = set(cand[np.argsort(sim2)[-R:]])
-        S |= more
-        for sid in more:
-            row = M.getrow(sid)
-            act_e.update(row.indices.tolist())
-
-    return act_e
-
-def rank_paragraphs(query, model, sent_emb, C, meta, activated_entities, alpha=0.3, topk=8):
-    # 段落向量：把每段的所有句子向量取平均
-    para_sids = {}
-    for i, pid in enumerate(meta["sent_docid"]):
-        para_sids.setdefault(pid, []).append(i)
-    para_ids = list(dict.fromkeys(meta["docs"]))  # 保序去重
-
-    P = np.zeros((len(para_ids), sent_emb.shape[1]), dtype=np.float32)
-    pid2row = {pid: i for i, pid in enumerate(para_ids)}
-    for i, pid in enumerate(para_ids):
-        sids = para_sids.get(pid, [])
-        if sids:
-            P[i] = sent_emb[sids].mean(axis=0)
-    P = normalize(P)
+        rows = M @ act.astype(np.float32)      # 每句含多少个已激活实体
+        cand = np.flatnonzero(rows > 0)
+        more = cand[_top_r(sim[cand] if ann is None and quant is None else np.asarray(sent_emb[cand]) @ qv, R)]
+        act[M[more].indices] = True
 
+    return set(np.flatnonzero(act).tolist())
+
+def activate_entities(query, model, sent_emb, M, meta, R=50, sim_th=0.35, rounds=1, ann=None, quant=None):
+    """从问题出发 → 找相似句 → 点亮这些句子里的实体；可迭代 rounds 轮（ann / quant 见 activate_from_qv）"""
     qv = encode(model, query)
-    sim = (P @ qv)
+    return activate_from_qv(qv, sent_emb, M, R=R, sim_th=sim_th, rounds=rounds, ann=ann, quant=quant)
+
+def rank_paragraphs(query, model, sent_emb, C, meta, activated_entities, alpha=0.3, topk=8, para_emb=None, qv=None):
+    # 段落向量：建索引时已按“段内句向量平均 + 归一化”算好，这里只做一次 mat-vec
+    pids = para_ids(meta)  # 保序去重（段落 ID 不重复时就是 meta["docs"] 本身，不展开）
+    if para_emb is None:
+        para_emb = load_para_emb(meta, sent_emb)
+
+    # qv：已编码好的问题向量（与激活共用同一次编码时传入）
+    if qv is None:
+        qv = encode(model, query)
+    sim = (para_emb @ qv)
 
     if activated_entities:
         E = list(activated_entities)
         # C 是 (段落行 × 实体列)
         cov = normalize(C[:, E].astype(np.float32), norm='l1', axis=1).sum(axis=1).A1
     else:
-        cov = np.zeros(len(para_ids), dtype=np.float32)
+        cov = np.zeros(len(pids), dtype=np.float32)
 
     score = alpha * sim + (1 - alpha) * cov
     order = np.argsort(score)[::-1][:topk]
-    results = [(para_ids[i], float(score[i])) for i in order]
+    results = [(pids[i], float(score[i])) for i in order]
     return results
 
-def pretty_print(query, results, meta):
+def evidence_spans(meta, sent_emb, qv, results):
+    """
+    每个命中段落里与问题最像的一句：{pid: (起, 止)}，是段落原文里的字符区间（句子本来就按区间存，直接拿来切）。
+    只算该段那几句的点积；qv 为已归一化的问题向量。
+    """
+    rows, out = doc_rows(meta), {}
+    for pid, _ in results:
+        if pid not in rows:
+            continue
+        lo, hi = doc_sent_range(meta, rows[pid])
+        if hi > lo:
+            sid = lo + int(np.argmax(np.asarray(sent_emb[lo:hi], dtype=np.float32) @ qv))
+            out[pid] = (int(meta["sent_start"][sid]), int(meta["sent_end"][sid]))
+    return out
+
+def highlight(text, span=None, width=220):
+    """截 width 个字符的预览；给了证据句区间就用【】标出来，句子不在开头那段时把预览窗口挪到句子前面"""
+    if span is None:
+        return (text[:width] + "…") if len(text) > width else text
+    s, e = span
+    lo = 0 if e <= width else max(0, s - width // 4)
+    hi = max(lo + width, e)
+    out = text[lo:s] + "【" + text[s:e] + "】" + text[e:hi]
+    return ("…" if lo > 0 else "") + out + ("…" if hi < len(text) else "")
+
+def pretty_print(query, results, meta, evidence=None):
+    """evidence：evidence_spans 的结果，给了就在每段预览里标出证据句"""
     print("\n================= QUERY =================")
     print(query)
     print("=============== TOP-K HITS =============")
     for rank, (pid, sc) in enumerate(results, 1):
         text = meta["doc_texts"].get(pid, "")
-        short = (text[:220] + "…") if len(text) > 220 else text
+        short = highlight(text, (evidence or {}).get(pid), 220)
         print(f"[{rank}] pid={pid}  score={sc:.4f}\n    {short}\n")
 
 def main():
-    if len(sys.argv) < 2:
-        print("用法：python src\\retrieve.py \"你的问题\" [topk]")
+    use_ann = "--ann" in sys.argv   # 句向量走 IVF 近似检索（ann_index.py）
+    from quant_store import load_quant, pop_quant_arg
+    quant, argv = pop_quant_arg([a for a in sys.argv if a != "--ann"])   # 句向量第一遍用压缩副本
+    if len(argv) < 2:
+        print("用法：python src\\retrieve.py \"你的问题\" [topk] [--ann] [--quant int8]")
         print("示例：python src\\retrieve.py \"What was the nationality of Beatrice I's husband?\" 5")
         sys.exit(0)
-    query = sys.argv[1]
-    topk = int(sys.argv[2]) if len(sys.argv) >= 3 else 5
+    query = argv[1]
+    topk = int(argv[2]) if len(argv) >= 3 else 5
 
     meta, M, C = load_index()
     model, sent_emb = build_embeddings(meta["sents"])
+    para_emb = load_para_emb(meta, sent_emb)
+    ann = None
+    if use_ann:
+        from ann_index import SENT_IVF_PATH, load_ivf
+        ann = load_ivf(SENT_IVF_PATH, SENT_EMB_PATH, sent_emb)
+    if quant:
+        quant = load_quant(SENT_EMB_PATH, quant, sent_emb)
 
     act_e = activate_entities(
         query=query,
@@ -114,7 +296,9 @@ def main():
         meta=meta,
         R=50,
         sim_th=0.35,
-        rounds=1  # 初学者建议先设 1；要“多跳”可改 2
+        rounds=1,  # 初学者建议先设 1；要“多跳”可改 2
+        ann=ann,
+        quant=quant
     )
 
     results = rank_paragraphs(
@@ -125,10 +309,11 @@ def main():
         meta=meta,
         activated_entities=act_e,
         alpha=0.3,
-        topk=topk
+        topk=topk,
+        para_emb=para_emb
     )
 
-    pretty_print(query, results, meta)
+    pretty_print(query, results, meta, evidence_spans(meta, sent_emb, encode(model, query), results))
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,117 @@
+# src/runner.py
+# 功能：进程内评测 runner —— 索引、模型、缓存矩阵只加载一次，直接调用检索 + 药名抽取函数，
+#       返回结构化结果；代替 eval_* 脚本里「每题每个 K 起一个 python 子进程再抓 stdout」的做法。
+# 用法：from runner import EvalRunner
+#       runner = EvalRunner()
+#       runner.kg_ppr(question, 15)["drugs"] / runner.bm25(question, 15)["drugs"]
+#   或：python src/runner.py "你的问题" [--k 15] [--methods BM25,KG+PPR]
+
+import argparse, json, os, re, time
+
+from answer_drugs import load_kg_context, answer_kg, answer_kg_sweep
+from answer_drugs_bm25 import load_bm25_context, answer_bm25, answer_bm25_sweep
+from ann_index import ANN_NPROBE
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def normalize_drugs(drugs):
+    """与原先解析 stdout 的口径一致：小写、压空白、去空项"""
+    out = [re.sub(r"\s+", " ", d.strip().lower()) for d in drugs]
+    return [d for d in out if d]
+
+
+class EvalRunner:
+    """
+    各方法的上下文第一次用到时才加载（只跑 BM25 就不会加载句向量模型）；
+    构造时切到项目根目录，eval 脚本里的 data/、runs/ 相对路径照旧可用。
+    ann=True：KG+PPR 激活实体时句向量走 IVF 近似检索（ann_index.py），探查 nprobe 个桶；
+    quant：句向量第一遍用压缩副本（f16 / int8 / int8_dim，见 quant_store.py）。
+    """
+
+    METHODS = ("BM25", "KG+PPR")
+
+    def __init__(self, ann=False, nprobe=ANN_NPROBE, quant=None):
+        os.chdir(ROOT)
+        self.ann = ann
+        self.nprobe = nprobe
+        self.quant = quant
+        self._kg = None
+        self._bm25 = None
+        self.load_seconds = {}   # 方法 -> 加载耗时（秒）
+
+    def _ctx(self, method):
+        if method == "KG+PPR":
+            if self._kg is None:
+                t0 = time.perf_counter()
+                self._kg = load_kg_context(ann=self.ann, nprobe=self.nprobe, quant=self.quant)
+                self.load_seconds[method] = time.perf_counter() - t0
+            return self._kg
+        if method == "BM25":
+            if self._bm25 is None:
+                t0 = time.perf_counter()
+                self._bm25 = load_bm25_context()
+                self.load_seconds[method] = time.perf_counter() - t0
+            return self._bm25
+        raise ValueError(f"未知方法：{method}（可选 {', '.join(self.METHODS)}）")
+
+    def kg_ppr(self, query, K):
+        return self.answer("KG+PPR", query, K)
+
+    def bm25(self, query, K):
+        return self.answer("BM25", query, K)
+
+    def answer(self, method, query, K):
+        """
+        返回 {"method", "query", "K", "drugs", "seconds", ...}；
+        drugs 已按 normalize_drugs 归一，与对应 answer_*.py 打印的 ANSWER (drug list) 解析结果一致；
+        其余字段为各方法的原始结果（drugs 以外）。
+        """
+        ctx = self._ctx(method)
+        t0 = time.perf_counter()
+        if method == "KG+PPR":
+            ans = answer_kg(query, K, ctx)
+        else:
+            ans = answer_bm25(query, K, ctx)
+        out = {"method": method, "query": query, "K": K, "seconds": time.perf_counter() - t0}
+        out.update(ans)
+        out["drugs"] = normalize_drugs(ans["drugs"])
+        return out
+
+    def sweep(self, method, query, ks):
+        """
+        一次检索扫多个 K（各 K 取同一排序的前缀），返回 {K: {"method", "query", "K", "drugs", ...}}；
+        药名集合与逐个 K 调 answer() 一致，drugs 按别名表顺序；seconds 是整次扫描的耗时。
+        """
+        ctx = self._ctx(method)
+        t0 = time.perf_counter()
+        if method == "KG+PPR":
+            by_k = answer_kg_sweep(query, ks, ctx)
+        else:
+            by_k = answer_bm25_sweep(query, ks, ctx)
+        dt = time.perf_counter() - t0
+        out = {}
+        for k, ans in by_k.items():
+            out[k] = {"method": method, "query": query, "K": k, "seconds": dt}
+            out[k].update(ans)
+            out[k]["drugs"] = normalize_drugs(ans["drugs"])
+        return out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("query")
+    ap.add_argument("--k", type=int, default=15)
+    ap.add_argument("--methods", default="BM25,KG+PPR")
+    args = ap.parse_args()
+
+    runner = EvalRunner()
+    for m in args.methods.split(","):
+        ans = runner.answer(m.strip(), args.query, args.k)
+        print(json.dumps({"method": ans["method"], "K": ans["K"], "drugs": ans["drugs"],
+                          "seconds": round(ans["seconds"], 4)}, ensure_ascii=False))
+    print("⏱️ 加载耗时：" + ", ".join(f"{m}={s:.2f}s" for m, s in runner.load_seconds.items()))
+
+
+if __name__ == "__main__":
+    main()
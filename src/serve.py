@@ -0,0 +1,245 @@
+# src/serve.py
+# 功能：常驻检索服务 —— 索引、模型、缓存矩阵启动时加载一次（复用 runner.EvalRunner 的上下文），
+#       之后通过本机 HTTP + JSON 回答每个现有脚本的查询，单次查询的耗时只剩检索本身：
+#         POST /retrieve            三元图检索 Top-K 段落（retrieve.py）
+#         POST /ppr_retrieve        PPR+KW 检索 Top-K 段落（ppr_retrieve.py）
+#         POST /answer_drugs        KG+PPR 药名 + 引文（answer_drugs.py）
+#         POST /answer_drugs_bm25   BM25 药名 + 引文（answer_drugs_bm25.py）
+#         POST /vec_retrieve        文献向量检索 Top-K（vec_retrieve.py）
+#         POST /answer_vec_drugs    向量检索药名 + 引文（answer_vec_drugs.py）
+#         GET  /health              已加载的上下文与加载耗时
+#         GET  /metrics             查询编码微批处理的批大小分布、等待耗时（见 batcher.py）
+#       请求体 {"query": "...", "k": 15}（k 可省，默认值与对应脚本一致）；
+#       返回 {"endpoint", "query", "k", "seconds", "results": [{"rank", "pid", "score", "text", ...}], "drugs"?}；
+#       KG 三个端点的每条引文另带 "evidence": [起, 止] —— 与问题最像的那句在 text 里的字符区间
+#       多线程处理请求（ThreadingHTTPServer），上下文只读共享；配套命令行客户端见 client.py。
+#       并发查询的编码（KG 路径的 MiniLM、向量路径的 mpnet）各经过一个 MicroBatcher 合批：
+#       --max-batch 1 关掉合批；--max-wait-ms 越大批越大、单次延迟越高。
+# 用法：python src\serve.py [--host 127.0.0.1] [--port 8765] [--backlog 128] [--methods BM25,KG+PPR,VEC] [--lazy]
+#                          [--max-batch 32] [--max-wait-ms 2] [--ann] [--nprobe 32] [--quant int8]
+#       --ann：句向量（激活实体）与文献向量检索都走 IVF 近似检索（ann_index.py）
+#       --quant：两份向量的第一遍点积都用压缩副本、短名单 float32 重排（quant_store.py）；
+#                和 --ann 一起给时第一遍只在 IVF 候选上用压缩副本算
+
+import argparse, json, threading, time, traceback
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from runner import EvalRunner
+from ann_index import ANN_NPROBE
+from quant_store import QUANT_MODES
+from batcher import MicroBatcher
+from retrieve import activate_from_qv, encode, evidence_spans, rank_paragraphs
+from ppr_retrieve import rank_paragraphs_ppr
+from answer_drugs import answer_kg
+from answer_drugs_bm25 import answer_bm25
+from answer_vec_drugs import load_vec_context, answer_vec, doc_text
+from bm25_index import get_text, fetch_docs
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+MAX_BODY = 1 << 20   # 请求体上限（字节）
+DEFAULT_BACKLOG = 128   # listen 队列长度（socketserver 默认 5，并发一高新连接就被内核直接重置）
+
+
+class RetrievalService(EvalRunner):
+    """
+    在 EvalRunner（BM25 / KG+PPR 上下文）之上再挂一个 VEC 上下文；加载过程加锁，查询并发只读。
+    带编码模型的上下文加载完后，把 ctx["model"] 换成 MicroBatcher（接口不变，检索代码不用改）。
+    """
+
+    METHODS = ("BM25", "KG+PPR", "VEC")
+
+    def __init__(self, max_batch=32, max_wait_ms=2.0, ann=False, nprobe=ANN_NPROBE, quant=None):
+        super().__init__(ann, nprobe, quant)
+        self._vec = None
+        self._lock = threading.Lock()
+        self.max_batch = max_batch
+        self.max_wait_ms = max_wait_ms
+        self.batchers = {}   # 方法 -> MicroBatcher
+
+    def _ctx(self, method):
+        with self._lock:
+            if method == "VEC":
+                if self._vec is None:
+                    t0 = time.perf_counter()
+                    self._vec = load_vec_context(ann=self.ann, nprobe=self.nprobe, quant=self.quant)
+                    self.load_seconds[method] = time.perf_counter() - t0
+                ctx = self._vec
+            else:
+                ctx = super()._ctx(method)
+            if "model" in ctx and method not in self.batchers:
+                ctx["model"] = self.batchers[method] = MicroBatcher(ctx["model"], self.max_batch, self.max_wait_ms,
+                                                                    name=method)
+            return ctx
+
+    def loaded(self):
+        return [m for m, ctx in (("BM25", self._bm25), ("KG+PPR", self._kg), ("VEC", self._vec)) if ctx is not None]
+
+
+# ---------- 各端点：(用到的上下文, 默认 K, 处理函数) ----------
+
+def _kg_citations(results, meta, evidence):
+    out = []
+    for r, (pid, sc) in enumerate(results, 1):
+        c = {"rank": r, "pid": pid, "score": float(sc), "text": meta["doc_texts"].get(pid, "")}
+        if pid in evidence:
+            c["evidence"] = list(evidence[pid])
+        out.append(c)
+    return out
+
+def _vec_citations(rows, scores, docs):
+    out = []
+    for r, (i, sc) in enumerate(zip(rows, scores), 1):
+        doc = docs[int(i)]
+        out.append({"rank": r, "pid": doc.get("pid") or doc.get("pmid") or doc.get("id"), "score": float(sc),
+                    "title": (doc.get("title") or doc.get("Title") or "").strip(), "text": doc_text(doc)})
+    return out
+
+def ep_retrieve(ctx, query, k):
+    qv = encode(ctx["model"], query)   # 激活、段落打分、证据句共用一次编码
+    seeds = activate_from_qv(qv, ctx["sent_emb"], ctx["M"], R=50, sim_th=0.35, rounds=1,
+                             ann=ctx["ann"], quant=ctx["quant"])
+    results = rank_paragraphs(query, ctx["model"], ctx["sent_emb"], ctx["C"], ctx["meta"], seeds, alpha=0.3, topk=k,
+                              para_emb=ctx["para_emb"], qv=qv)
+    return {"results": _kg_citations(results, ctx["meta"], evidence_spans(ctx["meta"], ctx["sent_emb"], qv, results))}
+
+def ep_ppr_retrieve(ctx, query, k):
+    qv = encode(ctx["model"], query)
+    seeds = activate_from_qv(qv, ctx["sent_emb"], ctx["M"], R=100, sim_th=0.25, rounds=1,
+                             ann=ctx["ann"], quant=ctx["quant"])
+    results = rank_paragraphs_ppr(query, ctx["model"], ctx["sent_emb"], ctx["M"], ctx["C"], ctx["meta"], seeds, topk=k,
+                                  para_emb=ctx["para_emb"], trans=ctx["trans"], kw_hits=ctx["kw_hits"])
+    return {"results": _kg_citations(results, ctx["meta"], evidence_spans(ctx["meta"], ctx["sent_emb"], qv, results))}
+
+def ep_answer_drugs(ctx, query, k):
+    ans = answer_kg(query, k, ctx)
+    return {"drugs": ans["drugs"], "hits": ans["hits"],
+            "results": _kg_citations(ans["results"], ctx["meta"], ans["evidence"])}
+
+def ep_answer_drugs_bm25(ctx, query, k):
+    ans = answer_bm25(query, k, ctx)
+    results = []
+    for r, (sc, j) in enumerate(zip(ans["scores"], fetch_docs(ctx["index"], ans["rows"])), 1):
+        results.append({"rank": r, "pid": j.get("pid") or j.get("id") or "?", "score": float(sc), "text": get_text(j)})
+    return {"drugs": ans["drugs"], "results": results}
+
+def ep_vec_retrieve(ctx, query, k):
+    ans = answer_vec(query, k, ctx)
+    return {"results": _vec_citations(ans["rows"], ans["scores"], ctx["docs"])}
+
+def ep_answer_vec_drugs(ctx, query, k):
+    ans = answer_vec(query, k, ctx)
+    return {"drugs": ans["drugs"], "results": _vec_citations(ans["rows"], ans["scores"], ctx["docs"])}
+
+ENDPOINTS = {
+    "retrieve": ("KG+PPR", 5, ep_retrieve),
+    "ppr_retrieve": ("KG+PPR", 5, ep_ppr_retrieve),
+    "answer_drugs": ("KG+PPR", 12, ep_answer_drugs),
+    "answer_drugs_bm25": ("BM25", 20, ep_answer_drugs_bm25),
+    "vec_retrieve": ("VEC", 5, ep_vec_retrieve),
+    "answer_vec_drugs": ("VEC", 15, ep_answer_vec_drugs),
+}
+
+
+def handle_query(service, endpoint, body):
+    """端点名 + 请求体 -> 响应 dict；参数不对抛 ValueError"""
+    method, default_k, fn = ENDPOINTS[endpoint]
+    query = body.get("query")
+    if not isinstance(query, str) or not query.strip():
+        raise ValueError("缺少 query")
+    k = body.get("k", default_k)
+    if not isinstance(k, int) or isinstance(k, bool) or k <= 0:
+        raise ValueError("k 必须是正整数")
+    ctx = service._ctx(method)
+    t0 = time.perf_counter()
+    out = fn(ctx, query, k)
+    resp = {"endpoint": endpoint, "method": method, "query": query, "k": k, "seconds": time.perf_counter() - t0}
+    resp.update(out)
+    return resp
+
+
+class Handler(BaseHTTPRequestHandler):
+    service = None   # main() 里赋值
+    protocol_version = "HTTP/1.1"
+
+    def _send(self, code, obj):
+        data = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/health":
+            self._send(200, {"status": "ok", "loaded": self.service.loaded(),
+                             "load_seconds": self.service.load_seconds, "endpoints": sorted(ENDPOINTS)})
+        elif self.path.rstrip("/") == "/metrics":
+            self._send(200, {m: b.stats() for m, b in self.service.batchers.items()})
+        else:
+            self._send(404, {"error": f"未知路径：{self.path}"})
+
+    def do_POST(self):
+        endpoint = self.path.strip("/")
+        n = int(self.headers.get("Content-Length") or 0)
+        if n > MAX_BODY:
+            self._send(413, {"error": "请求体过大"})
+            return
+        raw = self.rfile.read(n)
+        if endpoint not in ENDPOINTS:
+            self._send(404, {"error": f"未知端点：{self.path}（可选 {', '.join(sorted(ENDPOINTS))}）"})
+            return
+        try:
+            body = json.loads(raw or b"{}")
+            if not isinstance(body, dict):
+                raise ValueError("请求体必须是 JSON 对象")
+            self._send(200, handle_query(self.service, endpoint, body))
+        except ValueError as e:   # 含 JSONDecodeError
+            self._send(400, {"error": str(e)})
+        except Exception as e:
+            traceback.print_exc()
+            self._send(500, {"error": f"{type(e).__name__}: {e}"})
+
+    def log_message(self, fmt, *args):
+        pass   # 不逐条打印访问日志
+
+
+class Server(ThreadingHTTPServer):
+    request_queue_size = DEFAULT_BACKLOG   # main() 里按 --backlog 改
+    daemon_threads = True
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--host", default=DEFAULT_HOST)
+    ap.add_argument("--port", type=int, default=DEFAULT_PORT)
+    ap.add_argument("--methods", default=",".join(RetrievalService.METHODS), help="启动时预加载的上下文")
+    ap.add_argument("--backlog", type=int, default=DEFAULT_BACKLOG, help="未 accept 的连接最多排队多少个")
+    ap.add_argument("--lazy", action="store_true", help="不预加载，第一次查询到时再加载")
+    ap.add_argument("--max-batch", type=int, default=32, help="一次合并编码的最多 query 数（1 = 不合批）")
+    ap.add_argument("--max-wait-ms", type=float, default=2.0, help="攒批的最长等待（毫秒）")
+    ap.add_argument("--ann", action="store_true", help="向量检索走 IVF 近似检索")
+    ap.add_argument("--nprobe", type=int, default=ANN_NPROBE, help="--ann 时探查的桶数")
+    ap.add_argument("--quant", choices=QUANT_MODES, default=None, help="向量第一遍用压缩副本")
+    args = ap.parse_args()
+
+    service = RetrievalService(args.max_batch, args.max_wait_ms, args.ann, args.nprobe, args.quant)
+    if not args.lazy:
+        for m in [x.strip() for x in args.methods.split(",") if x.strip()]:
+            service._ctx(m)
+            print(f"✅ 已加载 {m}：{service.load_seconds[m]:.2f}s")
+
+    Handler.service = service
+    Server.request_queue_size = args.backlog
+    httpd = Server((args.host, args.port), Handler)
+    print(f"🚀 检索服务已启动：http://{args.host}:{args.port}（端点：{', '.join(sorted(ENDPOINTS))}）")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
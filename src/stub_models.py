@@ -0,0 +1,110 @@
+# src/stub_models.py
+# 功能：离线替身模型 —— 合成语料（synth_corpus.py）建索引 / 跑扩展性基准时代替真模型，不用联网、不用装 spaCy
+#       StubNER：按实体词表做「空白切词 + 最长 n-gram 查表」，接口对齐 nlp.pipe(...) / doc.ents / ent.text
+#       StubEncoder：词袋哈希随机投影（同词同向量，词重叠越多越相似），接口对齐 SentenceTransformer.encode
+#       只为测速、测内存；检索质量没有参考意义。
+
+import json, os, re, zlib
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from sklearn.preprocessing import normalize as _l2
+
+STUB_NER_NAME = "stub-ner"
+STUB_ENCODER_NAME = "stub-hash-encoder"
+SYNTH_ENTITIES = os.path.join("data", "synth_entities.json")   # synth_corpus.py 写出的实体词表
+
+WORD_RE = re.compile(r"[A-Za-z]+")
+
+class _Span:
+    __slots__ = ("text",)
+
+    def __init__(self, text):
+        self.text = text
+
+class _Doc:
+    __slots__ = ("ents",)
+
+    def __init__(self, ents):
+        self.ents = ents
+
+class StubNER:
+    """
+    实体 = 词表里的字符串（大小写不敏感）；句子按空白切词后，从左到右取能查到的最长 n-gram，不重叠。
+    只实现 build_index.py 用到的部分：pipeline / pipe_names / pipe()。
+    """
+
+    pipeline = []
+    pipe_names = []
+
+    def __init__(self, entities):
+        self.table = {}
+        self.max_n = 1
+        for e in entities:
+            toks = e.split()
+            if not toks:
+                continue
+            self.table.setdefault(" ".join(toks).lower(), e)
+            self.max_n = max(self.max_n, len(toks))
+
+    @classmethod
+    def from_root(cls, root="."):
+        with open(os.path.join(root, SYNTH_ENTITIES), "r", encoding="utf-8") as f:
+            return cls(json.load(f)["entities"])
+
+    def ents(self, text):
+        toks = text.lower().split()
+        if toks and toks[-1].endswith((".", "!", "?")):
+            toks[-1] = toks[-1][:-1]
+        out, i = [], 0
+        while i < len(toks):
+            for n in range(min(self.max_n, len(toks) - i), 0, -1):
+                e = self.table.get(" ".join(toks[i:i + n]))
+                if e is not None:
+                    out.append(_Span(e))
+                    i += n
+                    break
+            else:
+                i += 1
+        return out
+
+    def pipe(self, texts, batch_size=256, n_process=1, disable=None):
+        for t in texts:
+            yield _Doc(self.ents(t))
+
+class StubEncoder:
+    """
+    每个词（[A-Za-z]+，小写）哈希到 n_buckets 个桶之一，每个桶一条固定的随机向量；
+    文本向量 = 桶向量按词频加权求和。同一输入永远得到同一向量（crc32，不受 PYTHONHASHSEED 影响）。
+    """
+
+    def __init__(self, dim=384, n_buckets=1 << 14, seed=0):
+        self.dim = dim
+        self.n_buckets = n_buckets
+        rng = np.random.default_rng(seed)
+        self.table = rng.standard_normal((n_buckets, dim)).astype(np.float32)
+        self._bucket = {}
+
+    def _rows(self, texts):
+        indptr, cols = [0], []
+        for t in texts:
+            for w in WORD_RE.findall(t.lower()):
+                b = self._bucket.get(w)
+                if b is None:
+                    b = self._bucket[w] = zlib.crc32(w.encode("utf-8")) % self.n_buckets
+                cols.append(b)
+            indptr.append(len(cols))
+        data = np.ones(len(cols), dtype=np.float32)
+        return csr_matrix((data, np.asarray(cols, dtype=np.int64), np.asarray(indptr, dtype=np.int64)),
+                          shape=(len(texts), self.n_buckets))
+
+    def encode(self, texts, batch_size=4096, show_progress_bar=False, convert_to_numpy=True,
+               normalize_embeddings=False):
+        if isinstance(texts, str):
+            texts = [texts]
+        out = np.empty((len(texts), self.dim), dtype=np.float32)
+        for s in range(0, len(texts), batch_size):
+            out[s:s + batch_size] = self._rows(texts[s:s + batch_size]) @ self.table
+        if normalize_embeddings:
+            out = _l2(out).astype(np.float32)
+        return out
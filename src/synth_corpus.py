@@ -0,0 +1,214 @@
+# src/synth_corpus.py
+# 功能：按真实语料的统计分布生成任意规模的合成语料（确定性：同样的 --n-docs / --seed 得到同样的文件）
+#       统计量取自工程根目录的真实索引（index_meta/ + index_tri_graph/）：
+#         每篇句数、每句词数、每句实体数 —— 经验分布直接重采样
+#         实体频率 —— 按 rank-frequency 拟合 Zipf 指数；实体词表随规模增长 —— 按 Heaps 定律拟合指数
+#         非实体的填充词 —— 真实句子里的词频（去掉单词实体，避免 StubNER 误识别）
+#       高频段的实体直接用真实实体字符串（药名等都在里面），超出真实词表的部分用合成名字。
+#       输出 <out>/data/docs.jsonl（与真实语料同格式），<out>/data/synth_entities.json（StubNER 词表），
+#       <out>/data/synth_stats.json（拟合出的统计量）。之后可以：
+#         python src\build_index.py --root <out> --stub-models
+# 用法：python src\synth_corpus.py --n-docs 10000 --out runs\synth_10k [--seed 0] [--check]
+
+import argparse, json, os, re, time
+from collections import Counter
+
+import numpy as np
+
+from retrieve import load_index
+from stub_models import StubNER, SYNTH_ENTITIES, WORD_RE
+
+SYNTH_STATS = os.path.join("data", "synth_stats.json")
+CHUNK_DOCS = 10000
+_SUFFIXES = ["ase", "in", "ol", "ide", "ium", "ine", "mab", "cin"]
+
+def _loglog_slope(x, y):
+    x, y = np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64)
+    ok = (x > 0) & (y > 0)
+    return float(np.polyfit(np.log(x[ok]), np.log(y[ok]), 1)[0])
+
+def corpus_stats(meta, M):
+    """从真实索引里拿生成要用的全部统计量（都是可 JSON 化的列表 / 数）"""
+    per_doc = Counter(meta["sent_docid"])
+    sents_per_doc = [per_doc[pid] for pid in dict.fromkeys(meta["docs"])]
+    sent_len = [len(s.split()) for s in meta["sents"]]
+    ents_per_sent = np.diff(M.indptr).tolist()
+
+    # 实体频率（出现在几句里），按频率从高到低
+    B = M.tocsc()
+    freq = np.diff(B.indptr)
+    id2ent = [None] * len(meta["ent2id"])
+    for e, i in meta["ent2id"].items():
+        id2ent[i] = e
+    order = np.argsort(-freq, kind="stable")
+    freq_sorted = freq[order]
+
+    # Zipf：在对数均匀取样的名次上拟合，避免尾部大量 1 次的实体把斜率压平
+    V = int((freq_sorted > 0).sum())
+    ranks = np.unique(np.geomspace(1, max(V, 1), 50).astype(int))
+    zipf_s = -_loglog_slope(ranks, freq_sorted[ranks - 1])
+
+    # Heaps：按语料顺序累计的不同实体数 vs 句子数
+    seen = np.zeros(M.shape[1], dtype=bool)
+    n_distinct = np.empty(M.shape[0], dtype=np.int64)
+    cnt = 0
+    for i in range(M.shape[0]):
+        cols = M.indices[M.indptr[i]:M.indptr[i + 1]]
+        new = cols[~seen[cols]]
+        seen[new] = True
+        cnt += len(new)
+        n_distinct[i] = cnt
+    pts = np.unique(np.geomspace(max(M.shape[0] // 20, 1), M.shape[0], 30).astype(int))
+    heaps_h = _loglog_slope(pts, n_distinct[pts - 1])
+
+    # 实体字符串：去掉含句末标点的（会被分句切开）、大小写重复的
+    names, keys = [], set()
+    for i in order[:V]:
+        e = id2ent[i]
+        k = " ".join(e.split()).lower()
+        if not k or re.search(r"[.!?]", e) or not WORD_RE.search(e) or k in keys:
+            continue
+        keys.add(k)
+        names.append(" ".join(e.split()))
+
+    # 填充词：真实句子里的词，去掉单词实体
+    single = {k for k in keys if " " not in k}
+    words = Counter(w for s in meta["sents"] for w in WORD_RE.findall(s.lower()) if w not in single)
+    fill_words, fill_counts = zip(*words.most_common()) if words else ((), ())
+
+    return {
+        "n_docs": len(sents_per_doc),
+        "n_sents": len(sent_len),
+        "n_ents": V,
+        "sents_per_doc": sents_per_doc,
+        "sent_len": sent_len,
+        "ents_per_sent": ents_per_sent,
+        "zipf_s": zipf_s,
+        "heaps_h": heaps_h,
+        "entity_names": names,
+        "fill_words": list(fill_words),
+        "fill_counts": list(fill_counts),
+    }
+
+def _synth_name(r):
+    """名次 r -> 合成实体名（纯字母，BM25 分词器能切出来，且基本不会撞上真实词）"""
+    s = ""
+    n = r
+    while True:
+        s = chr(ord("a") + n % 26) + s
+        n //= 26
+        if n == 0:
+            break
+    return "q" + s + _SUFFIXES[r % len(_SUFFIXES)]
+
+def entity_vocab(stats, n_docs):
+    """目标规模下的实体词表大小（Heaps 外推）与 Zipf 概率"""
+    n_sents = n_docs * np.mean(stats["sents_per_doc"])
+    V = max(stats["n_ents"], int(round(stats["n_ents"] * (n_sents / stats["n_sents"]) ** stats["heaps_h"])))
+    p = np.arange(1, V + 1, dtype=np.float64) ** -stats["zipf_s"]
+    names = stats["entity_names"]
+    vocab = names[:V] + [_synth_name(r) for r in range(len(names), V)]
+    return vocab, p / p.sum()
+
+def generate(n_docs, stats, out_dir, seed=0):
+    """写 <out_dir>/data/docs.jsonl 与 StubNER 词表；返回 {"n_docs", "n_sents", "n_vocab"}"""
+    rng = np.random.default_rng(seed)
+    vocab, p_ent = entity_vocab(stats, n_docs)
+    fill = np.array(stats["fill_words"], dtype=object)
+    p_fill = np.asarray(stats["fill_counts"], dtype=np.float64)
+    p_fill /= p_fill.sum()
+    spd = np.asarray(stats["sents_per_doc"])
+    slen = np.asarray(stats["sent_len"])
+    eps = np.asarray(stats["ents_per_sent"])
+    vlen = np.array([len(v.split()) for v in vocab], dtype=np.int64)   # 多词实体占几个词
+
+    os.makedirs(os.path.join(out_dir, "data"), exist_ok=True)
+    n_sents = 0
+    with open(os.path.join(out_dir, "data", "docs.jsonl"), "w", encoding="utf-8") as f:
+        for start in range(0, n_docs, CHUNK_DOCS):
+            n = min(CHUNK_DOCS, n_docs - start)
+            ns = rng.choice(spd, size=n)
+            S = int(ns.sum())
+            L = rng.choice(slen, size=S)
+            k = rng.choice(eps, size=S)
+            ents = rng.choice(len(vocab), size=int(k.sum()), p=p_ent)
+            c = np.concatenate([[0], np.cumsum(vlen[ents])])
+            e_off = np.concatenate([[0], np.cumsum(k)])
+            n_fill = np.maximum(L - (c[e_off[1:]] - c[e_off[:-1]]), 1)
+            words = rng.choice(fill, size=int(n_fill.sum()), p=p_fill)
+            pos = rng.random(int(k.sum()))
+            w_off = np.concatenate([[0], np.cumsum(n_fill)])
+
+            sents = []
+            for j in range(S):
+                toks = list(words[w_off[j]:w_off[j + 1]])
+                for ei in range(e_off[j], e_off[j + 1]):
+                    toks.insert(int(pos[ei] * (len(toks) + 1)), vocab[ents[ei]])
+                s = " ".join(toks)
+                sents.append(s[:1].upper() + s[1:] + ".")
+            s_off = np.concatenate([[0], np.cumsum(ns)])
+            for d in range(n):
+                text = " ".join(sents[s_off[d]:s_off[d + 1]])
+                f.write(json.dumps({"id": f"S{start + d:07d}", "text": text}, ensure_ascii=False) + "\n")
+            n_sents += S
+
+    with open(os.path.join(out_dir, SYNTH_ENTITIES), "w", encoding="utf-8") as f:
+        json.dump({"entities": vocab}, f, ensure_ascii=False)
+    fitted = {k: stats[k] for k in ("n_docs", "n_sents", "n_ents", "zipf_s", "heaps_h")}
+    with open(os.path.join(out_dir, SYNTH_STATS), "w", encoding="utf-8") as f:
+        json.dump({"source": fitted, "n_docs": n_docs, "n_vocab": len(vocab), "seed": seed}, f, indent=2)
+    return {"n_docs": n_docs, "n_sents": n_sents, "n_vocab": len(vocab)}
+
+def check(stats, out_dir, sample=2000):
+    """合成语料前 sample 篇：用 StubNER 重新分句抽实体，和真实分布对比"""
+    from build_index import split_sentences
+    ner = StubNER.from_root(out_dir)
+    docs = []
+    with open(os.path.join(out_dir, "data", "docs.jsonl"), "r", encoding="utf-8") as f:
+        for line in f:
+            docs.append(json.loads(line)["text"])
+            if len(docs) >= sample:
+                break
+    spd, slen, eps, ent_cnt = [], [], [], Counter()
+    for t in docs:
+        ss = split_sentences(t)
+        spd.append(len(ss))
+        for s in ss:
+            slen.append(len(s.split()))
+            es = {e.text for e in ner.ents(s)}
+            eps.append(len(es))
+            ent_cnt.update(es)
+    rows = [("每篇句数", stats["sents_per_doc"], spd), ("每句词数", stats["sent_len"], slen),
+            ("每句实体数", stats["ents_per_sent"], eps)]
+    print(f"\n{'':<10}{'真实 均值/p50/p90':>22}{'合成 均值/p50/p90':>22}")
+    for name, a, b in rows:
+        fa = f"{np.mean(a):.2f}/{np.percentile(a, 50):.0f}/{np.percentile(a, 90):.0f}"
+        fb = f"{np.mean(b):.2f}/{np.percentile(b, 50):.0f}/{np.percentile(b, 90):.0f}"
+        print(f"{name:<10}{fa:>22}{fb:>22}")
+    freq = np.array(sorted(ent_cnt.values(), reverse=True))
+    ranks = np.unique(np.geomspace(1, max(len(freq), 1), 50).astype(int))
+    print(f"Zipf 指数：真实 {stats['zipf_s']:.3f}  合成（前 {len(docs)} 篇）{-_loglog_slope(ranks, freq[ranks - 1]):.3f}")
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n-docs", type=int, required=True)
+    ap.add_argument("--out", required=True, help="输出目录（会写 <out>/data/docs.jsonl）")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--check", action="store_true", help="生成后抽样核对分布")
+    args = ap.parse_args()
+    out_dir = os.path.abspath(args.out)
+
+    meta, M, _ = load_index()   # 会切到工程根目录
+    stats = corpus_stats(meta, M)
+    print(f"📊 真实语料：{stats['n_docs']} 篇 / {stats['n_sents']} 句 / {stats['n_ents']} 个实体；"
+          f"Zipf s={stats['zipf_s']:.3f}，Heaps h={stats['heaps_h']:.3f}")
+
+    t0 = time.perf_counter()
+    info = generate(args.n_docs, stats, out_dir, seed=args.seed)
+    print(f"✅ 已生成 {info['n_docs']} 篇 / {info['n_sents']} 句，实体词表 {info['n_vocab']}，"
+          f"用时 {time.perf_counter() - t0:.1f}s -> {out_dir}")
+    if args.check:
+        check(stats, out_dir)
+
+if __name__ == "__main__":
+    main()
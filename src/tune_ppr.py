@@ -0,0 +1,189 @@
+# src/tune_ppr.py
+# 功能：PPR 打分权重调参 —— score = beta·sim + (1-beta)·cov_ppr + gamma·kw - delta·neg
+#       每个问题的分量向量（sim / kw / neg / 各 alpha 下的 cov_ppr）只算一次缓存在内存里，
+#       之后成千上万组 (alpha, beta, gamma, delta) 都是数组运算：一次对整块权重组合打分、排序、取药名、
+#       对 data/qa_med_questions.jsonl 的 gold_drugs 算宏平均 P/R/F1。
+#       输出每个 K 下的最佳组合、F1 vs K 的 Pareto 前沿（K 越小越好、F1 越高越好），全部结果写 CSV。
+# 用法：python src\tune_ppr.py [--alphas 0.1,0.15,0.25,0.4] [--betas ...] [--gammas ...] [--deltas ...]
+#                             [--k-list 5,10,15,20,30,50] [--top 10]
+
+import argparse, csv, itertools, json, os, time
+
+import numpy as np
+
+from answer_drugs import load_kg_context
+from retrieve import activate_entities
+from ppr_retrieve import (paragraph_components, ppr_coverage, entity_ppr_scores_batch, REQUIRE_ANTIBIOTIC,
+                          BETA, GAMMA, DELTA, PPR_ALPHA)
+
+QA_PATH = os.path.join("data", "qa_med_questions.jsonl")
+OUT_CSV = os.path.join("runs", "tune_ppr.csv")
+CHUNK_CELLS = 4_000_000   # 一块权重组合的打分矩阵（组合数 x 段落数）上限，控制内存
+
+def floats(s):
+    return [float(x) for x in s.split(",")]
+
+def question_components(ctx, qs, alphas):
+    """
+    每个问题的分量只算一次：sim / kw / neg / kw_ab 与 alpha 无关；
+    cov_ppr 对每个 alpha 用 entity_ppr_scores_batch 把全部问题一起跑。
+    返回 [{"sim", "kw", "neg", "kw_ab", "cov": {alpha: cov_ppr}}]，以及段落 id 顺序
+    """
+    meta, M, C = ctx["meta"], ctx["M"], ctx["C"]
+    model, sent_emb = ctx["model"], ctx["sent_emb"]
+    seeds = [activate_entities(q["question"], model, sent_emb, M, meta, R=100, sim_th=0.25, rounds=1) for q in qs]
+    P, deg = ctx["trans"]
+    R_by_alpha = {a: entity_ppr_scores_batch(M, C, seeds, alpha=a, iters=50, P=P, deg=deg) for a in alphas}
+
+    comps, para_ids = [], None
+    for j, q in enumerate(qs):
+        # 问题只编码一次、其余分量只算一次；每个 alpha 只重算覆盖分量
+        para_ids, c = paragraph_components(q["question"], model, sent_emb, M, C, meta, seeds[j],
+                                           para_emb=ctx["para_emb"], trans=ctx["trans"],
+                                           r_ent=R_by_alpha[alphas[0]][:, j], kw_hits=ctx["kw_hits"])
+        c["cov"] = {a: ppr_coverage(C, R_by_alpha[a][:, j]) for a in alphas}
+        comps.append(c)
+    return comps, para_ids
+
+def first_hit_ranks_batch(D, order):
+    """
+    order: (组合数, L) 每行一个段落排序；D: (段落数, 药名数) 布尔命中。
+    返回 (组合数, 药名数)：每个药名在该排序里第一次出现的名次，没出现记 L。
+    """
+    hits = D[order]                          # (G, L, 药名数)
+    first = hits.argmax(axis=1)
+    first[~hits.any(axis=1)] = order.shape[1]
+    return first
+
+def eval_grid(comp, D, gold_vec, n_gold, weights, ks):
+    """
+    一个问题、一个 alpha、一块权重组合 weights=(G,3) 的 beta/gamma/delta：
+    返回 (P, R, F1)，各为 (G, len(ks))。排序、硬过滤口径与 ppr_retrieve.order_paragraphs 一致。
+    """
+    # 系数先按 float64 算好（1-beta 也是），再转成分量的精度 —— 与 combine_scores 里标量参与运算的舍入一致
+    dt = comp["sim"].dtype
+    beta, gamma, delta = (weights[:, i:i + 1] for i in range(3))
+    S = (beta.astype(dt) * comp["sim"] + (1 - beta).astype(dt) * comp["cov_a"]
+         + gamma.astype(dt) * comp["kw"] - delta.astype(dt) * comp["neg"])
+    k_max = min(max(ks), S.shape[1])
+    full = np.argsort(S, axis=1)[:, ::-1][:, :k_max]
+    first_full = first_hit_ranks_batch(D, full)
+    idx_ab = np.where(comp["kw_ab"] > 0)[0]
+    if REQUIRE_ANTIBIOTIC and len(idx_ab):
+        ab = idx_ab[np.argsort(S[:, idx_ab], axis=1)[:, ::-1][:, :min(k_max, len(idx_ab))]]
+        first_ab = first_hit_ranks_batch(D, ab)
+
+    out_p, out_r, out_f = [], [], []
+    for k in ks:
+        if REQUIRE_ANTIBIOTIC and len(idx_ab) >= max(k, 3):
+            pred = first_ab < k
+        else:
+            pred = first_full < min(k, k_max)
+        tp = (pred & gold_vec).sum(axis=1)
+        n_pred = pred.sum(axis=1)
+        p = np.where(n_pred > 0, tp / np.maximum(n_pred, 1), 0.0)
+        r = tp / n_gold if n_gold else np.zeros(len(tp))
+        f = np.where(p + r > 0, 2 * p * r / np.maximum(p + r, 1e-12), 0.0)
+        out_p.append(p); out_r.append(r); out_f.append(f)
+    return np.stack(out_p, 1), np.stack(out_r, 1), np.stack(out_f, 1)
+
+def pareto_front(best):
+    """best: [(K, F1, ...)] 按 K 升序；保留 F1 严格高于所有更小 K 的点"""
+    front, top = [], -1.0
+    for row in best:
+        if row[1] > top + 1e-12:
+            front.append(row)
+            top = row[1]
+    return front
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--alphas", default="0.05,0.1,0.15,0.25,0.4")
+    ap.add_argument("--betas", default="0,0.1,0.2,0.3,0.4,0.5,0.6,0.7,0.8,0.9,1.0")
+    ap.add_argument("--gammas", default="0,0.3,0.6,0.9,1.2,1.5,2.0,3.0")
+    ap.add_argument("--deltas", default="0,0.25,0.5,0.75,1.0,1.5")
+    ap.add_argument("--k-list", default="5,10,15,20,30,50")
+    ap.add_argument("--top", type=int, default=10, help="打印 F1 最高的前几组")
+    ap.add_argument("--out", default=OUT_CSV)
+    args = ap.parse_args()
+    alphas, ks = floats(args.alphas), [int(x) for x in args.k_list.split(",")]
+    # 把当前默认值也放进网格，方便对照
+    betas = sorted(set(floats(args.betas)) | {BETA})
+    gammas = sorted(set(floats(args.gammas)) | {GAMMA})
+    deltas = sorted(set(floats(args.deltas)) | {DELTA})
+    alphas = sorted(set(alphas) | {PPR_ALPHA})
+    weights = np.array(list(itertools.product(betas, gammas, deltas)), dtype=np.float64)
+
+    ctx = load_kg_context()
+    qs = [json.loads(l) for l in open(QA_PATH, "r", encoding="utf-8") if l.strip()]
+
+    t0 = time.perf_counter()
+    comps, para_ids = question_components(ctx, qs, alphas)
+    t_comp = time.perf_counter() - t0
+
+    # 段落 x 药名 的布尔命中（段落顺序 = para_ids），gold 映射到同一列顺序
+    canon = [c.strip().lower() for c in ctx["canon"]]
+    col = {c: i for i, c in enumerate(canon)}
+    D = ctx["drug_hits"][[ctx["row_of"][pid] for pid in para_ids]].toarray() > 0
+    golds = []
+    for q in qs:
+        g = {d.strip().lower() for d in q["gold_drugs"]}
+        vec = np.zeros(len(canon), dtype=bool)
+        vec[[col[d] for d in g if d in col]] = True
+        golds.append((vec, len(g)))   # 不在药名表里的 gold 永远是 FN，分母照算
+
+    G, nq = len(weights), len(qs)
+    chunk = max(1, CHUNK_CELLS // max(len(para_ids), 1))
+    print(f"🔧 {nq} 个问题，{len(para_ids)} 段，{len(alphas)} 个 alpha x {G} 组权重 = {len(alphas) * G} 组，K={ks}")
+    print(f"⏱️ 分量缓存：{t_comp:.2f}s")
+
+    t0 = time.perf_counter()
+    macro = {}   # alpha -> (P, R, F1)，各为 (G, len(ks))，对问题求平均
+    for a in alphas:
+        acc = [np.zeros((G, len(ks))) for _ in range(3)]
+        for comp, (gold_vec, n_gold) in zip(comps, golds):
+            comp["cov_a"] = comp["cov"][a]
+            for s in range(0, G, chunk):
+                prf = eval_grid(comp, D, gold_vec, n_gold, weights[s:s + chunk], ks)
+                for i in range(3):
+                    acc[i][s:s + chunk] += prf[i]
+        macro[a] = [x / nq for x in acc]
+    t_grid = time.perf_counter() - t0
+    n_eval = len(alphas) * G * nq
+    print(f"⏱️ 网格评测：{t_grid:.2f}s（{n_eval} 次「组合 x 问题」，每次 {t_grid / n_eval * 1e6:.1f}µs，含全部 K）")
+
+    rows = []
+    for a in alphas:
+        P, R, F = macro[a]
+        for g, (b, gm, d) in enumerate(weights):
+            for j, k in enumerate(ks):
+                rows.append([a, b, gm, d, k, P[g, j], R[g, j], F[g, j]])
+
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    with open(args.out, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["alpha", "beta", "gamma", "delta", "K", "macro_P", "macro_R", "macro_F1"])
+        w.writerows([r[:5] + [f"{x:.4f}" for x in r[5:]] for r in rows])
+
+    fmt = lambda r: (f"alpha={r[0]:<5g} beta={r[1]:<4g} gamma={r[2]:<4g} delta={r[3]:<5g} K={r[4]:<3} "
+                     f"P={r[5]:.3f} R={r[6]:.3f} F1={r[7]:.3f}")
+    default = [r for r in rows if (r[0], r[1], r[2], r[3]) == (PPR_ALPHA, BETA, GAMMA, DELTA)]
+    print("\n=== 当前默认参数 ===")
+    for r in default:
+        print(fmt(r))
+
+    print(f"\n=== F1 最高的 {args.top} 组 ===")
+    for r in sorted(rows, key=lambda r: (-r[7], r[4]))[:args.top]:
+        print(fmt(r))
+
+    # 每个 K 的最佳组合（同分取 K 更小、参数更靠前的），再取 Pareto 前沿
+    best = [max((r for r in rows if r[4] == k), key=lambda r: r[7]) for k in sorted(ks)]
+    best = [[r[4], r[7]] + r for r in best]
+    print("\n=== F1 vs K 的 Pareto 前沿 ===")
+    for row in pareto_front(best):
+        print(fmt(row[2:]))
+
+    print(f"\n✅ 已写出 {args.out}（{len(rows)} 行）")
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,17 @@
 import argparse
 import json
+from collections.abc import Sequence
 from pathlib import Path
 
 import numpy as np
 from sentence_transformers import SentenceTransformer
 
+from ann_index import ANN_NPROBE, VEC_IVF_PATH
+from quant_store import QUANT_MODES
 
-def load_vec_index(data_dir: Path):
+
+def load_vec_index(data_dir: Path, mmap_mode="r"):
+    """.npy 本身就是一个裸数组（头部之后按 64 字节对齐），默认只读 mmap：不整份读进内存，多进程共享页缓存"""
     emb_path = data_dir / "index_vec_emb.npy"
     meta_path = data_dir / "index_vec_meta.json"
 
@@ -14,37 +19,91 @@ def load_vec_index(data_dir: Path):
         raise FileNotFoundError("❌ 找不到向量索引文件，请先运行 build_vec_index_vec.py")
 
     print(f"📥 加载向量：{emb_path}")
-    emb = np.load(emb_path)
+    emb = np.load(emb_path, mmap_mode=mmap_mode)
 
     print(f"📥 加载元信息：{meta_path}")
     with open(meta_path, "r", encoding="utf-8") as f:
         meta = json.load(f)
 
-    return emb, meta
+    return emb, load_vec_docs(data_dir, meta)
+
+
+class VecDocs(Sequence):
+    """向量索引第 i 行 -> {"pid", "text"}；原文按需从文本列里取"""
+
+    def __init__(self, pids, texts):
+        self.pids = pids
+        self.texts = texts
+
+    def __len__(self):
+        return len(self.pids)
+
+    def __getitem__(self, i):
+        return {"pid": self.pids[i], "text": self.texts[i]}
 
 
-def vec_search(query, model, emb, meta, top_k=5):
-    # 计算 query 的向量
-    q_emb = model.encode(
+def load_vec_docs(data_dir: Path, meta):
+    """
+    index_vec_meta.json 只存 pid：pid 序列与 KG 索引的段落表（index_meta/）指纹一致时，原文直接按行从那里取；
+    对不上（语料不是同一份 / KG 索引没建）就退回读 data/docs.jsonl。旧版 meta（每行带原文）原样返回。
+    """
+    if isinstance(meta, list):
+        return meta
+    try:
+        from retrieve import load_meta
+        kg = load_meta(str(data_dir.parent))
+        if kg["docs"].sha1 == meta["pids_sha1"]:
+            return VecDocs(meta["pids"], kg["doc_text_rows"])
+    except FileNotFoundError:
+        pass
+    print("⚠️ 段落文本库与向量索引的文献对不上，原文改从 data/docs.jsonl 读")
+    from build_vec_index_vec import load_docs
+    return VecDocs(meta["pids"], [d["text"] for d in load_docs(data_dir / "docs.jsonl")])
+
+
+def encode_query(model, query):
+    """query 向量（已 normalize，点积即余弦）"""
+    return model.encode(
         [query],
         convert_to_numpy=True,
         normalize_embeddings=True,
     )[0]
 
-    # 点积 = 余弦相似度（因为已 normalize）
-    scores = emb @ q_emb  # (N,) 向量
 
-    # 取 top-k
+def vec_topk(q_emb, emb, top_k=5, ann=None, quant=None):
+    """
+    点积 = 余弦相似度（因为已 normalize），返回 (top-k 行号, 分数)；
+    ann = 文献向量的 IVF 索引（ann_index.load_ivf）时只在最近的 nprobe 个桶里找；
+    quant = 压缩副本（quant_store.load_quant）时第一遍用压缩向量，短名单回 float32 重排；
+    两个都给时第一遍只在 IVF 候选上用压缩向量算
+    """
+    if quant is not None:
+        from quant_store import quant_topk
+        rows = None
+        if ann is not None:
+            from ann_index import ivf_candidates
+            rows = np.sort(ivf_candidates(ann, q_emb))
+        return quant_topk(quant, emb, q_emb, top_k, rows=rows)
+    if ann is not None:
+        from ann_index import ivf_topk
+        return ivf_topk(ann, emb, q_emb, top_k)
+    scores = emb @ q_emb  # (N,) 向量
     idx = np.argsort(-scores)[:top_k]
+    return idx, scores[idx]
+
+
+def vec_search(query, model, emb, meta, top_k=5, ann=None, quant=None):
+    # 计算 query 的向量，取 top-k
+    idx, top_scores = vec_topk(encode_query(model, query), emb, top_k=top_k, ann=ann, quant=quant)
 
     results = []
-    for rank, i in enumerate(idx, start=1):
+    for rank, (i, sc) in enumerate(zip(idx, top_scores), start=1):
         item = meta[i]
         results.append(
             {
                 "rank": rank,
                 "pid": item.get("pid"),
-                "score": float(scores[i]),
+                "score": float(sc),
                 "text": item.get("text", "")[:400].replace("\n", " "),
             }
         )
@@ -57,13 +116,25 @@ def main():
     parser.add_argument(
         "--k", type=int, default=5, help="返回前多少条（top-k）文献"
     )
+    parser.add_argument("--ann", action="store_true", help="用 IVF 近似检索（见 ann_index.py）")
+    parser.add_argument("--nprobe", type=int, default=ANN_NPROBE, help="--ann 时探查的桶数")
+    parser.add_argument("--quant", choices=QUANT_MODES, default=None, help="第一遍用压缩向量（见 quant_store.py）")
     args = parser.parse_args()
 
     base_dir = Path(__file__).resolve().parent.parent
     data_dir = base_dir / "data"
 
     # 1. 加载索引
+    # 向量 mmap 读；--quant 时第一遍只碰压缩副本，float32 原向量只读短名单那几行
     emb, meta = load_vec_index(data_dir)
+    quant = None
+    if args.quant:
+        from quant_store import load_quant
+        quant = load_quant(str(data_dir / "index_vec_emb.npy"), args.quant, emb)
+    ann = None
+    if args.ann:
+        from ann_index import load_ivf
+        ann = load_ivf(str(base_dir / VEC_IVF_PATH), str(data_dir / "index_vec_emb.npy"), emb, nprobe=args.nprobe)
 
     # 2. 加载同一个向量模型（要和 build_vec_index_vec.py 里的一致）
     model_name = "sentence-transformers/all-mpnet-base-v2"
@@ -74,7 +145,7 @@ def main():
     print("\n================ QUERY =================")
     print(args.query)
     print("=============== VEC TOP-K =============")
-    results = vec_search(args.query, model, emb, meta, top_k=args.k)
+    results = vec_search(args.query, model, emb, meta, top_k=args.k, ann=ann, quant=quant)
     for r in results:
         print(f"[{r['rank']}] pid={r['pid']}  score={r['score']:.4f}")
         print(f"    {r['text']}...")
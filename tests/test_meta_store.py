@@ -0,0 +1,35 @@
+# tests/test_meta_store.py
+# StringIndex 的 len 与迭代（去重后的键）要一致：重复的段落 ID 只算一次
+# 运行：python -m pytest -q tests
+
+import os, sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from meta_store import StringIndex, StringTable, encode_table, sorted_order, save_meta, open_meta
+
+
+def _index(strings, n_unique=None):
+    offsets, blob, sha1 = encode_table(strings)
+    return StringIndex(StringTable(offsets, blob, sha1), sorted_order(strings), n_unique)
+
+
+def test_len_counts_unique_keys():
+    idx = _index(["p2", "p1", "p2", "p3", "p1"])
+    assert len(idx) == len(list(idx)) == len(dict(idx.items())) == 3
+    assert list(idx) == ["p2", "p1", "p3"]
+    assert idx["p2"] == 0 and idx["p1"] == 1 and idx["p3"] == 3
+    assert len(_index([])) == 0
+
+
+def test_index_meta_doc_row_len(tmp_path):
+    docs = ["a", "b", "a", "c"]
+    texts = {"a": "Alpha one.", "b": "Beta two.", "c": "Gamma three."}
+    sent_docid = ["a", "a", "b", "c"]
+    sent_spans = [(0, 5), (6, 10), (0, 9), (0, 12)]
+    save_meta(str(tmp_path / "m"), docs, texts, sent_docid, sent_spans, {"x": 0, "y": 1})
+    meta = open_meta(str(tmp_path / "m"))
+    assert not meta.docs_unique
+    for key in ("doc_row", "doc_texts", "ent2id"):
+        assert len(meta[key]) == len(list(meta[key]))
+    assert len(meta["doc_row"]) == 3 and len(meta["ent2id"]) == 2